@@ -1,6 +1,10 @@
+import os
 import math
+import itertools
 import common.Utils as CommonUtils
+import common.ModelFormat as ModelFormat
 import common.Logger as CommonLogger
+import common.Profiler as CommonProfiler
 
 import common.Helpers as CommonHelpers
 import common.Discretizer as Discretizer
@@ -9,6 +13,45 @@ from common.Transaction import TransactionItemset, apply_thresholds
 
 import CBA.CBAHelpers as CBAHelpers
 
+# path of the mining state stored alongside the rules pickle at pickle_path,
+# the mining state has no compact model format so it's always pickled
+def mining_state_path(pickle_path):
+    root, ext = os.path.splitext(pickle_path)
+    return f"{root}.mining_state{'.pickle' if ext == ModelFormat.EXTENSION else ext}"
+
+# CARs from the frequent itemsets, pruned into the classifier, the default rule is the last rule
+def rules_from_frequent_itemsets(all_frequent_itemsets, transactions, vertical_index, min_support, min_confidence, min_lift, error_weights, m_estimate_weights):
+    all_rules, label_distribution = yield from CBAHelpers.generate_rules(all_frequent_itemsets, transactions, min_support, min_confidence, min_lift, m_estimate_weights)
+
+    all_rules.sort(key = lambda r : (
+        -r["confidence"],     # Accuracy first
+        -r["support"],        # General trends over hyper-specific flukes
+        -r["lift"],           # Strength of association
+        -(r["label"] == True),# Prioritize finding subscribers
+        len(r["itemset"]),    # Simple rules over complex ones
+        str(r["itemset"])     # Deterministic tie-break
+    ))
+
+    CommonLogger.logger.update_last(f"Building the classifier... ")
+    rules, default_rule = yield from CBAHelpers.build_classifier(all_rules, transactions, vertical_index, error_weights)
+    CommonProfiler.count("build_classifier.rules_considered", len(all_rules))
+    CommonProfiler.count("build_classifier.rules_selected", len(rules))
+    rules.append( default_rule )
+    CommonLogger.logger.backtrack(2)
+    CommonLogger.logger.log(f"Generated {len(all_rules)} rules. Down to {len(rules)} after building the classifier.\n")
+    yield
+
+    return rules, label_distribution
+
+# path of the classifier of a setting of a sweep over several supports, confidences or lifts,
+# every setting is written next to pickle_path with its values in the name
+def setting_pickle_path(pickle_path, min_support, min_confidence, min_lift):
+    root, ext = os.path.splitext(pickle_path)
+    return f"{root}.support_{min_support}.confidence_{min_confidence}.lift_{min_lift}{ext}"
+
+# generates a classifier for every combination of the supports, confidences and lifts given (the GUI gives
+# a single value of each). the trainset is mined once at the lowest support, the frequent itemsets of the
+# higher supports are filtered from those
 def generate_CARs(args):
     trainset  = CommonUtils.load_dataset(args.trainset_infile, args.entropy_weights)
 
@@ -24,43 +67,105 @@ def generate_CARs(args):
         transactions = apply_thresholds(trainset, threshold_map)
         
         max_k              = args.max_k
-        min_support        = args.min_support
-        min_confidence     = args.min_confidence
-        min_lift           = args.min_lift
+        min_supports       = sorted(set(args.min_support if isinstance(args.min_support, list) else [args.min_support]))
+        min_confidences    = sorted(set(args.min_confidence if isinstance(args.min_confidence, list) else [args.min_confidence]))
+        min_lifts          = sorted(set(args.min_lift if isinstance(args.min_lift, list) else [args.min_lift]))
         error_weights      = args.error_weights
         m_estimate_weights = args.m_estimate_weights
 
-        CommonLogger.logger.log(f"Running apriori algorithm... (max_k: {max_k}, min_support: {min_support}, min_confidence: {min_confidence}, min_lift: {min_lift})")
+        settings = list(itertools.product(min_supports, min_confidences, min_lifts))
+
+        min_support = min_supports[0]
+
+        # a swept parameter is logged as its values
+        min_confidence_str = ", ".join(map(str, min_confidences))
+        min_lift_str       = ", ".join(map(str, min_lifts))
+
+        keep_mining_state  = getattr(args, "keep_mining_state", False)
+        negative_border    = {} if keep_mining_state else None
+
+        CommonLogger.logger.log(f"Running apriori algorithm... (max_k: {max_k}, min_support: {min_support}, min_confidence: {min_confidence_str}, min_lift: {min_lift_str})")
         yield
 
         # apriori returns all Fk where k in range (0, max_k)
-        all_frequent_itemsets, vertical_index = yield from CBAHelpers.apriori(transactions, min_support, max_k)
+        mined_frequent_itemsets, vertical_index = yield from CBAHelpers.apriori(transactions, min_support, max_k, negative_border)
 
         CommonLogger.logger.backtrack(2)
-        CommonLogger.logger.log(f"Collected frequent itemsets up to size {len(all_frequent_itemsets)}. (max_k: {max_k}, min_support: {min_support}, min_confidence: {min_confidence}), min_lift: {min_lift}\n")
+        CommonLogger.logger.log(f"Collected frequent itemsets up to size {len(mined_frequent_itemsets)}. (max_k: {max_k}, min_support: {min_support}, min_confidence: {min_confidence_str}), min_lift: {min_lift_str}\n")
         yield
 
-        all_rules, label_distribution = yield from CBAHelpers.generate_rules(all_frequent_itemsets, transactions, min_support, min_confidence, min_lift, m_estimate_weights)
+        # the mining state of the lowest support has the counts of every candidate of the higher ones,
+        # so it's shared by the classifiers of every setting
+        state = CBAHelpers.encode_mining_state(mined_frequent_itemsets, negative_border, vertical_index, transactions) if keep_mining_state else None
 
-        all_rules.sort(key = lambda r : (
-            -r["confidence"],     # Accuracy first
-            -r["support"],        # General trends over hyper-specific flukes
-            -r["lift"],           # Strength of association
-            -(r["label"] == True),# Prioritize finding subscribers
-            len(r["itemset"]),    # Simple rules over complex ones
-            str(r["itemset"])     # Deterministic tie-break
-        ))
+        for setting_min_support, min_confidence, min_lift in settings:
+            if len(settings) > 1:
+                pickle_path = setting_pickle_path(args.pickle_path, setting_min_support, min_confidence, min_lift)
+                CommonLogger.logger.log(f"Generating the classifier of min_support: {setting_min_support}, min_confidence: {min_confidence}, min_lift: {min_lift}")
+            else:
+                pickle_path = args.pickle_path
 
-        CommonLogger.logger.update_last(f"Building the classifier... ")
-        rules, default_rule = yield from CBAHelpers.build_classifier(all_rules, transactions, vertical_index, error_weights)
-        rules.append( default_rule )
-        CommonLogger.logger.backtrack(2)
-        CommonLogger.logger.log(f"Generated {len(all_rules)} rules. Down to {len(rules)} after building the classifier.\n")
-        yield
+            all_frequent_itemsets = CBAHelpers.filter_frequent_itemsets(mined_frequent_itemsets, len(transactions), setting_min_support, max_k)
+
+            rules, label_distribution = yield from rules_from_frequent_itemsets(all_frequent_itemsets, transactions, vertical_index, setting_min_support, min_confidence, min_lift, error_weights, m_estimate_weights)
+
+            out = {"rules": rules, "threshold_map": threshold_map, "trainset_label_ratios": label_distribution}
+
+            yield from CommonUtils.save_pickle(out, pickle_path, "class association rules and treshold map")
+
+            if keep_mining_state:
+                state["threshold_map"] = threshold_map
+                state["params"] = {
+                    "max_k":              max_k,
+                    "min_support":        setting_min_support,
+                    "min_confidence":     min_confidence,
+                    "min_lift":           min_lift,
+                    "error_weights":      error_weights,
+                    "m_estimate_weights": m_estimate_weights
+                }
+
+                yield from CommonUtils.save_pickle(state, mining_state_path(pickle_path), "apriori mining state")
+
+    except KeyboardInterrupt:
+        CommonLogger.logger.log("Received KeyboardInterrupt, exiting.")
+        return None
+
+# refreshes the classifier at pickle_path with new labeled instances, using the mining state
+# stored by generate_CARs. only candidates that weren't counted before get counted,
+# thresholds stay as they were discretized from the original trainset
+def refresh_CARs(args):
+    try:
+        state = CommonUtils.load_pickle(mining_state_path(args.pickle_path))
+
+        if not state:
+            CommonLogger.logger.log("[ERROR] No mining state to refresh, generate the classifier with --keep-mining-state first")
+            return None
+
+        delta = CommonUtils.load_dataset(args.delta_infile)
+
+        if not delta:
+            return None
+
+        params        = state["params"]
+        threshold_map = state["threshold_map"]
+
+        yield from CBAHelpers.update_mining_state(state, apply_thresholds(delta, threshold_map))
+
+        all_frequent_itemsets, vertical_index = yield from CBAHelpers.mine_from_state(state, params["min_support"], params["max_k"])
+
+        # rule generation and the classifier builder only look at the labels of the transactions
+        transactions = [{"label": label} for label in state["labels"]]
+
+        rules, label_distribution = yield from rules_from_frequent_itemsets(
+            all_frequent_itemsets, transactions, vertical_index,
+            params["min_support"], params["min_confidence"], params["min_lift"],
+            params["error_weights"], params["m_estimate_weights"]
+        )
 
         out = {"rules": rules, "threshold_map": threshold_map, "trainset_label_ratios": label_distribution}
 
         yield from CommonUtils.save_pickle(out, args.pickle_path, "class association rules and treshold map")
+        yield from CommonUtils.save_pickle(state, mining_state_path(args.pickle_path), "apriori mining state")
 
     except KeyboardInterrupt:
         CommonLogger.logger.log("Received KeyboardInterrupt, exiting.")
@@ -92,6 +197,33 @@ def predict_prob_transaction(rules, transaction, label_ratios):
         # if the best rule predicts false with 0.8 conf, probability of true is 0.2
         return 1.0 - best_rule["confidence"]
 
+# predicted labels and probabilities of true labels of transactions, scanning the rules once per transaction:
+# the first matching rule gives both, transactions only the default rule matches get its label
+# and the trainset ratio of true labels, same as predict() and predict_prob_transaction()
+@CommonProfiler.timed("predict")
+def predict_batch(transactions, rules, label_ratios):
+    predictions = []
+    probs       = []
+
+    for transaction in transactions:
+        itemset = transaction["itemset"]
+
+        for rule in rules:
+            if rule.get("default", False):
+                predictions.append(rule["label"])
+                probs.append(label_ratios[True])
+                break
+
+            if rule["itemset"].issubset(itemset):
+                predictions.append(rule["label"])
+                probs.append(rule["confidence"] if rule["label"] == True else 1.0 - rule["confidence"])
+                break
+        else:
+            predictions.append(None)
+            probs.append(label_ratios[True])
+
+    return predictions, probs
+
 def evaluate_CARs(args):
     try:
         testset        = CommonUtils.load_dataset(args.testset_infile)
@@ -113,18 +245,13 @@ def evaluate_CARs(args):
 
         transactions   = apply_thresholds(testset, threshold_map)
 
-        predictions =   CommonHelpers.predict_dataset(
-                            transactions, None, 
-                            rules, predict
-                        )
+        predictions, y_probs = predict_batch(transactions, rules, trainset_label_ratios)
 
         if not predictions:
             return None
 
         metrics_data = yield from CommonHelpers.get_metrics(
-                    predictions, [t["label"] for t in transactions], rules, transactions,
-                    None, lambda transaction: transaction["label"],
-                    predict_prob_transaction, trainset_label_ratios
+                    predictions, [t["label"] for t in transactions], y_probs
                 )
         CommonLogger.logger.log("")
 
@@ -3,10 +3,13 @@ import pickle
 from collections import Counter
 
 import common.Logger as CommonLogger
+import common.Profiler as CommonProfiler
 import common.Utils as CommonUtils
 import common.Discretizer as Discretizer
 
-from common.Transaction import TransactionItemset
+from common.Progress import Progress
+
+from common.Transaction import TransactionItem, TransactionItemset
 
 def get_F1(transactions, min_support):
     item_counts = Counter()
@@ -30,16 +33,14 @@ def generate_candidates(F_prev_keys, k):
 
     list_of_itemsets.sort(key=lambda x: [str(item) for item in x])
 
-    infostr = "Iterating through previous frequent itemsets... "
-
     n = len(list_of_itemsets)
 
+    progress = Progress("Iterating through previous frequent itemsets... ", n)
+
     for i in range(n):
 
-        if i % 500 == 0:
-            CommonLogger.logger.log(infostr + f"{i}/{n}")
+        if progress.advance():
             yield
-            CommonLogger.logger.backtrack(1)
 
         for j in range(i + 1, n):
 
@@ -58,6 +59,8 @@ def generate_candidates(F_prev_keys, k):
                 # because itemsets are sorted
                 break
 
+    progress.close()
+
     return candidates
 
 def prune_candidates(candidates, F_prev_keys):
@@ -69,7 +72,7 @@ def prune_candidates(candidates, F_prev_keys):
     candidate_list = list(candidates)
     n = len(candidate_list)
 
-    infostr = "Iterating through candidates... "
+    progress = Progress("Iterating through candidates... ", n)
 
     for i, candidate in enumerate(candidate_list):
         items = list(candidate.items)
@@ -87,26 +90,23 @@ def prune_candidates(candidates, F_prev_keys):
         if is_valid:
             pruned.add(candidate)
 
-        if i % 100 == 0:
-            CommonLogger.logger.log(infostr + f"{i}/{n}")
+        if progress.advance():
             yield
-            CommonLogger.logger.backtrack(1)
+
+    progress.close()
 
     return pruned
 
-# counts of candidate itemsets in the transactions list
-def calc_candidate_counts(candidates, vertical_index, pos_indices, transaction_count, min_support):
+# counts of candidate itemsets in the transactions list,
+# counts of infrequent candidates are collected into negative_border if supplied
+def calc_candidate_counts(candidates, vertical_index, pos_indices, transaction_count, min_support, negative_border = None):
     results = {}
 
-    infostr = "Iterating through candidates... "
-
-    n = len(candidates)
+    progress = Progress("Iterating through candidates... ", len(candidates))
 
     for i, candidate in enumerate(candidates):
-        if i % 500 == 0:
-            CommonLogger.logger.log(infostr + f"{i}/{n}")
+        if progress.advance():
             yield
-            CommonLogger.logger.backtrack(1)
 
         item_list = list(candidate.items)
         if not item_list: continue
@@ -133,9 +133,22 @@ def calc_candidate_counts(candidates, vertical_index, pos_indices, transaction_c
                 "neg": count - pos_count
             }
 
+        elif negative_border is not None:
+            pos_count = len(running_rows & pos_indices)
+
+            negative_border[candidate] = {
+                "total": count,
+                "pos": pos_count,
+                "neg": count - pos_count
+            }
+
+    progress.close()
+
     return results
 
-def apriori(transactions, min_support, max_k):
+# negative_border collects the candidates that were counted but weren't frequent, if supplied
+@CommonProfiler.timed("apriori")
+def apriori(transactions, min_support, max_k, negative_border = None):
     vertical_index = {}
 
     # instead of having to iterate through transactions every time
@@ -162,22 +175,35 @@ def apriori(transactions, min_support, max_k):
         pos_count = len(rows & pos_indices)
         F[0][itemset] = {"total": len(rows), "pos": pos_count, "neg": len(rows) - pos_count}
 
+    CommonProfiler.count("apriori.level_1.frequent", len(F[0]))
+
     k = 2
 
     infostr = f"Collecting frequent itemsets with size"
 
     while F[k - 2] and k <= max_k:
+        level = f"apriori.level_{k}"
+
         CommonLogger.logger.update_last(infostr + f" {k} : generating candidates")
         yield
-        candidates_k = yield from generate_candidates(F[k - 2].keys(), k)
+        with CommonProfiler.stage(level + ".generate"):
+            candidates_k = yield from generate_candidates(F[k - 2].keys(), k)
+
+        CommonProfiler.count(level + ".candidates_generated", len(candidates_k))
 
         CommonLogger.logger.update_last(infostr + f" {k} : pruning candidates")
         yield
-        candidates_k = yield from prune_candidates(candidates_k, F[k - 2].keys())
+        with CommonProfiler.stage(level + ".prune"):
+            candidates_k = yield from prune_candidates(candidates_k, F[k - 2].keys())
+
+        CommonProfiler.count(level + ".candidates_counted", len(candidates_k))
 
         CommonLogger.logger.update_last(infostr + f" {k} : counting candidate occurances in transactions")
         yield
-        Fk = yield from calc_candidate_counts(candidates_k, vertical_index, pos_indices, len(transactions), min_support)
+        with CommonProfiler.stage(level + ".count"):
+            Fk = yield from calc_candidate_counts(candidates_k, vertical_index, pos_indices, len(transactions), min_support, negative_border)
+
+        CommonProfiler.count(level + ".frequent", len(Fk))
 
         if not Fk: break
         F.append(Fk)
@@ -185,6 +211,194 @@ def apriori(transactions, min_support, max_k):
 
     return F, vertical_index
 
+# same output as apriori at min_support and max_k, from the frequent itemsets apriori found in the same
+# transaction_count transactions at a support and max k at most as strict. an itemset is frequent at a
+# higher support only if it was at the lower one, so keeping the ones with enough support is enough
+def filter_frequent_itemsets(all_frequent_itemsets, transaction_count, min_support, max_k):
+    F = []
+
+    for Fk in all_frequent_itemsets[:max(1, max_k)]:
+        Fk = {itemset: counts for itemset, counts in Fk.items() if (counts["total"] / transaction_count) >= min_support}
+
+        # apriori stops at the first level without frequent itemsets, its supersets can't be frequent either
+        if F and not Fk: break
+        F.append(Fk)
+
+    return F
+
+# the mining state lets apriori results be refreshed with new transactions without mining from scratch.
+# items are encoded as ids into "items", itemsets as sorted tuples of item ids.
+# "itemset_counts" holds (total, pos) counts of the frequent itemsets with size >= 2 and of the
+# negative border (candidates that were counted but weren't frequent), single items are counted
+# from "vertical_index", which holds the TID set of every item id
+def encode_mining_state(all_frequent_itemsets, negative_border, vertical_index, transactions):
+    items    = sorted(vertical_index.keys(), key=lambda x: str(x))
+    item_ids = {item: i for i, item in enumerate(items)}
+
+    itemset_counts = {}
+
+    for itemsets in all_frequent_itemsets[1:] + [negative_border]:
+        for itemset, counts in itemsets.items():
+            itemset_counts[tuple(sorted(item_ids[item] for item in itemset))] = (counts["total"], counts["pos"])
+
+    return {
+        "items":          [(item.feature_name, item.rule_format) for item in items],
+        "vertical_index": [vertical_index[item] for item in items],
+        "labels":         [t["label"] for t in transactions],
+        "itemset_counts": itemset_counts
+    }
+
+# appends delta_transactions to the mining state and adds their counts to the stored itemset counts
+def update_mining_state(state, delta_transactions):
+    items          = state["items"]
+    vertical_index = state["vertical_index"]
+    item_ids       = {item: i for i, item in enumerate(items)}
+
+    offset = len(state["labels"])
+
+    # TID sets of the delta only, stored itemsets are counted in these
+    delta_index = {}
+    delta_pos   = set()
+
+    for i, t in enumerate(delta_transactions):
+        tid = offset + i
+
+        for item in t["itemset"]:
+            key = (item.feature_name, item.rule_format)
+
+            if key not in item_ids:
+                item_ids[key] = len(items)
+                items.append(key)
+                vertical_index.append(set())
+
+            vertical_index[item_ids[key]].add(tid)
+            delta_index.setdefault(item_ids[key], set()).add(tid)
+
+        if t["label"]:
+            delta_pos.add(tid)
+
+        state["labels"].append(t["label"])
+
+    CommonLogger.logger.log(f"Counting the stored itemsets in {len(delta_transactions)} new transactions...")
+    yield
+
+    itemset_counts = state["itemset_counts"]
+
+    for itemset, (total, pos) in itemset_counts.items():
+        rows = delta_index.get(itemset[0])
+
+        for item_id in itemset[1:]:
+            if not rows:
+                break
+            rows = rows & delta_index.get(item_id, set())
+
+        if rows:
+            itemset_counts[itemset] = (total + len(rows), pos + len(rows & delta_pos))
+
+# apriori candidates of size k from the frequent (k-1)-itemsets, as encoded itemsets.
+# same candidates as generate_candidates followed by prune_candidates
+def generate_encoded_candidates(F_prev_keys, item_features):
+    lookup_set = set(F_prev_keys)
+    by_prefix  = {}
+
+    for itemset in F_prev_keys:
+        by_prefix.setdefault(itemset[:-1], []).append(itemset[-1])
+
+    candidates = []
+
+    for prefix, last_items in by_prefix.items():
+        last_items.sort()
+
+        for i in range(len(last_items)):
+            for j in range(i + 1, len(last_items)):
+                # an itemset can't have two items of the same feature
+                if item_features[last_items[i]] == item_features[last_items[j]]:
+                    continue
+
+                candidate = prefix + (last_items[i], last_items[j])
+
+                # subsets without either of the last two items are the joined ones
+                if all((candidate[:m] + candidate[m + 1:]) in lookup_set for m in range(len(prefix))):
+                    candidates.append(candidate)
+
+    return candidates
+
+# same output as apriori over all the transactions of the mining state,
+# only candidates without stored counts get counted in the vertical index
+def mine_from_state(state, min_support, max_k):
+    vertical_index    = state["vertical_index"]
+    itemset_counts    = state["itemset_counts"]
+    transaction_count = len(state["labels"])
+
+    item_features = [feature_name for feature_name, _ in state["items"]]
+    pos_indices   = {i for i, label in enumerate(state["labels"]) if label}
+
+    def count(itemset):
+        rows = vertical_index[itemset[0]]
+
+        for item_id in itemset[1:]:
+            rows = rows & vertical_index[item_id]
+            if not rows: break
+
+        return (len(rows), len(rows & pos_indices))
+
+    infostr = "Collecting frequent itemsets with size"
+
+    CommonLogger.logger.log(infostr + " 1")
+    yield
+
+    F = [{}]
+
+    for item_id, rows in enumerate(vertical_index):
+        if (len(rows) / transaction_count) >= min_support:
+            F[0][(item_id,)] = (len(rows), len(rows & pos_indices))
+
+    newly_counted = 0
+    k = 2
+
+    while F[k - 2] and k <= max_k:
+        CommonLogger.logger.update_last(infostr + f" {k} : generating candidates")
+        yield
+
+        candidates = generate_encoded_candidates(F[k - 2].keys(), item_features)
+
+        CommonLogger.logger.update_last(infostr + f" {k} : counting {len(candidates)} candidates")
+        yield
+
+        Fk = {}
+
+        for candidate in candidates:
+            counts = itemset_counts.get(candidate)
+
+            if counts is None:
+                counts = count(candidate)
+                itemset_counts[candidate] = counts
+                newly_counted += 1
+
+            if (counts[0] / transaction_count) >= min_support:
+                Fk[candidate] = counts
+
+        if not Fk: break
+        F.append(Fk)
+        k += 1
+
+    CommonLogger.logger.update_last(f"Collected frequent itemsets up to size {len(F)}, {newly_counted} candidates had to be counted")
+    yield
+
+    # decode into what apriori returns
+    items = [TransactionItem(*item) for item in state["items"]]
+
+    all_frequent_itemsets = [
+        {
+            TransactionItemset([items[item_id] for item_id in itemset]): {"total": total, "pos": pos, "neg": total - pos}
+            for itemset, (total, pos) in Fk.items()
+        }
+        for Fk in F
+    ]
+
+    return all_frequent_itemsets, {items[i]: rows for i, rows in enumerate(vertical_index)}
+
+@CommonProfiler.timed("generate_rules")
 def generate_rules(all_frequent_itemsets, transactions, min_support, min_confidence, min_lift, m_estimate_weights):
     rules = []
 
@@ -201,12 +415,12 @@ def generate_rules(all_frequent_itemsets, transactions, min_support, min_confide
         CommonLogger.logger.update_last(infostr + f" processing {i+1}-item frequent itemsets, count: {len(Fk)} itemsets")
         yield
 
+        progress = Progress("Iterating through frequent itemsets... ", len(Fk))
+
         # for every itemset in the current frequent itemset
         for k, (frequent_itemset, counts) in enumerate(sorted_Fk):
-            if k % 500 == 0:
-                CommonLogger.logger.log(f"Iterating through frequent itemsets... {k+1}/{len(Fk)}")
+            if progress.advance():
                 yield
-                CommonLogger.logger.backtrack(1)
 
             # get the counts from supplied dict to save time
             count_X = counts["total"]
@@ -255,9 +469,14 @@ def generate_rules(all_frequent_itemsets, transactions, min_support, min_confide
 
                 rules.append(current_rule)
 
+        progress.close()
+
+    CommonProfiler.count("generate_rules.rules", len(rules))
+
     return rules, label_supports
 
 # M1 algorithm for building the classifier.
+@CommonProfiler.timed("build_classifier")
 def build_classifier(rules, transactions, vertical_index, error_weights):
     N = len(transactions)
 
@@ -272,13 +491,13 @@ def build_classifier(rules, transactions, vertical_index, error_weights):
     total_errors      = []
     cumulative_errors = 0
 
-    infostr = "Iterating through rules... "
-    CommonLogger.logger.log(infostr)
+    # the line stays after the loop, the caller removes it
+    progress = Progress("Iterating through rules... ", len(rules))
+    progress.render()
 
     # data covering
     for idx, rule in enumerate(rules):
-        if idx % 100 == 0:
-            CommonLogger.logger.update_last(infostr + f"{idx}/{len(rules)}")
+        if progress.advance():
             yield
 
         #  use vertical index to find transactions containing the itemset
@@ -1,6 +1,4 @@
 import gradio as gr
-import inspect
-import traceback
 from defaults import *
 
 import io
@@ -10,15 +8,19 @@ from GUI.layout_definition import layout_definition
 
 import common.Logger as CommonLogger
 
+from GUI.JobManager import JobManager
+
 class ForwardArgs:
-    def __init__(self, user, args):
+    def __init__(self, user, args, logger = None):
         self.invalid = False
         self.names = []
 
+        logger = logger or CommonLogger.logger
+
         for name in args:
             self.names.append(name)
             if args[name] is None or args[name] == '':
-                CommonLogger.logger.log(f"[ERROR] {user}(): {name} invalid")
+                logger.log(f"[ERROR] {user}(): {name} invalid")
                 self.invalid = True
                 break
 
@@ -28,9 +30,10 @@ class ForwardArgs:
         return str({name: getattr(self, name) for name in self.names})
 
 class GUI:
-    def __init__(self, handlers):
+    def __init__(self, handlers, job_workers = default_gui_job_workers, job_cache_size = default_gui_job_cache_size):
         self.elems     = {}
         self.handlers  = handlers
+        self.jobs      = JobManager(job_workers, job_cache_size)
         self.interface = self.build_ui()
 
     def launch(self):
@@ -67,9 +70,8 @@ class GUI:
 
         return project_gui
 
+    # runs the handler as a job with a logger of its own, streaming its log into the log box
     def generic_forward(self, handler_path, param_names, *values):
-        CommonLogger.logger.clear()
-
         # build args dictionary
         args_dict = dict(zip(param_names, values))
 
@@ -78,36 +80,30 @@ class GUI:
             if isinstance(v, str) and "weights" in k:
                 args_dict[k] = [float(w) for w in v.split(',') if w.strip()]
 
-        args = ForwardArgs(handler_path, args_dict)
-
-        if not args.invalid:
-            try:
-                handler = self.handlers
+        request_logger = CommonLogger.Logger(True)
 
-                for key in handler_path.split('.'):
-                    handler = handler[key]
+        args = ForwardArgs(handler_path, args_dict, request_logger)
 
-                result = handler(args)
+        if not args.invalid:
+            handler = self.handlers
 
-                if inspect.isgenerator(result):
-                    for _ in result:
-                        yield CommonLogger.logger.read_all()
-                else:
-                    yield CommonLogger.logger.read_all()
+            for key in handler_path.split('.'):
+                handler = handler[key]
 
-            except Exception:
-                CommonLogger.logger.log("\n" + "="*20 + "\n[ERROR]\n" + "="*20)
-                CommonLogger.logger.log(traceback.format_exc())
-                yield CommonLogger.logger.read_all()
+            # the log box is only sent again when the job logged something since the last yield
+            yield from self.jobs.run(handler_path, handler, {name: getattr(args, name) for name in args.names})
         else:
-            yield CommonLogger.logger.read_all()
+            yield request_logger.read_all()
 
+    # the plot handler is a generator logging into a logger of the request's own, the log box is sent again on each of
+    # its yields while the models are evaluated. cancelling the request closes the handler, which stops the evaluations
     def forward_plot(self, handler_path, param_names, *values):
-        CommonLogger.logger.clear()
         # build args dictionary
         args_dict = dict(zip(param_names, values))
 
-        args = ForwardArgs("plot_performances", args_dict)
+        request_logger = CommonLogger.Logger(True)
+
+        args = ForwardArgs("plot_performances", args_dict, request_logger)
 
         result = [None] * 7
 
@@ -118,9 +114,18 @@ class GUI:
                 for key in handler_path.split('.'):
                     handler = handler[key]
 
-                result = handler(args)
+                gen = handler(args, request_logger)
 
-                logger_output = CommonLogger.logger.read_all()
+                try:
+                    while True:
+                        next(gen)
+                        yield [request_logger.read_all()] + [None] * 6
+                except StopIteration as e:
+                    result = e.value
+                finally:
+                    gen.close()
+
+                logger_output = request_logger.read_all()
 
                 if type(result) != list:
                     result = [logger_output if logger_output else None] + [result]
@@ -128,11 +133,12 @@ class GUI:
                     result = [logger_output] + result
 
             except Exception as e:
-                return [f"{e}"] + [None] * 6
+                yield [f"{e}"] + [None] * 6
+                return
         else:
-            result = [CommonLogger.logger.read_all()] + [None] * 6
-            
-        return result
+            result = [request_logger.read_all()] + [None] * 6
+
+        yield result
 
     def render_layout(self, layout, hide_output_group_states):
         with gr.Tab(layout["title"]) as cur_tab:
@@ -183,6 +189,7 @@ class GUI:
 
                 if layout.get("btn_on_top", False):
                     btn = gr.Button(f"{layout['title']}", variant="primary")
+                    cancel_btn = gr.Button("Cancel", variant="stop")
 
                     if target_ids:
                         clear_btn = gr.Button(f"Clear", variant="secondary")
@@ -192,6 +199,7 @@ class GUI:
 
                 if not btn:
                     btn = gr.Button(f"{layout['title']}", variant="primary")
+                    cancel_btn = gr.Button("Cancel", variant="stop")
 
                     if target_ids and not clr_btn:
                         clear_btn = gr.Button(f"Clear", variant="secondary")
@@ -211,12 +219,17 @@ class GUI:
                 else:
                     output_target_elems = [self.log_out]
 
-                btn.click(
+                # jobs run in their own processes, the job manager bounds how many run at once.
+                # plots share the plotter's pool of evaluators, one runs at a time
+                event = btn.click(
                     fn=forwarder,
                     inputs=[gr.State(layout["handler"]), gr.State(all_keys)] + all_inputs,
-                    outputs=output_target_elems
+                    outputs=output_target_elems,
+                    concurrency_limit=None if forwarder == self.generic_forward else 1
                 )
 
+                cancel_btn.click(fn=None, cancels=[event])
+
     # create sections recursively
     def create_section(self, parent_layout, section, all_inputs, all_keys):
         layout = section.get("layout", "column")
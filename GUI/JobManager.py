@@ -0,0 +1,161 @@
+import os
+import time
+import inspect
+import traceback
+import threading
+import multiprocessing
+
+from types import SimpleNamespace
+from collections import OrderedDict
+
+import common.Logger as CommonLogger
+
+from common.Progress import REPORT_INTERVAL
+
+# tasks that only read their inputs, their logs are cached by inputs
+CACHEABLE_TASKS = ("evaluate", "visualize")
+
+# runs a handler in a job process with a logger of its own, sending the lines it logs
+# as read_new() deltas at most once per REPORT_INTERVAL, then the job's status
+def run_job(handler, args_dict, messages):
+    CommonLogger.logger = CommonLogger.Logger(True)
+
+    sender = CommonLogger.LogSender(CommonLogger.logger, lambda start, lines: messages.put(("log", start, lines)), REPORT_INTERVAL)
+
+    status = "done"
+
+    try:
+        result = handler(SimpleNamespace(**args_dict))
+
+        if inspect.isgenerator(result):
+            for _ in result:
+                sender.send_new_lines()
+
+    except Exception:
+        CommonLogger.logger.log("\n" + "="*20 + "\n[ERROR]\n" + "="*20)
+        CommonLogger.logger.log(traceback.format_exc())
+        status = "failed"
+
+    sender.send_new_lines(force = True)
+    messages.put(("status", status))
+
+class Job:
+    def __init__(self, context, handler, args_dict):
+        self.context   = context
+        self.handler   = handler
+        self.args_dict = args_dict
+        self.messages  = context.Queue()
+        self.process   = None
+        self.status    = "queued"
+        self.log_view  = CommonLogger.LogView()
+
+    @property
+    def is_finished(self):
+        return self.status in ("done", "failed", "cancelled")
+
+    def start(self):
+        self.process = self.context.Process(target=run_job, args=(self.handler, self.args_dict, self.messages), daemon=True)
+        self.process.start()
+        self.status = "running"
+
+    # applies what the job sent since the last poll, returns whether its log changed
+    def poll(self):
+        changed = False
+
+        while not self.messages.empty():
+            message = self.messages.get()
+
+            if message[0] == "log":
+                changed |= self.log_view.apply(message[1], message[2])
+            else:
+                self.status = message[1]
+
+        if self.status == "running" and not self.process.is_alive() and self.messages.empty():
+            self.status = "failed"
+            self.log_view.apply(self.log_view.first_idx + len(self.log_view.lines), [f"[ERROR] Job exited with code {self.process.exitcode}\n"])
+            changed = True
+
+        return changed
+
+    def cancel(self):
+        if self.process is not None and self.process.is_alive():
+            self.process.terminate()
+            self.process.join()
+
+        if not self.is_finished:
+            self.status = "cancelled"
+
+# runs GUI tasks as jobs in their own processes, at most max_workers at a time. logs of
+# finished read-only tasks are cached by the task, its arguments and the state of the files they name
+class JobManager:
+    def __init__(self, max_workers, cache_size, poll_interval = REPORT_INTERVAL):
+        self.context       = multiprocessing.get_context("spawn")
+        self.slots         = threading.Semaphore(max_workers)
+        self.cache         = OrderedDict()
+        self.cache_size    = cache_size
+        self.cache_lock    = threading.Lock()
+        self.poll_interval = poll_interval
+
+    @staticmethod
+    def cache_key(handler_path, args_dict):
+        key = [handler_path]
+
+        for name, value in sorted(args_dict.items()):
+            if isinstance(value, list):
+                value = tuple(value)
+
+            # rebuilding a pickle or a dataset invalidates the results that read it
+            if isinstance(value, str) and os.path.isfile(value):
+                stat  = os.stat(value)
+                value = (value, stat.st_mtime_ns, stat.st_size)
+
+            key.append((name, value))
+
+        return tuple(key)
+
+    # generator of the job's log text, yielded whenever it changes. closing the generator
+    # (e.g the gradio event being cancelled) terminates the job
+    def run(self, handler_path, handler, args_dict):
+        cacheable = handler_path.split('.')[-1] in CACHEABLE_TASKS
+        key       = self.cache_key(handler_path, args_dict) if cacheable else None
+
+        if cacheable:
+            with self.cache_lock:
+                if key in self.cache:
+                    self.cache.move_to_end(key)
+                    yield self.cache[key]
+                    return
+
+        job     = Job(self.context, handler, args_dict)
+        started = False
+
+        try:
+            while not self.slots.acquire(timeout=self.poll_interval):
+                yield "Waiting for a free job worker..."
+
+            started = True
+            job.start()
+
+            while not job.is_finished:
+                if job.poll():
+                    yield job.log_view.text()
+
+                time.sleep(self.poll_interval)
+
+            job.poll()
+            text = job.log_view.text()
+
+            if cacheable and job.status == "done":
+                with self.cache_lock:
+                    self.cache[key] = text
+
+                    while len(self.cache) > self.cache_size:
+                        self.cache.popitem(last=False)
+
+            yield text
+
+        finally:
+            job.cancel()
+
+            if started:
+                self.slots.release()
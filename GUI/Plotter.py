@@ -1,15 +1,66 @@
-from sklearn.metrics import roc_curve, auc
+import multiprocessing
+import traceback
+
+from types import SimpleNamespace
+
 import matplotlib.pyplot as plt
 import numpy as np
 
 import common.Logger as CommonLogger
-from GUI.GUI import ForwardArgs
+
+from common.Progress import REPORT_INTERVAL
+
+# runs an evaluator to completion in a pool worker with a logger of its own, sending the lines it
+# logs as (alg, start, lines) read_new() deltas at most once per REPORT_INTERVAL, returns its return value
+def run_evaluator(evaluator, args_dict, alg, messages):
+    CommonLogger.logger = CommonLogger.Logger(True)
+
+    sender = CommonLogger.LogSender(CommonLogger.logger, lambda start, lines: messages.put((alg, start, lines)), REPORT_INTERVAL)
+
+    try:
+        gen = evaluator(SimpleNamespace(**args_dict))
+        result = None
+
+        try:
+            while True:
+                next(gen)
+                sender.send_new_lines()
+        except StopIteration as e:
+            result = e.value
+
+    except Exception:
+        CommonLogger.logger.log(f"[ERROR] {traceback.format_exc()}")
+        result = None
+
+    sender.send_new_lines(force = True)
+
+    return result
 
 class Plotter:
     def __init__(self, evaluators):
         self.evaluators = evaluators
 
-    def setup_args(self, args):
+        # started on the first plot and kept for the following ones, so workers import the models' modules once.
+        # a cancelled plot terminates the pool, the next one starts another
+        self.context = multiprocessing.get_context("spawn")
+        self.pool    = None
+        self.manager = None
+
+    def get_pool(self):
+        if self.pool is None:
+            self.pool = self.context.Pool(len(self.evaluators))
+
+        return self.pool
+
+    # queue the workers of a plot send their logs through, a queue of the manager as pool workers can't inherit a
+    # plain one. every plot gets its own, so the lines of a cancelled plot's workers never reach the next plot
+    def new_message_queue(self):
+        if self.manager is None:
+            self.manager = self.context.Manager()
+
+        return self.manager.Queue()
+
+    def setup_args(self, args, logger):
         self.args = {}
 
         for alg in self.evaluators.keys():
@@ -18,50 +69,108 @@ class Plotter:
             tmp["testset_infile"] = args.testset_infile
             tmp["pickle_path"]    = getattr(args, f"pickle_path_{alg}")
 
-            self.args[alg] = ForwardArgs("Plotter.setup_args", tmp)
+            for name, value in tmp.items():
+                if value is None or value == '':
+                    logger.log(f"[ERROR] Plotter.setup_args(): {name} invalid")
+                    return False
+
+            self.args[alg] = tmp
 
-    def plot_performances(self, args):
-        self.setup_args(args)
+        return True
 
+    # generator, yields whenever the logs of the models changed while they are evaluated. the logs are published
+    # into logger, the plot request's own. closing the generator before the models are evaluated stops the evaluations
+    def plot_performances(self, args, logger):
         failure = [None] * 6
 
+        if not self.setup_args(args, logger):
+            return failure
+
         self.performances = {}
 
-        # fetch evaluation metrics for every model
-        for alg in self.args.keys():
-            CommonLogger.logger.log(alg)
-            gen = self.evaluators[alg](self.args[alg])
-
-            try:
-                i = 0
-                while True and i < 1000:
-                    i += 1
-                    next(gen)
-
-                if i >= 10000:
-                    raise Exception("[ERROR] plot_performances(): Infinite loop while trying to consume evaluator")
-            except StopIteration as e:
-                tmp = e.value
-
-                if not tmp or len(tmp) != 7:
-                    CommonLogger.logger.log(f"[ERROR] plot_performances(): unexpected evaluator return value for {alg}")
-                    return failure
-                else:
-                    accuracy, precision, recall, f1_score, roc_auc, y_probs, y_labels = tmp
-
-                    self.performances[alg] = {
-                        "accuracy":  accuracy,
-                        "precision": precision,
-                        "recall":    recall,
-                        "f1_score":  f1_score,
-                        "roc_auc":   roc_auc,
-                        "y_probs":   y_probs,
-                        "y_labels":  y_labels
-                    }
+        log_views = {alg: CommonLogger.LogView() for alg in self.args.keys()}
+        messages  = self.new_message_queue()
+
+        # the logger shows the log of every model under its name, in evaluator order
+        def publish_logs():
+            logger.clear()
 
+            for alg, view in log_views.items():
+                logger.log(alg)
+                logger.log(view.text(), end = '')
+
+        def log_error(alg, message):
+            view = log_views[alg]
+            view.apply(view.first_idx + len(view.lines), [message + "\n"])
+
+        # applies the log deltas the workers sent since the last call, returns whether a log changed
+        def apply_log_messages():
+            changed = False
+
+            while not messages.empty():
+                alg, start, lines = messages.get()
+                changed |= log_views[alg].apply(start, lines)
+
+            return changed
+
+        pool    = self.get_pool()
+        pending = {pool.apply_async(run_evaluator, (self.evaluators[alg], self.args[alg], alg, messages)): alg for alg in self.args.keys()}
+        results = {}
+
+        # fetch evaluation metrics for every model concurrently, streaming their logs as they come
+        try:
+            while pending:
+                next(iter(pending)).wait(REPORT_INTERVAL)
+
+                done = [result for result in pending if result.ready()]
+
+                for result in done:
+                    alg = pending.pop(result)
+
+                    try:
+                        results[alg] = result.get()
+                    except Exception as e:
+                        results[alg] = None
+                        log_error(alg, f"[ERROR] {type(e).__name__}: {e}")
+
+                # workers send their last lines before returning, so those of finished models are already queued
+                if apply_log_messages() or done:
+                    publish_logs()
+                    yield
+
+        finally:
+            # cancelled while the models were evaluated, the pool's workers are still busy with them
+            if pending:
+                self.pool.terminate()
+                self.pool = None
+
+        for alg, tmp in results.items():
+            if not tmp or len(tmp) != 8:
+                log_error(alg, f"[ERROR] plot_performances(): unexpected evaluator return value for {alg}")
+                continue
+
+            accuracy, precision, recall, f1_score, roc_auc, y_probs, y_labels, roc_points = tmp
+
+            self.performances[alg] = {
+                "accuracy":  accuracy,
+                "precision": precision,
+                "recall":    recall,
+                "f1_score":  f1_score,
+                "roc_auc":   roc_auc,
+                "y_probs":   y_probs,
+                "y_labels":  y_labels,
+                "roc_points": roc_points
+            }
+
+        publish_logs()
+
+        if len(self.performances) != len(self.args):
+            return failure
 
         metrics = ['accuracy', 'precision', 'recall', 'f1_score', 'roc_auc']
-        self.model_names = list(self.performances.keys())
+
+        # evaluator order, whichever finished first
+        self.model_names = [alg for alg in self.args.keys() if alg in self.performances]
 
         # different colors for different models
         self.colors = ['#e07272', '#368dd9', '#3eb53e']
@@ -100,11 +209,8 @@ class Plotter:
         fig_roc, ax_roc = plt.subplots(figsize=(6, 5))
 
         for i, alg in enumerate(self.model_names):
-            y_true = self.performances[alg]["y_labels"]
-            y_score = self.performances[alg]["y_probs"]
-
-            # get roc-curve points
-            fpr, tpr, _ = roc_curve(y_true, y_score)
+            # roc-curve points, computed along with the other metrics
+            fpr, tpr = self.performances[alg]["roc_points"]
             roc_auc_val = self.performances[alg]["roc_auc"]
 
             ax_roc.plot(fpr, tpr, color=self.colors[i], lw=2,
@@ -34,6 +34,7 @@ PREPROCESS_DATASET = {
                         {"id": "field_types", "label": "Dataset Field Types", "info":"the sequential data types that instances in the dataset consist of", "value": ','.join((str(default_field_types)[1:-1]).replace("'", "").split(", "))},
                         {"id": "ignore_indices", "label": "Ignored Field Indices", "info":"Comma seperated field indices to exclude from the resulting datasets (-1 to include everything)", "value": ','.join((str(default_ignore_indices)[1:-1]).split(", "))},
                         {"id": "label_idx", "label": "Label Index", "info":"Field idx of the target class", "type": "number", "value": default_label_idx},
+                        {"id": "chunk_size", "label": "Chunk Size", "info":"Number of csv rows read, converted and written at a time", "type": "number", "value": default_csv_chunk_size},
                     ]
                 }
             ]
@@ -217,6 +218,9 @@ NAIVE_BAYESIAN = {
                                     "fields": [
                                         {"id": "trainset_infile", "label": "Trainset Path", "type": "path", "value": default_trainset_path},
                                         {"id": "pickle_path", "label": "Pickle Path", "type": "path", "value": default_naive_bayesian_pickle_path, "info":"Path to pickle the probability table into"},
+                                        {"id": "chunk_size", "label": "Chunk Size", "type": "number", "value": default_naive_bayesian_chunk_size, "info":"Count the trainset in chunks of this many instances (0 reads the whole trainset at once)"},
+                                        {"id": "sample_size", "label": "Sample Size", "type": "number", "value": default_naive_bayesian_sample_size, "info":"With a chunk size, discretize the thresholds from a sample of this many instances of the whole trainset (0 uses all of it)"},
+                                        {"id": "update", "label": "Update", "type": "dropdown", "choices": [True, False], "value": False, "info":"Add the counts of the trainset to the probability table at pickle path, keeping its thresholds"},
                                     ]
                                 }
                             ]
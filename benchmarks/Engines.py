@@ -0,0 +1,341 @@
+import os
+import json
+import inspect
+import tempfile
+
+from types import SimpleNamespace
+
+import defaults
+
+import common.Utils as CommonUtils
+import common.Helpers as CommonHelpers
+import common.Discretizer as Discretizer
+import common.ColumnarFormat as ColumnarFormat
+
+from common.Transaction import TransactionEncoder, apply_thresholds
+
+import CBA.CBA as CBA
+import CBA.CBAHelpers as CBAHelpers
+
+import decision_tree.DecisionTree as DecisionTree
+import decision_tree.DecisionTreeHelpers as DecisionTreeHelpers
+import decision_tree.TreeBuilder as TreeBuilder
+
+import naive_bayesian.NaiveBayesian as NaiveBayesian
+
+# the stages run in this order. every stage function takes the context, a namespace of the parameters, the dataset
+# paths and the reference outputs of the stages before it (context.outputs[stage name]), and returns its output.
+# an engine is a dict of the stage functions it replaces, the reference engine runs every stage
+STAGES = [
+    "datasets",
+    "threshold_map",
+    "transactions",
+    "frequent_itemsets",
+    "CBA_rules",
+    "decision_tree",
+    "naive_bayesian_table",
+    "decision_tree_predictions",
+    "CBA_predictions",
+    "naive_bayesian_predictions",
+    "threshold_metrics"
+]
+
+def drain(result):
+    if not inspect.isgenerator(result):
+        return result
+
+    while True:
+        try:
+            next(result)
+        except StopIteration as e:
+            return e.value
+
+# the testset is loaded first, the schema keeps the entropy weights of the dataset loaded last
+def load_datasets(testset_path, trainset_path, entropy_weights):
+    testset  = CommonUtils.load_dataset(testset_path)
+    trainset = CommonUtils.load_dataset(trainset_path, entropy_weights)
+
+    if not testset or not trainset:
+        raise RuntimeError("couldn't load the datasets")
+
+    return {"trainset": trainset, "testset": testset}
+
+def reference_datasets(context):
+    return load_datasets(context.testset_path, context.trainset_path, context.params.entropy_weights)
+
+def reference_threshold_map(context):
+    p = context.params
+
+    return drain(Discretizer.best_thresholds_for_features(context.outputs["datasets"]["trainset"], p.max_split_count, p.min_bin_frac, p.delta_cost))
+
+def reference_transactions(context):
+    datasets      = context.outputs["datasets"]
+    threshold_map = context.outputs["threshold_map"]
+
+    return {name: apply_thresholds(datasets[name], threshold_map) for name in ("trainset", "testset")}
+
+def reference_frequent_itemsets(context):
+    p = context.params
+
+    return drain(CBAHelpers.apriori(context.outputs["transactions"]["trainset"], p.min_support, p.max_k))
+
+def reference_CBA_rules(context):
+    p = context.params
+    all_frequent_itemsets, vertical_index = context.outputs["frequent_itemsets"]
+
+    return drain(CBA.rules_from_frequent_itemsets(
+        all_frequent_itemsets, context.outputs["transactions"]["trainset"], vertical_index,
+        p.min_support, p.min_confidence, p.min_lift, p.error_weights, p.m_estimate_weights
+    ))
+
+def reference_decision_tree(context):
+    p = context.params
+
+    TreeBuilder.MAX_DEPTH         = p.max_depth
+    TreeBuilder.MIN_SAMPLES_SPLIT = p.min_samples_split
+    TreeBuilder.MIN_GAIN          = p.min_info_gain
+    TreeBuilder.USE_GINI          = p.use_gini
+
+    DecisionTreeHelpers.MIN_SAMPLES_LEAF      = p.min_samples_leaf
+    DecisionTreeHelpers.MIN_SAMPLES_LEAF_KARY = p.min_samples_leaf_kary
+
+    root = drain(TreeBuilder.build_tree(context.outputs["datasets"]["trainset"]))
+    drain(TreeBuilder.collapse_pure_subtrees(root))
+
+    return root
+
+def reference_naive_bayesian_table(context):
+    return drain(NaiveBayesian.count_trainset(context.params, [context.outputs["datasets"]["trainset"]], None))
+
+def reference_decision_tree_predictions(context):
+    root    = context.outputs["decision_tree"]
+    testset = context.outputs["datasets"]["testset"]
+
+    return (
+        [DecisionTree.predict(instance, root) for instance in testset.instances],
+        [DecisionTree.predict_prob_instance(root, instance) for instance in testset.instances]
+    )
+
+def reference_CBA_predictions(context):
+    rules, label_ratios = context.outputs["CBA_rules"]
+    transactions        = context.outputs["transactions"]["testset"]
+
+    return (
+        [CBA.predict(transaction, rules) for transaction in transactions],
+        [CBA.predict_prob_transaction(rules, transaction, label_ratios) for transaction in transactions]
+    )
+
+def reference_naive_bayesian_predictions(context):
+    table        = context.outputs["naive_bayesian_table"]
+    transactions = apply_thresholds(context.outputs["datasets"]["testset"], table["threshold_map"])
+
+    return (
+        [NaiveBayesian.predict(t, table["probability_table"], table["label_counts"]) for t in transactions],
+        [NaiveBayesian.prediction_probability_true(table["probability_table"], t, table["label_counts"]) for t in transactions]
+    )
+
+# label values of the testset and the probabilities of true labels of every model's predictions
+def threshold_metrics_inputs(context):
+    testset = context.outputs["datasets"]["testset"]
+    labels  = testset.get_columns()[list(testset.feature_types.keys())[testset.label_idx]].tolist()
+
+    return labels, {model: context.outputs[f"{model}_predictions"][1] for model in ("decision_tree", "CBA", "naive_bayesian")}
+
+# metrics of predicting true at or above every distinct probability of each model, one threshold at a time
+def reference_threshold_metrics(context):
+    labels, model_probs = threshold_metrics_inputs(context)
+    out = {}
+
+    for model, probs in model_probs.items():
+        thresholds = sorted(set(probs), reverse=True)
+        metrics    = [CommonHelpers.calc_basic_metrics(labels, [prob >= threshold for prob in probs]) for threshold in thresholds]
+
+        out[model] = {
+            "thresholds": thresholds,
+            "TP":         [confusion_matrix["TP"] for confusion_matrix, *_ in metrics],
+            "FP":         [confusion_matrix["FP"] for confusion_matrix, *_ in metrics],
+            "accuracy":   [accuracy for _, accuracy, *_ in metrics],
+            "precision":  [precision for _, _, precision, *_ in metrics],
+            "recall":     [recall for *_, recall, _ in metrics],
+            "f1_score":   [f1_score for *_, f1_score in metrics]
+        }
+
+    return out
+
+REFERENCE = {stage: globals()[f"reference_{stage}"] for stage in STAGES}
+
+# the json datasets written in the columnar format and read back
+def columnar_datasets(context):
+    paths = {}
+
+    with tempfile.TemporaryDirectory() as directory:
+        for name, path in (("trainset", context.trainset_path), ("testset", context.testset_path)):
+            if path.endswith(ColumnarFormat.EXTENSION):
+                raise RuntimeError("the datasets are already columnar, supply json datasets to compare the formats")
+
+            with open(path) as f:
+                paths[name] = os.path.join(directory, name + ColumnarFormat.EXTENSION)
+                ColumnarFormat.save_columnar_dataset(paths[name], json.load(f))
+
+        datasets = load_datasets(paths["testset"], paths["trainset"], context.params.entropy_weights)
+
+        # columns are memory-mapped, read them before the files go away
+        for dataset in datasets.values():
+            dataset.columns = {name: column.copy() for name, column in dataset.get_columns().items()}
+
+        return datasets
+
+# frequent itemsets of the trainset mined as CBA generate --keep-mining-state and then CBA refresh do: the first half
+# is mined with its negative border into a mining state, the second half is added to the state and it's mined again
+def mining_state_frequent_itemsets(context):
+    p = context.params
+
+    transactions = context.outputs["transactions"]["trainset"]
+    split        = len(transactions) // 2
+
+    negative_border = {}
+    all_frequent_itemsets, vertical_index = drain(CBAHelpers.apriori(transactions[:split], p.min_support, p.max_k, negative_border))
+
+    state = CBAHelpers.encode_mining_state(all_frequent_itemsets, negative_border, vertical_index, transactions[:split])
+
+    drain(CBAHelpers.update_mining_state(state, transactions[split:]))
+
+    return drain(CBAHelpers.mine_from_state(state, p.min_support, p.max_k))
+
+# rules built from transactions that only have labels, as CBA refresh does
+def mining_state_CBA_rules(context):
+    p = context.params
+    all_frequent_itemsets, vertical_index = context.outputs["frequent_itemsets"]
+
+    return drain(CBA.rules_from_frequent_itemsets(
+        all_frequent_itemsets, [{"label": t["label"]} for t in context.outputs["transactions"]["trainset"]], vertical_index,
+        p.min_support, p.min_confidence, p.min_lift, p.error_weights, p.m_estimate_weights
+    ))
+
+# the trainset counted in chunks into a table with the reference thresholds, as build --chunk-size and --update do
+def chunked_naive_bayesian_table(context):
+    reference = context.outputs["naive_bayesian_table"]
+    table     = {"threshold_map": reference["threshold_map"], "probability_table": {}, "label_counts": {True: 0, False: 0}}
+    chunks    = CommonUtils.iter_dataset_chunks(context.trainset_path, context.params.chunk_size, context.params.entropy_weights)
+
+    return drain(NaiveBayesian.count_trainset(context.params, chunks, table))
+
+def batch_decision_tree_predictions(context):
+    return DecisionTree.predict_batch(context.outputs["datasets"]["testset"].get_columns(), context.outputs["decision_tree"])
+
+def batch_CBA_predictions(context):
+    rules, label_ratios = context.outputs["CBA_rules"]
+
+    return CBA.predict_batch(context.outputs["transactions"]["testset"], rules, label_ratios)
+
+def batch_naive_bayesian_predictions(context):
+    table     = context.outputs["naive_bayesian_table"]
+    log_table = NaiveBayesian.compile_log_probability_table(table["probability_table"], table["label_counts"])
+    testset   = context.outputs["datasets"]["testset"]
+
+    encoder = TransactionEncoder(testset.feature_types, testset.label_idx, table["threshold_map"])
+    item_matrix, _ = encoder.encode(testset)
+
+    return NaiveBayesian.predict_batch(NaiveBayesian.log_table_rows(encoder.items, log_table)[item_matrix], log_table)
+
+# the same thresholds swept at once
+def threshold_sweep_metrics(context):
+    labels, model_probs = threshold_metrics_inputs(context)
+    out = {}
+
+    for model, probs in model_probs.items():
+        sweep = CommonHelpers.calc_threshold_metrics(labels, probs, sorted(set(probs), reverse=True))
+        out[model] = {key: sweep[key].tolist() for key in ("thresholds", "TP", "FP", "accuracy", "precision", "recall", "f1_score")}
+
+    return out
+
+# alternate engines, each compared with the reference on the stages it replaces
+ENGINES = {
+    "columnar": {
+        "datasets": columnar_datasets
+    },
+    "mining_state": {
+        "frequent_itemsets": mining_state_frequent_itemsets,
+        "CBA_rules":         mining_state_CBA_rules
+    },
+    "chunked_naive_bayesian": {
+        "naive_bayesian_table": chunked_naive_bayesian_table
+    },
+    "batch_predict": {
+        "decision_tree_predictions":  batch_decision_tree_predictions,
+        "CBA_predictions":            batch_CBA_predictions,
+        "naive_bayesian_predictions": batch_naive_bayesian_predictions
+    },
+    "threshold_sweep": {
+        "threshold_metrics": threshold_sweep_metrics
+    }
+}
+
+def itemset_key(itemset):
+    return tuple(sorted(((item.feature_name, item.rule_format) for item in itemset), key=str))
+
+def tree_snapshot(node):
+    if node.is_leaf:
+        return {"prediction": node.prediction, "n_samples": node.n_samples, "n_pred": node.n_pred}
+
+    return {
+        "split":          node.feature_type.name,
+        "is_categorical": node.is_categorical,
+        "threshold":      node.threshold,
+        "prediction":     node.prediction,
+        "n_samples":      node.n_samples,
+        "n_pred":         node.n_pred,
+        "children":       {str(value): tree_snapshot(child) for value, child in node.children.items()}
+    }
+
+def rule_snapshot(rule):
+    if rule.get("default"):
+        return {"default": True, "label": rule["label"]}
+
+    return {"itemset": itemset_key(rule["itemset"])} | {key: value for key, value in rule.items() if key != "itemset"}
+
+# comparable forms of the outputs of the stages: plain dicts, lists, tuples and scalars
+SNAPSHOTS = {
+    "datasets": lambda datasets: {
+        name: {"size": dataset.size, "columns": {column: values.tolist() for column, values in dataset.get_columns().items()}}
+        for name, dataset in datasets.items()
+    },
+    "threshold_map": lambda threshold_map: threshold_map,
+    "transactions": lambda transactions: {
+        name: [(itemset_key(t["itemset"]), t["label"]) for t in values] for name, values in transactions.items()
+    },
+    "frequent_itemsets": lambda output: {
+        f"level_{k + 1}": {itemset_key(itemset): (counts["total"], counts["pos"]) for itemset, counts in Fk.items()}
+        for k, Fk in enumerate(output[0])
+    },
+    "CBA_rules": lambda output: {"rules": [rule_snapshot(rule) for rule in output[0]], "label_ratios": output[1]},
+    "decision_tree": tree_snapshot,
+    "naive_bayesian_table": lambda table: {key: table[key] for key in ("threshold_map", "label_counts", "probability_table")},
+    "decision_tree_predictions":  lambda output: {"predictions": list(output[0]), "probabilities": list(output[1])},
+    "CBA_predictions":            lambda output: {"predictions": list(output[0]), "probabilities": list(output[1])},
+    "naive_bayesian_predictions": lambda output: {"predictions": list(output[0]), "probabilities": list(output[1])},
+    "threshold_metrics": lambda output: {
+        model: {key: [float(value) for value in values] for key, values in metrics.items()} for model, metrics in output.items()
+    }
+}
+
+def default_params():
+    return SimpleNamespace(
+        entropy_weights       = defaults.default_entropy_weights,
+        max_split_count       = defaults.default_max_split_count,
+        min_bin_frac          = defaults.default_min_bin_frac,
+        delta_cost            = defaults.default_delta_cost,
+        max_k                 = defaults.default_max_k,
+        min_support           = defaults.default_min_support,
+        min_confidence        = defaults.default_min_confidence,
+        min_lift              = defaults.default_min_lift,
+        error_weights         = defaults.default_error_weights,
+        m_estimate_weights    = defaults.default_m_estimate_weights,
+        max_depth             = defaults.default_max_depth,
+        min_samples_split     = defaults.default_min_samples_split,
+        min_info_gain         = defaults.default_min_info_gain,
+        min_samples_leaf      = defaults.default_min_samples_leaf,
+        min_samples_leaf_kary = defaults.default_min_samples_leaf_kary,
+        use_gini              = defaults.default_use_gini,
+        chunk_size            = 1000
+    )
@@ -0,0 +1,62 @@
+import os
+import json
+import time
+import platform
+import subprocess
+
+PROJECT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+HISTORY_DIR = os.path.join(PROJECT_DIR, "benchmarks", "history")
+
+def git_commit():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=PROJECT_DIR, capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+def load_history(history_path):
+    if not os.path.exists(history_path):
+        return []
+
+    with open(history_path) as f:
+        return json.load(f)
+
+# appends a run of {case name: {metric: value}} results to the history, with when and where it ran
+def record_run(history_path, results):
+    history = load_history(history_path)
+
+    history.append({
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "commit":    git_commit(),
+        "python":    platform.python_version(),
+        "machine":   platform.node(),
+        "results":   results
+    })
+
+    directory = os.path.dirname(history_path)
+
+    if directory and not os.path.exists(directory):
+        os.makedirs(directory)
+
+    with open(history_path, "w") as f:
+        json.dump(history, f, indent=2)
+
+# cases of results whose metric got worse than the median of the last window runs of the same machine by more
+# than max_regression (a fraction), ignoring differences below min_delta. higher is worse unless higher_is_better
+def find_regressions(history, results, metric, max_regression, min_delta = 0.0, window = 5, higher_is_better = False):
+    previous = [run["results"] for run in history if run.get("machine") == platform.node()][-window:]
+    regressions = []
+
+    for case, values in results.items():
+        past = sorted(run[case][metric] for run in previous if case in run and run[case].get(metric) is not None)
+
+        if not past or values.get(metric) is None:
+            continue
+
+        baseline = past[len(past) // 2]
+        delta    = (baseline - values[metric]) if higher_is_better else (values[metric] - baseline)
+
+        if delta > min_delta and delta > abs(baseline) * max_regression:
+            regressions.append((case, baseline, values[metric]))
+
+    return regressions
@@ -0,0 +1,122 @@
+import os
+import csv
+
+import numpy as np
+
+# schemas of the project's datasets to generate look alike churn datasets from. fields follow the id field in csv order
+# as (name, kind, values), values being the categories of categorical fields, (low, high) of numeric fields and the
+# (false, true) spellings of bool fields. the last field is the label
+SCHEMAS = {
+    "spotify_churn_dataset": {
+        "id": "user_id",
+        "fields": [
+            ("gender",                "categorical", ["Female", "Male", "Other"]),
+            ("age",                   "int",         (16, 59)),
+            ("country",               "categorical", ["AU", "CA", "DE", "FR", "IN", "PK", "UK", "US"]),
+            ("subscription_type",     "categorical", ["Family", "Free", "Premium", "Student"]),
+            ("listening_time",        "int",         (10, 299)),
+            ("songs_played_per_day",  "int",         (1, 99)),
+            ("skip_rate",             "float",       (0.0, 0.6)),
+            ("device_type",           "categorical", ["Desktop", "Mobile", "Web"]),
+            ("ads_listened_per_week", "int",         (0, 49)),
+            ("offline_listening",     "bool",        ("0", "1")),
+            ("is_churned",            "bool",        ("0", "1"))
+        ],
+        "churn_rate": 0.26
+    },
+    "customer_churn_dataset": {
+        "id": "customer_id",
+        "fields": [
+            ("tenure",           "int",         (1, 72)),
+            ("monthly_charges",  "float",       (20.0, 120.0)),
+            ("total_charges",    "float",       (20.0, 8630.0)),
+            ("contract",         "categorical", ["Month-to-month", "One year", "Two year"]),
+            ("payment_method",   "categorical", ["Cash", "Credit", "Debit", "UPI"]),
+            ("internet_service", "categorical", ["DSL", "Fiber", "None"]),
+            ("tech_support",     "bool",        ("No", "Yes")),
+            ("online_security",  "bool",        ("No", "Yes")),
+            ("support_calls",    "int",         (0, 8)),
+            ("churn",            "bool",        ("No", "Yes"))
+        ],
+        "churn_rate": 0.2
+    }
+}
+
+# rows generated and written at a time
+CHUNK_SIZE = 100000
+
+# field types of the schema for process_dataset's --field-types, the id field included
+def field_types(schema_name):
+    type_names = {"categorical": "str", "int": "int", "float": "float", "bool": "bool"}
+
+    return ["int"] + [type_names[kind] for _, kind, _ in SCHEMAS[schema_name]["fields"]]
+
+# categories of a categorical field, padded with numbered ones or cut down to cardinality if given
+def categories_of(name, values, cardinality):
+    if cardinality is None:
+        return list(values)
+
+    return (list(values) + [f"{name}_{i}" for i in range(len(values), cardinality)])[:cardinality]
+
+# distinct values a numeric field takes, evenly spaced over its range. all of its values if cardinality isn't given
+def numeric_levels(kind, value_range, cardinality):
+    low, high = value_range
+
+    if cardinality is None:
+        return np.arange(low, high + 1) if kind == "int" else np.round(np.arange(low, high + 0.01, 0.01), 2)
+
+    levels = np.linspace(low, high, cardinality)
+
+    return np.unique(np.round(levels).astype(np.int64)) if kind == "int" else np.round(levels, 2)
+
+# writes a churn dataset of row_count rows with the fields of schema_name to csv_outpath, the same seed always gives
+# the same file. each feature value gets a random effect on a churn score, the rows with the top churn_rate fraction
+# of scores (plus noise) are churned, so the label is learnable and its skew exact per chunk
+def generate(schema_name, row_count, csv_outpath, churn_rate = None, categorical_cardinality = None, numeric_cardinality = None, seed = 0):
+    schema     = SCHEMAS[schema_name]
+    churn_rate = schema["churn_rate"] if churn_rate is None else churn_rate
+    rng        = np.random.default_rng(seed)
+
+    *features, (_, _, label_values) = schema["fields"]
+
+    # (name, values a row picks from, effect of each value on the churn score)
+    generators = []
+
+    for name, kind, values in features:
+        if kind == "categorical":
+            choices = np.array(categories_of(name, values, categorical_cardinality), dtype=object)
+        elif kind == "bool":
+            choices = np.array(values, dtype=object)
+        else:
+            choices = numeric_levels(kind, values, numeric_cardinality)
+
+        # numeric effects are monotonic in the value, as in the real datasets
+        effects = np.sort(rng.normal(size=len(choices))) * rng.choice([-1, 1]) if kind in ("int", "float") else rng.normal(size=len(choices))
+
+        generators.append((name, choices, effects))
+
+    directory = os.path.dirname(csv_outpath)
+
+    if directory and not os.path.exists(directory):
+        os.makedirs(directory)
+
+    with open(csv_outpath, "w", newline="") as f:
+        writer = csv.writer(f)
+        writer.writerow([schema["id"]] + [name for name, _, _ in schema["fields"]])
+
+        for start in range(0, row_count, CHUNK_SIZE):
+            size    = min(CHUNK_SIZE, row_count - start)
+            columns = [range(start + 1, start + size + 1)]
+            score   = rng.normal(scale=0.5, size=size)
+
+            for name, choices, effects in generators:
+                picks  = rng.integers(len(choices), size=size)
+                score += effects[picks]
+                columns.append(choices[picks].tolist())
+
+            churned = score > np.quantile(score, 1 - churn_rate)
+            columns.append(np.where(churned, label_values[1], label_values[0]).tolist())
+
+            writer.writerows(zip(*columns))
+
+    return csv_outpath
@@ -0,0 +1,193 @@
+#!/usr/bin/env python
+
+# golden output equivalence of the alternate engines: runs the reference implementation of every stage, then each
+# alternate engine's stages on the same inputs, and reports the first place an engine's output differs from the reference
+
+import os
+import sys
+import math
+import time
+import argparse
+import traceback
+
+from types import SimpleNamespace
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import common.Logger as CommonLogger
+import benchmarks.Engines as Engines
+
+from benchmarks.History import PROJECT_DIR
+
+BUNDLED_DATASETS = ["spotify_churn_dataset", "customer_churn_dataset"]
+
+# first difference between a reference and an alternate snapshot as (path, reference value, alternate value), None if
+# they're equal. dicts are walked in sorted key order and sequences in order, floats are equal within rel_tol
+def first_difference(reference, alternate, rel_tol, path = ""):
+    if isinstance(reference, float) and isinstance(alternate, float):
+        return None if math.isclose(reference, alternate, rel_tol=rel_tol, abs_tol=rel_tol) else (path, reference, alternate)
+
+    if type(reference) != type(alternate):
+        return (path, reference, alternate) if reference != alternate else None
+
+    if isinstance(reference, dict):
+        for key in sorted(reference.keys() | alternate.keys(), key=repr):
+            if key not in alternate:
+                return (f"{path}[{key!r}]", reference[key], "<missing>")
+            if key not in reference:
+                return (f"{path}[{key!r}]", "<missing>", alternate[key])
+
+            difference = first_difference(reference[key], alternate[key], rel_tol, f"{path}[{key!r}]")
+
+            if difference:
+                return difference
+
+        return None
+
+    if isinstance(reference, (list, tuple)):
+        # long equal sequences are compared without walking them
+        if reference == alternate:
+            return None
+
+        for i, (ref, alt) in enumerate(zip(reference, alternate)):
+            difference = first_difference(ref, alt, rel_tol, f"{path}[{i}]")
+
+            if difference:
+                return difference
+
+        if len(reference) != len(alternate):
+            return (f"{path} length", len(reference), len(alternate))
+
+        return None
+
+    return None if reference == alternate else (path, reference, alternate)
+
+def shorten(value, limit = 200):
+    text = repr(value)
+    return text if len(text) <= limit else text[:limit] + "..."
+
+def timed_run(fnc, context):
+    start = time.perf_counter()
+    return fnc(context), time.perf_counter() - start
+
+# the stages the selected engines replace and the reference stages before them, in stage order
+def stages_to_run(engines, selected_stages):
+    replaced = {stage for name in engines for stage in Engines.ENGINES[name]}
+
+    if selected_stages:
+        replaced &= set(selected_stages)
+
+    last = max((Engines.STAGES.index(stage) for stage in replaced), default=-1)
+
+    return Engines.STAGES[:last + 1], replaced
+
+def run(context, engines, selected_stages, rel_tol):
+    reference_stages, compared = stages_to_run(engines, selected_stages)
+
+    snapshots = {}
+
+    for stage in reference_stages:
+        context.outputs[stage], seconds = timed_run(Engines.REFERENCE[stage], context)
+
+        if stage in compared:
+            snapshots[stage] = Engines.SNAPSHOTS[stage](context.outputs[stage])
+
+        print(f"{'reference':<24} {stage:<28} {seconds:>10.3f} s")
+
+    divergent = []
+
+    for name in engines:
+        for stage in Engines.STAGES:
+            if stage not in Engines.ENGINES[name] or stage not in compared:
+                continue
+
+            try:
+                output, seconds = timed_run(Engines.ENGINES[name][stage], context)
+                difference = first_difference(snapshots[stage], Engines.SNAPSHOTS[stage](output), rel_tol, stage)
+            except Exception:
+                print(f"{name:<24} {stage:<28} FAILED\n{traceback.format_exc()}")
+                divergent.append(name)
+                break
+
+            if difference:
+                path, reference, alternate = difference
+
+                print(f"{name:<24} {stage:<28} {seconds:>10.3f} s   DIVERGES at {path}")
+                print(f"{'':<24} {'reference:':<28} {shorten(reference)}")
+                print(f"{'':<24} {name + ':':<28} {shorten(alternate)}")
+
+                # later stages of the engine would only repeat the divergence
+                divergent.append(name)
+                break
+
+            print(f"{name:<24} {stage:<28} {seconds:>10.3f} s   identical")
+
+    return divergent
+
+# trainset and testset json files of a synthetic dataset, generated and split on first use
+def synthetic_datasets(schema, row_count, seed):
+    import defaults
+    import common.Utils as CommonUtils
+    import benchmarks.SyntheticChurn as SyntheticChurn
+
+    directory = os.path.join(PROJECT_DIR, "benchmarks", "work", f"{schema}-{row_count}" + (f"-seed{seed}" if seed else ""))
+    csv_path  = os.path.join(directory, "dataset.csv")
+    trainset  = os.path.join(directory, "trainset.json")
+    testset   = os.path.join(directory, "testset.json")
+
+    if not os.path.exists(csv_path):
+        SyntheticChurn.generate(schema, row_count, csv_path + ".part", seed=seed)
+        os.replace(csv_path + ".part", csv_path)
+
+    if not os.path.exists(trainset) or not os.path.exists(testset):
+        field_types = SyntheticChurn.field_types(schema)
+
+        Engines.drain(CommonUtils.process_dataset(SimpleNamespace(
+            dataset=csv_path, ratio=defaults.default_testset_trainset_ratio, trainset_outfile=trainset, testset_outfile=testset,
+            field_types=field_types, ignore_indices=[0], label_idx=len(field_types) - 1, chunk_size=defaults.default_csv_chunk_size, seed=seed
+        )))
+
+    return trainset, testset
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare the outputs of the alternate engines with the reference implementation")
+    parser.add_argument("--dataset", help="bundled dataset to compare on (default: spotify_churn_dataset)", choices=BUNDLED_DATASETS, default="spotify_churn_dataset")
+    parser.add_argument("--trainset-infile", metavar='TRAINSET_FILEPATH', help="compare on this trainset instead of a bundled one", default=None, type=str)
+    parser.add_argument("--testset-infile", metavar='TESTSET_FILEPATH', help="compare on this testset instead of a bundled one", default=None, type=str)
+    parser.add_argument("--synthetic", metavar='ROW_COUNT', help="compare on a synthetic dataset of ROW_COUNT rows with the fields of --dataset", default=None, type=int)
+    parser.add_argument("--seed", metavar='SEED', help="seed of the synthetic dataset (default: 0)", default=0, type=int)
+    parser.add_argument("--engines", nargs="+", help="alternate engines to compare (default: all)", choices=list(Engines.ENGINES), default=list(Engines.ENGINES))
+    parser.add_argument("--stages", nargs="+", help="only compare these stages (default: all)", choices=Engines.STAGES, default=None)
+    parser.add_argument("--max-k", metavar='MAX_K', help="max k of apriori (default: the default of CBA generate)", default=None, type=int)
+    parser.add_argument("--rel-tol", metavar='REL_TOL', help="relative tolerance of float comparisons (default: 1e-9)", default=1e-9, type=float)
+    parser.add_argument("--verbose", "-v", help="print the logs of the stages", action="store_true")
+    args = parser.parse_args()
+
+    # default paths are relative to the project
+    os.chdir(PROJECT_DIR)
+
+    CommonLogger.logger = CommonLogger.Logger(not args.verbose)
+
+    if args.synthetic:
+        trainset_path, testset_path = synthetic_datasets(args.dataset, args.synthetic, args.seed)
+    else:
+        trainset_path = args.trainset_infile or f"dataset/{args.dataset}/default_trainset.json"
+        testset_path  = args.testset_infile or f"dataset/{args.dataset}/default_testset.json"
+
+    params = Engines.default_params()
+
+    if args.max_k is not None:
+        params.max_k = args.max_k
+
+    context = SimpleNamespace(params=params, trainset_path=trainset_path, testset_path=testset_path, outputs={})
+
+    print(f"Comparing on {trainset_path} and {testset_path}")
+
+    divergent = run(context, args.engines, args.stages, args.rel_tol)
+
+    print(f"[FAIL] diverging engines: {', '.join(divergent)}" if divergent else "All engines match the reference")
+
+    return 1 if divergent else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
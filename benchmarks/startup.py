@@ -0,0 +1,129 @@
+#!/usr/bin/env python
+
+# startup benchmark of main.py: the time spent importing modules and the wall time of --help
+# and of lightweight commands, checked against per command budgets and the recorded history.
+# budgets are relative to the import time of numpy measured in the same run, so they hold on slower machines too
+
+import os
+import sys
+import time
+import argparse
+import statistics
+import subprocess
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from benchmarks.History import PROJECT_DIR, HISTORY_DIR, load_history, record_run, find_regressions
+
+HEAVY_MODULES = ["matplotlib", "sklearn", "gradio", "graphviz"]
+
+# the command whose import time the budgets are multiples of
+BASELINE = ("numpy_baseline", ["-c", "import numpy"])
+
+# name, main.py arguments, import time budget as a multiple of the baseline's, modules that must not be imported.
+# commands that don't need numpy must import faster than numpy alone, the others can import about as much again
+CASES = [
+    ("help",                          ["main.py", "-h"],                                0.75, HEAVY_MODULES + ["numpy"]),
+    ("decision_tree_help",            ["main.py", "decision_tree", "-h"],               0.75, HEAVY_MODULES + ["numpy"]),
+    ("naive_bayesian_evaluate_help",  ["main.py", "naive_bayesian", "evaluate", "-h"],  0.75, HEAVY_MODULES + ["numpy"]),
+    ("naive_bayesian_evaluate",       ["main.py", "naive_bayesian", "evaluate"],        2.5,  HEAVY_MODULES),
+    ("decision_tree_evaluate",        ["main.py", "decision_tree", "evaluate"],         2.5,  HEAVY_MODULES),
+    ("CBA_evaluate",                  ["main.py", "CBA", "evaluate"],                   2.5,  HEAVY_MODULES)
+]
+
+# runs python with -X importtime and argv, returns the wall time, the time spent importing after the
+# interpreter's own startup (up to and including site) and the top level packages imported
+def run_case(argv):
+    start = time.perf_counter()
+
+    proc = subprocess.run([sys.executable, "-X", "importtime"] + argv, cwd=PROJECT_DIR, capture_output=True, text=True)
+
+    wall = time.perf_counter() - start
+
+    if proc.returncode != 0:
+        raise RuntimeError(f"python {' '.join(argv)} exited with {proc.returncode}: {proc.stderr[-500:]}")
+
+    import_us = 0
+    after_site = False
+    packages = set()
+
+    for line in proc.stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+
+        _, cumulative, name = line[len("import time:"):].split("|")
+
+        packages.add(name.strip().split(".")[0])
+
+        # top level imports have no indentation
+        if name.startswith(" ") and not name.startswith("  "):
+            if after_site:
+                import_us += int(cumulative)
+            elif name.strip() == "site":
+                after_site = True
+
+    return wall, import_us / 1000, packages
+
+# runs argv repeat times, returns the median wall and import times in milliseconds and every package imported
+def measure(argv, repeat):
+    walls, imports = [], []
+    imported = set()
+
+    for _ in range(repeat):
+        wall, import_ms, packages = run_case(argv)
+
+        walls.append(wall)
+        imports.append(import_ms)
+        imported |= packages
+
+    return round(statistics.median(walls) * 1000, 3), round(statistics.median(imports), 3), imported
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the startup of main.py commands")
+    parser.add_argument("--repeat", "-n", metavar='REPEAT', help="runs per command, medians are reported (default: 5)", default=5, type=int)
+    parser.add_argument("--history", metavar='HISTORY_PATH', help="json file the results are appended to (default: benchmarks/history/startup.json)", default=os.path.join(HISTORY_DIR, "startup.json"), type=str)
+    parser.add_argument("--max-regression", metavar='FRACTION', help="import time increase over the recent median that fails the benchmark (default: 0.25)", default=0.25, type=float)
+    parser.add_argument("--budget-scale", metavar='SCALE', help="multiplies every budget, e.g. 2 on a noisy machine (default: 1)", default=1.0, type=float)
+    parser.add_argument("--no-record", help="don't append the results to the history", action="store_true")
+    args = parser.parse_args()
+
+    results  = {}
+    failures = []
+
+    baseline_name, baseline_argv = BASELINE
+    baseline_wall_ms, baseline_ms, _ = measure(baseline_argv, args.repeat)
+
+    print(f"{baseline_name:<30} import: {baseline_ms:>8.1f} ms                  wall: {baseline_wall_ms:>8.1f} ms")
+
+    for name, argv, budget, forbidden in CASES:
+        wall_ms, import_ms, imported = measure(argv, args.repeat)
+        budget_ms = round(budget * args.budget_scale * baseline_ms, 3)
+
+        results[name] = {"wall_ms": wall_ms, "import_ms": import_ms, "budget_ms": budget_ms}
+
+        print(f"{name:<30} import: {import_ms:>8.1f} ms (budget {budget_ms:>6.1f} ms)   wall: {wall_ms:>8.1f} ms")
+
+        if import_ms > budget_ms:
+            failures.append(f"{name}: import time {import_ms} ms over its {budget_ms} ms budget ({budget * args.budget_scale:g}x the import time of numpy)")
+
+        # importing a module a command doesn't need fails on any machine
+        for module in sorted(imported & set(forbidden)):
+            failures.append(f"{name}: imports {module}")
+
+    # a few milliseconds are noise between runs
+    for name, baseline, value in find_regressions(load_history(args.history), results, "import_ms", args.max_regression, min_delta=5.0):
+        failures.append(f"{name}: import time regressed from {baseline} ms to {value} ms")
+
+    # recorded with the cases, so that a regression can be told apart from a slower machine
+    results[baseline_name] = {"wall_ms": baseline_wall_ms, "import_ms": baseline_ms}
+
+    if not args.no_record:
+        record_run(args.history, results)
+
+    for failure in failures:
+        print(f"[FAIL] {failure}")
+
+    return 1 if failures else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
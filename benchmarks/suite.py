@@ -0,0 +1,181 @@
+#!/usr/bin/env python
+
+# benchmark suite over synthetic churn datasets: the time and memory of process_dataset, discretization, each
+# model's build, evaluate and batch prediction, run through main.py --profile and checked against the recorded history
+
+import os
+import sys
+import json
+import argparse
+import subprocess
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import benchmarks.SyntheticChurn as SyntheticChurn
+
+from benchmarks.History import PROJECT_DIR, HISTORY_DIR, load_history, record_run, find_regressions
+
+MODELS = ["decision_tree", "CBA", "naive_bayesian"]
+
+WORK_DIR = os.path.join(PROJECT_DIR, "benchmarks", "work")
+
+# name of a generated dataset, every generator parameter that isn't the schema's default is part of it
+def dataset_tag(args, row_count):
+    tag = f"{args.schema}-{row_count}"
+
+    if args.churn_rate is not None:
+        tag += f"-churn{args.churn_rate}"
+    if args.categorical_cardinality is not None:
+        tag += f"-cat{args.categorical_cardinality}"
+    if args.numeric_cardinality is not None:
+        tag += f"-num{args.numeric_cardinality}"
+    if args.seed != 0:
+        tag += f"-seed{args.seed}"
+
+    return tag
+
+# main.py arguments of the steps of a model on the dataset files in directory, in the order they have to run
+def model_steps(model, directory, CBA_max_k):
+    trainset    = os.path.join(directory, "trainset.cols")
+    testset     = os.path.join(directory, "testset.cols")
+    pickle_path = os.path.join(directory, f"{model}.pickle")
+
+    build   = {"decision_tree": "build", "CBA": "generate", "naive_bayesian": "build"}[model]
+    options = {
+        "decision_tree":  ["--dot-outfile", os.path.join(directory, "decision_tree.dot")],
+        "CBA":            ["--max-k", str(CBA_max_k)],
+        "naive_bayesian": []
+    }[model]
+
+    return [
+        (f"{model}_build",    [model, build, "--trainset-infile", trainset, "--pickle-path", pickle_path] + options),
+        (f"{model}_evaluate", [model, "evaluate", "--testset-infile", testset, "--pickle-path", pickle_path]),
+        (f"{model}_predict",  [model, "predict", "-i", testset, "-o", os.path.join(directory, f"{model}_predictions.csv"),
+                               "--schema-infile", trainset, "--pickle-path", pickle_path])
+    ]
+
+# runs main.py with --profile, returns its profile report and max resident memory in kilobytes (None where unknown)
+def run_step(argv, report_path, trace_memory):
+    command = [sys.executable, "main.py", "--profile", report_path] + (["--profile-memory"] if trace_memory else []) + argv
+    process = subprocess.Popen(command, cwd=PROJECT_DIR, stdout=subprocess.DEVNULL, stderr=subprocess.PIPE, text=True)
+
+    if hasattr(os, "wait4"):
+        stderr = process.stderr.read()
+        _, status, usage = os.wait4(process.pid, 0)
+        returncode = os.waitstatus_to_exitcode(status)
+        max_rss    = usage.ru_maxrss
+    else:
+        _, stderr  = process.communicate()
+        returncode = process.returncode
+        max_rss    = None
+
+    if returncode != 0:
+        raise RuntimeError(f"main.py {' '.join(argv)} exited with {returncode}: {stderr[-500:]}")
+
+    with open(report_path) as f:
+        return json.load(f), max_rss
+
+# result of a step (or one of its stages) out of its profile report
+def step_result(report, stage, max_rss):
+    result = {"seconds": round(report["stages"][stage]["seconds"], 4), "max_rss_kb": max_rss}
+
+    if "peak_memory_bytes" in report["stages"][stage]:
+        result["peak_memory_bytes"] = report["stages"][stage]["peak_memory_bytes"]
+
+    return result
+
+def print_result(case, result):
+    line = f"{case:<72} {result['seconds']:>10.3f} s"
+
+    if result["max_rss_kb"]:
+        line += f"   max rss: {result['max_rss_kb'] / 1024:>8.1f} MB"
+    if "peak_memory_bytes" in result:
+        line += f"   peak traced: {result['peak_memory_bytes'] / 2**20:>8.1f} MB"
+
+    print(line)
+
+def run_dataset(args, row_count, results, failures):
+    tag       = dataset_tag(args, row_count)
+    directory = os.path.join(args.work_dir, tag)
+    csv_path  = os.path.join(directory, "dataset.csv")
+
+    # the same parameters always generate the same dataset
+    if not os.path.exists(csv_path):
+        print(f"Generating {tag}...")
+        SyntheticChurn.generate(args.schema, row_count, csv_path + ".part", args.churn_rate, args.categorical_cardinality, args.numeric_cardinality, args.seed)
+        os.replace(csv_path + ".part", csv_path)
+
+    field_types = SyntheticChurn.field_types(args.schema)
+
+    steps = [[("process_dataset", ["process_dataset", "-d", csv_path,
+                                   "--trainset-outfile", os.path.join(directory, "trainset.cols"),
+                                   "--testset-outfile", os.path.join(directory, "testset.cols"),
+                                   "--field-types"] + field_types + ["--label-idx", str(len(field_types) - 1), "--seed", str(args.seed)])]]
+
+    steps += [model_steps(model, directory, args.CBA_max_k) for model in args.models]
+
+    # tracing memory slows the steps down, its results are only compared with other traced runs
+    traced = "+memory" if args.memory else ""
+
+    # a failing step skips the rest of its model's steps
+    for group in steps:
+        for name, argv in group:
+            case = f"{tag}{traced}/{name}"
+
+            try:
+                report, max_rss = run_step(argv, os.path.join(directory, f"{name}.profile.json"), args.memory)
+            except RuntimeError as e:
+                failures.append(f"{case}: {e}")
+                break
+
+            results[case] = step_result(report, "total", max_rss)
+            print_result(case, results[case])
+
+            if "discretize" in report["stages"]:
+                results[case + ".discretize"] = step_result(report, "discretize", None)
+                print_result(case + ".discretize", results[case + ".discretize"])
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the commands of main.py on synthetic churn datasets")
+    parser.add_argument("--rows", nargs="+", metavar='ROW_COUNT', help="sizes of the generated datasets (default: 10000 100000)", default=[10000, 100000], type=int)
+    parser.add_argument("--schema", help="dataset whose fields are generated (default: spotify_churn_dataset)", choices=list(SyntheticChurn.SCHEMAS), default="spotify_churn_dataset")
+    parser.add_argument("--churn-rate", metavar='CHURN_RATE', help="fraction of churned rows, the label skew (default: the schema's)", default=None, type=float)
+    parser.add_argument("--categorical-cardinality", metavar='CARDINALITY', help="distinct values of every categorical field (default: the schema's)", default=None, type=int)
+    parser.add_argument("--numeric-cardinality", metavar='CARDINALITY', help="distinct values of every numeric field (default: the schema's ranges)", default=None, type=int)
+    parser.add_argument("--seed", metavar='SEED', help="seed of the generator and of the trainset/testset split (default: 0)", default=0, type=int)
+    parser.add_argument("--models", nargs="+", help=f"models to benchmark (default: {' '.join(MODELS)})", choices=MODELS, default=MODELS)
+    parser.add_argument("--CBA-max-k", metavar='MAX_K', help="max k of apriori, its cost grows quickly with it (default: 4)", default=4, type=int)
+    parser.add_argument("--memory", help="also trace the peak memory of each step, slows the steps down", action="store_true")
+    parser.add_argument("--work-dir", metavar='WORK_DIR', help="directory the datasets, models and profile reports are written to (default: benchmarks/work)", default=WORK_DIR, type=str)
+    parser.add_argument("--history", metavar='HISTORY_PATH', help="json file the results are appended to (default: benchmarks/history/suite.json)", default=os.path.join(HISTORY_DIR, "suite.json"), type=str)
+    parser.add_argument("--max-regression", metavar='FRACTION', help="time or memory increase over the recent median that fails the benchmark (default: 0.25)", default=0.25, type=float)
+    parser.add_argument("--no-record", help="don't append the results to the history", action="store_true")
+    args = parser.parse_args()
+
+    args.work_dir = os.path.abspath(args.work_dir)
+
+    results  = {}
+    failures = []
+
+    for row_count in args.rows:
+        run_dataset(args, row_count, results, failures)
+
+    history = load_history(args.history)
+
+    # steps faster than a tenth of a second or a few megabytes apart are within noise
+    for name, baseline, value in find_regressions(history, results, "seconds", args.max_regression, min_delta=0.1):
+        failures.append(f"{name}: regressed from {baseline} s to {value} s")
+
+    for name, baseline, value in find_regressions(history, results, "max_rss_kb", args.max_regression, min_delta=8192):
+        failures.append(f"{name}: max resident memory regressed from {baseline} KB to {value} KB")
+
+    if not args.no_record:
+        record_run(args.history, results)
+
+    for failure in failures:
+        print(f"[FAIL] {failure}")
+
+    return 1 if failures else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
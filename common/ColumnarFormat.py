@@ -0,0 +1,227 @@
+import json
+import struct
+import shutil
+import tempfile
+
+import numpy as np
+
+# binary columnar dataset file layout:
+#   MAGIC (8 bytes), version (uint32), header length (uint32),
+#   header: utf-8 json with the schema ("field_descriptions", "label_idx"), the instance count ("size")
+#           and for every column its "name", numpy "dtype", "offset" and, for str columns, "categories",
+#   column buffers, each starting at a multiple of ALIGNMENT bytes,
+#   offsets are relative to the first aligned position after the header.
+# str columns are stored as int32 codes into their categories, so loading doesn't parse any cell
+MAGIC     = b"BLMCOLS\0"
+VERSION   = 1
+ALIGNMENT = 64
+
+EXTENSION = ".cols"
+
+COLUMN_DTYPES = {
+    "bool":  np.dtype("|b1"),
+    "int":   np.dtype("<i8"),
+    "float": np.dtype("<f8"),
+    "str":   np.dtype("<i4")
+}
+
+def aligned(offset):
+    return (offset + ALIGNMENT - 1) // ALIGNMENT * ALIGNMENT
+
+# writes a columnar dataset incrementally: rows are appended in chunks and every column is spilled
+# to its own temporary file, so only the current chunk is held in memory. close() assembles the file,
+# str categories are numbered in order of first appearance
+class ColumnarDatasetWriter:
+    def __init__(self, file_path, field_descriptions, label_idx):
+        self.file_path          = file_path
+        self.field_descriptions = field_descriptions
+        self.label_idx          = label_idx
+        self.size               = 0
+
+        self.typenames  = list(field_descriptions.values())
+        self.spills     = [tempfile.TemporaryFile() for _ in self.typenames]
+        self.categories = [({} if typename == "str" else None) for typename in self.typenames]
+
+    def write_rows(self, rows):
+        if not rows:
+            return
+
+        for i, values in enumerate(zip(*rows)):
+            codes = self.categories[i]
+
+            if codes is not None:
+                values = [codes.setdefault(v, len(codes)) for v in values]
+
+            np.array(values, dtype=COLUMN_DTYPES[self.typenames[i]]).tofile(self.spills[i])
+
+        self.size += len(rows)
+
+    def close(self):
+        column_headers = []
+        offset         = 0
+
+        for name, typename, codes in zip(self.field_descriptions.keys(), self.typenames, self.categories):
+            column_header = {"name": name, "dtype": COLUMN_DTYPES[typename].str, "offset": offset}
+
+            if codes is not None:
+                column_header["categories"] = list(codes.keys())
+
+            column_headers.append(column_header)
+
+            offset = aligned(offset + self.size * COLUMN_DTYPES[typename].itemsize)
+
+        header = json.dumps({
+            "field_descriptions": self.field_descriptions,
+            "label_idx":          self.label_idx,
+            "size":               self.size,
+            "columns":            column_headers
+        }).encode("utf-8")
+
+        data_start = aligned(len(MAGIC) + 8 + len(header))
+
+        with open(self.file_path, "wb") as f:
+            f.write(MAGIC)
+            f.write(struct.pack("<II", VERSION, len(header)))
+            f.write(header)
+
+            for column_header, spill in zip(column_headers, self.spills):
+                f.seek(data_start + column_header["offset"])
+                spill.seek(0)
+                shutil.copyfileobj(spill, f)
+
+            # pad the last column so the file covers every aligned offset
+            f.truncate(max(data_start + offset, f.tell()))
+
+        self.discard()
+
+    def discard(self):
+        for spill in self.spills:
+            spill.close()
+
+# dataset has the same form as json datasets: "instances", "field_descriptions" (name -> type name), "label_idx"
+def save_columnar_dataset(file_path, dataset):
+    writer = ColumnarDatasetWriter(file_path, dataset["field_descriptions"], dataset["label_idx"])
+    writer.write_rows(dataset["instances"])
+    writer.close()
+
+def read_header(f):
+    if f.read(len(MAGIC)) != MAGIC:
+        raise ValueError("not a columnar dataset file")
+
+    version, header_len = struct.unpack("<II", f.read(8))
+
+    if version != VERSION:
+        raise ValueError(f"unsupported columnar dataset version: {version}")
+
+    return json.loads(f.read(header_len).decode("utf-8")), aligned(len(MAGIC) + 8 + header_len)
+
+# an argument of a numpy function with the categorical columns in it decoded, including the ones in sequences of arrays
+# (e.g. np.concatenate([a, b])), which numpy would otherwise hand back to CategoricalColumn.__array_function__
+def decode_arg(arg):
+    if isinstance(arg, CategoricalColumn):
+        return arg.decode()
+
+    if isinstance(arg, (list, tuple)):
+        return type(arg)(decode_arg(item) for item in arg)
+
+    return arg
+
+# a str column as its int32 codes into its categories, the codes of a loaded column being a view into the
+# memory-mapped file. indexing and slicing give the column of the selected codes, comparing to a value and
+# np.unique work on the codes, anything else numpy does with the column gets the decoded array
+class CategoricalColumn:
+    def __init__(self, codes, categories):
+        self.codes      = codes
+        self.categories = np.array(categories, dtype=str)
+
+    def __len__(self):
+        return len(self.codes)
+
+    @property
+    def size(self):
+        return self.codes.size
+
+    @property
+    def shape(self):
+        return self.codes.shape
+
+    def decode(self):
+        return self.categories[self.codes]
+
+    def tolist(self):
+        return self.decode().tolist()
+
+    def copy(self):
+        return CategoricalColumn(self.codes.copy(), self.categories)
+
+    def __iter__(self):
+        return iter(self.decode())
+
+    def __array__(self, dtype = None, copy = None):
+        return self.decode() if dtype is None else self.decode().astype(dtype)
+
+    def __array_function__(self, func, types, args, kwargs):
+        if func is np.unique and args[0] is self and set(kwargs) <= {"return_inverse"}:
+            return self.unique(**kwargs)
+
+        return func(*(decode_arg(arg) for arg in args), **{name: decode_arg(arg) for name, arg in kwargs.items()})
+
+    # same as np.unique of the decoded column: codes are numbered in order of first appearance,
+    # so the distinct codes are sorted by their categories
+    def unique(self, return_inverse = False):
+        codes, inverse = np.unique(self.codes, return_inverse=True)
+
+        values = self.categories[codes]
+        order  = np.argsort(values, kind="stable")
+
+        if not return_inverse:
+            return values[order]
+
+        ranks = np.empty(order.size, dtype=np.intp)
+        ranks[order] = np.arange(order.size)
+
+        return values[order], ranks[inverse]
+
+    def __getitem__(self, key):
+        codes = self.codes[key]
+
+        if np.ndim(codes) == 0:
+            return self.categories[codes]
+
+        return CategoricalColumn(codes, self.categories)
+
+    def __eq__(self, value):
+        code = np.flatnonzero(self.categories == value)
+
+        return (self.codes == code[0]) if code.size else np.zeros(len(self.codes), dtype=bool)
+
+    def __ne__(self, value):
+        return ~(self == value)
+
+    __hash__ = None
+
+# returns the header and the columns (name -> numpy array or CategoricalColumn), numeric and bool
+# columns are read-only views into the memory-mapped file, str columns are CategoricalColumns of their codes
+def load_columnar_dataset(file_path):
+    with open(file_path, "rb") as f:
+        header, data_start = read_header(f)
+
+    size    = header["size"]
+    columns = {}
+
+    mapped = np.memmap(file_path, dtype=np.uint8, mode="r") if size else None
+
+    for column_header in header["columns"]:
+        dtype = np.dtype(column_header["dtype"])
+
+        if size:
+            column = np.frombuffer(mapped, dtype=dtype, count=size, offset=data_start + column_header["offset"])
+        else:
+            column = np.empty(0, dtype=dtype)
+
+        if "categories" in column_header:
+            column = CategoricalColumn(column, column_header["categories"])
+
+        columns[column_header["name"]] = column
+
+    return header, columns
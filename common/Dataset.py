@@ -1,11 +1,34 @@
 import math
 
 import builtins
+import numpy as np
 from collections import Counter
 
 from common.Instance import Instance
 from common.Features import FeatureType, FeatureFilter
 
+import common.Logger as CommonLogger
+
+# spellings of boolean cells, compared by equality like the values they replace (0 / 1 also match False / True)
+BOOL_VALUES = {
+    **dict.fromkeys(['No', 'no', 'NO', 'False', 'false', 'FALSE', 0, '0'], False),
+    **dict.fromkeys(['Yes', 'yes', 'YES', 'True', 'true', 'TRUE', 1, '1'], True)
+}
+
+def convert_bool_column(values):
+    try:
+        return list(map(BOOL_VALUES.__getitem__, values))
+    except (KeyError, TypeError):
+        raise ValueError("[ERROR] field type was specified bool but data couldn't be interpreted as such")
+
+# returns the function converting a whole column of raw cells into a list of field_type values,
+# the conversion runs as a single map over the column instead of per cell python code
+def column_converter(field_type):
+    if field_type == bool:
+        return convert_bool_column
+
+    return lambda values: list(map(field_type, values))
+
 class DatasetSchema:
     feature_types   = None
     entropy_weights = None
@@ -16,35 +39,25 @@ class DatasetSchema:
             raise ValueError("Dataset Schema is not configured")
 
     @staticmethod
-    def configure_schema(dataset_contents, field_types = None, entropy_weights = [1.0, 1.0], label_idx = None):
+    def configure_schema(dataset_contents, entropy_weights = [1.0, 1.0]):
         DatasetSchema.entropy_weights = entropy_weights
-        DatasetSchema.label_idx       = label_idx
-
-        if type(dataset_contents) == list:
-            # getting field names from first line,
-            # then discarding the first line
-            field_descriptions = dict(zip(dataset_contents[0], field_types))
+        DatasetSchema.label_idx       = dataset_contents["label_idx"]
 
-            dataset_contents = dataset_contents[1:]
+        field_descriptions = dataset_contents["field_descriptions"]
 
-        elif type(dataset_contents) == dict:
-            #field_descriptions = zip(dataset_contents["field_names"], field_types)
-            field_descriptions = dataset_contents["field_descriptions"]
-            DatasetSchema.label_idx = dataset_contents["label_idx"]
+        # raises on field names instances can't have, before any instance is built
+        Instance.row_class(list(field_descriptions.keys()), DatasetSchema.label_idx)
 
-            for i in range(len(field_descriptions)):
-                try:
-                    key, val = list(field_descriptions.items())[i]
-                    field_descriptions[key] = (getattr(builtins, val))
+        for i in range(len(field_descriptions)):
+            try:
+                key, val = list(field_descriptions.items())[i]
+                field_descriptions[key] = (getattr(builtins, val))
 
-                except AttributeError:
-                    CommonLogger.logger.log(f"[ERROR] invalid field description in dataset")
-                    return None
+            except AttributeError:
+                CommonLogger.logger.log("[ERROR] invalid field description in dataset")
+                return None
 
-            dataset_contents = dataset_contents["instances"]
-
-        else:
-            raise ValueError(f"Invalid dataset contents type: {type(dataset_contents)}")
+        dataset_contents = dataset_contents["instances"]
 
         DatasetSchema.feature_types = {
             name: FeatureType(
@@ -52,6 +65,40 @@ class DatasetSchema:
                 ) for desc_idx, name in enumerate(field_descriptions.keys())
         }
 
+        return DatasetSchema.feature_types
+
+    @staticmethod
+    def get_schema():
+        return (DatasetSchema.feature_types, DatasetSchema.entropy_weights, DatasetSchema.label_idx)
+
+    @staticmethod
+    def set_schema(schema):
+        DatasetSchema.feature_types, DatasetSchema.entropy_weights, DatasetSchema.label_idx = schema
+
+    # same as configure_schema, for a columnar dataset: field_descriptions maps names to type names,
+    # columns maps names to numpy arrays
+    @staticmethod
+    def configure_schema_from_columns(field_descriptions, columns, entropy_weights = [1.0, 1.0], label_idx = None):
+        DatasetSchema.entropy_weights = entropy_weights
+        DatasetSchema.label_idx       = label_idx
+
+        Instance.row_class(list(field_descriptions.keys()), label_idx)
+
+        feature_types = {}
+
+        for name, typename in field_descriptions.items():
+            try:
+                field_type = getattr(builtins, typename)
+            except AttributeError:
+                CommonLogger.logger.log("[ERROR] invalid field description in dataset")
+                return None
+
+            feature_types[name] = FeatureType([name, field_type], np.unique(columns[name]).tolist())
+
+        DatasetSchema.feature_types = feature_types
+
+        return feature_types
+
 class Dataset(DatasetSchema):
     def __init__(self, instance_array):
         super().__init__()
@@ -69,45 +116,54 @@ class Dataset(DatasetSchema):
         # only meaningful on a sorted dataset to be used for numeric feature discretization
         self.positive_counts = None
 
+        # columnar view of the instances, name -> numpy array, built on demand
+        self.columns         = None
+
+        # instances of datasets created from columns are built on first access
+        self._instances      = None
+
         self.instances       = []
         self.size            = 0
 
+        # converted values per field, only when the instances are built here
+        value_columns        = None
+
         if not instance_array or len(instance_array) == 0:
             return
 
-        if type(instance_array[0]) == Instance:
+        if isinstance(instance_array[0], Instance):
             self.instances = instance_array
         else:
             field_names = list(self.feature_types.keys())
+            converters  = [column_converter(self.feature_types[name].value) for name in field_names]
 
-            for instance in instance_array:
-                instance_dict = {}
-
-                for i, f in enumerate(instance):
-                    field_name = field_names[i]
-                    field_type = self.feature_types[field_name].value
-
-                    as_bool = None
-
-                    if f == 'No' or f == 'no' or f == 'NO' or f == 'False' or f == 'false' or f == 'FALSE' or f == 0 or f == '0':
-                        as_bool = False
-                    elif f == 'Yes' or f == 'yes' or f == 'YES' or f == 'True' or f == 'true' or f == 'TRUE' or f == 1 or f == '1':
-                        as_bool = True
-                    elif field_type == bool:
-                        raise ValueError("[ERROR] field type was specified bool but data couldn't be interpreted as such")
-
-                    instance_dict[field_name] = field_type(as_bool) if field_type == bool else field_type(f)
+            columns       = [convert(column) for convert, column in zip(converters, zip(*instance_array))]
+            value_columns = dict(zip(field_names, columns))
 
-                self.instances.append(Instance(instance_dict, self.label_idx))
+            self.instances = Instance.from_values(Instance.row_class(field_names, self.label_idx), zip(*columns))
 
         self.size = len(self.instances)
 
         if not self.is_empty:
             # majority label: [0] is value, [1] is count of value
-            self.majority_label = self.calc_majority_label()
+            self.majority_label = self.calc_majority_label(value_columns)
             self.entropy        = self.calc_binary_label_entropy(self.entropy_weights)
             self.gini           = self.calc_binary_label_gini()
-            self.value_domains  = self.compute_value_domains()
+            self.value_domains  = self.compute_value_domains(value_columns)
+
+    @property
+    def instances(self):
+        if self._instances is None:
+            field_names = list(self.feature_types.keys())
+            value_lists = [self.columns[name].tolist() for name in field_names]
+
+            self._instances = Instance.from_values(Instance.row_class(field_names, self.label_idx), zip(*value_lists))
+
+        return self._instances
+
+    @instances.setter
+    def instances(self, instances):
+        self._instances = instances
 
     @property
     def is_empty(self):
@@ -125,12 +181,21 @@ class Dataset(DatasetSchema):
     def count_label_false(self):
         return (self.size - self.count_label_true)
 
-    def compute_value_domains(self):
-        domains = {name: set() for name in self.feature_types.keys()}
+    def compute_value_domains(self, value_columns = None):
+        if self._instances is None:
+            return {
+                name: (np.unique(self.columns[name]).tolist() if ftype.is_numeric else set(np.unique(self.columns[name]).tolist()))
+                for name, ftype in self.feature_types.items()
+            }
 
-        for inst in self.instances:
-            for name in domains.keys():
-                domains[name].add(getattr(inst, name))
+        if value_columns is not None:
+            domains = {name: set(value_columns[name]) for name in self.feature_types.keys()}
+        else:
+            domains = {name: set() for name in self.feature_types.keys()}
+
+            for inst in self.instances:
+                for name in domains.keys():
+                    domains[name].add(getattr(inst, name))
 
         for name in domains.keys():
             if self.feature_types[name].is_numeric:
@@ -138,6 +203,36 @@ class Dataset(DatasetSchema):
 
         return domains
 
+    # dataset from typed columns (name -> numpy array) in schema order, no conversion of the values is done.
+    # the columns are used as they are (e.g. memory-mapped) and the instances are only built if accessed
+    @classmethod
+    def from_columns(cls, columns):
+        field_names = list(cls.feature_types.keys())
+
+        ret = cls([])
+        ret.columns    = {name: columns[name] for name in field_names}
+        ret._instances = None
+        ret.size       = len(ret.columns[field_names[0]]) if field_names else 0
+
+        if not ret.is_empty:
+            labels = ret.columns[field_names[ret.label_idx]].tolist()
+
+            ret.majority_label = Counter(labels).most_common()[0]
+            ret.entropy        = ret.calc_binary_label_entropy(ret.entropy_weights)
+            ret.gini           = ret.calc_binary_label_gini()
+            ret.value_domains  = ret.compute_value_domains()
+
+        return ret
+
+    def get_columns(self):
+        if self.columns is None:
+            self.columns = {
+                name: np.array([getattr(inst, name) for inst in self.instances])
+                for name in self.feature_types.keys()
+            }
+
+        return self.columns
+
     def value_domains_repr(self):
         str = ""
 
@@ -152,9 +247,13 @@ class Dataset(DatasetSchema):
 
         return str[:-1]
 
-    def calc_majority_label(self):
+    def calc_majority_label(self, value_columns = None):
         # majority label: [0] is value, [1] is count of value
-        counts = Counter(inst.label for inst in self.instances)
+        if value_columns is not None:
+            counts = Counter(value_columns[list(self.feature_types.keys())[self.label_idx]])
+        else:
+            counts = Counter(inst.label for inst in self.instances)
+
         return counts.most_common()[0]
 
     def calc_binary_label_entropy(self, weights):
@@ -1,6 +1,9 @@
 import math
 from common.Dataset import Dataset
 import common.Logger as CommonLogger
+import common.Profiler as CommonProfiler
+
+from common.Progress import Progress
 
 def extract_thresholds(dataset, segment_map, split_count):
     thresholds = []
@@ -63,13 +66,15 @@ def discretize(dataset, split_count, min_frac=0.1):
 
     infostr = f"Discretizing {feature_name}... trying split count"
 
+    progress = Progress(infostr, N)
+
     # DP
     for b in range(2, desired_bin_count + 1):
+        progress.restart(infostr + f": {b - 1}/{desired_bin_count - 1}, seg_end: ", b * MIN_BIN_SIZE - 1)
+
         for seg_end in range(b * MIN_BIN_SIZE - 1, N):
-            if seg_end % 100 == 0:
-                CommonLogger.logger.log(infostr + f": {b - 1}/{desired_bin_count - 1}, seg_end: {seg_end}/{N}")
+            if progress.advance():
                 yield
-                CommonLogger.logger.backtrack(1)
 
             # only look at label-change boundaries
             for seg_start in boundaries:
@@ -95,6 +100,8 @@ def discretize(dataset, split_count, min_frac=0.1):
                     cost_map[b][seg_end] = cost
                     segment_map[b][seg_end] = seg_start
 
+    progress.close()
+
     if cost_map[desired_bin_count][N - 1] == float("inf"):
         return None, None
 
@@ -138,6 +145,7 @@ def best_thresholds_for_feature(trainset, feature_name, max_split_count, min_bin
     yield
     return best_thresholds
 
+@CommonProfiler.timed("discretize")
 def best_thresholds_for_features(dataset, max_split_count, min_bin_frac, delta_cost):
     threshold_map = {}
 
@@ -146,7 +154,8 @@ def best_thresholds_for_features(dataset, max_split_count, min_bin_frac, delta_c
 
     for feature_name, feature_type in dataset.feature_types.items():
         if feature_type.is_numeric:
-            threshold_map[feature_name] = yield from best_thresholds_for_feature(dataset, feature_name, max_split_count, min_bin_frac, delta_cost)
+            with CommonProfiler.stage(f"discretize.{feature_name}"):
+                threshold_map[feature_name] = yield from best_thresholds_for_feature(dataset, feature_name, max_split_count, min_bin_frac, delta_cost)
 
     CommonLogger.logger.log("")
 
@@ -1,4 +1,7 @@
+import numpy as np
+
 import common.Logger as CommonLogger
+import common.Profiler as CommonProfiler
 
 def calc_candidate_thresholds(dataset, feature_type):
     if not feature_type.is_numeric:
@@ -24,40 +27,22 @@ def calc_candidate_thresholds(dataset, feature_type):
 
     return candidates
 
-def predict_dataset(dataset, dataset_property_accessor, learning_output, prediction_function, *fargs):
-    if not dataset:
-        CommonLogger.logger.log("[ERROR] predict_dataset(): dataset is None")
-        return None
-
-    if not learning_output:
-        CommonLogger.logger.log("[ERROR] predict_dataset(): learning_output is None")
-        return None
+# confusion matrix of boolean label and prediction arrays, as counts of TN, FP, FN, TP.
+# a None prediction (no CBA rule matched the instance) neither matches its label nor is positive,
+# so it's a false negative whatever the label
+def calc_confusion_matrix(y_labels, predictions):
+    y_labels    = np.asarray(y_labels, dtype=bool)
+    predictions = np.asarray(predictions, dtype=object)
 
-    if not prediction_function:
-        CommonLogger.logger.log("[ERROR] predict_dataset(): no prediction function supplied")
-        return None
+    unmatched = (predictions == None)
 
-    predictions = []
+    tn, fp, fn, tp = np.bincount(2 * y_labels[~unmatched] + predictions[~unmatched].astype(bool), minlength=4).tolist()
 
-    for data in (dataset_property_accessor(dataset) if dataset_property_accessor else dataset):
-        predictions.append(prediction_function(data, learning_output, *fargs))
+    return {"TP": tp, "FN": fn + int(unmatched.sum()), "FP": fp, "TN": tn}
 
-    return predictions
-
-def get_basic_metrics(labels, predictions):
-    confusion_matrix = {"TP": 0, "FN": 0, "FP": 0, "TN": 0}
-
-    for i, label in enumerate(labels):
-        if label == predictions[i]:
-            if predictions[i] == True:
-                confusion_matrix["TP"] += 1
-            else:
-                confusion_matrix["TN"] += 1
-        else:
-            if predictions[i] == True:
-                confusion_matrix["FP"] += 1
-            else:
-                confusion_matrix["FN"] += 1
+# confusion matrix, accuracy, precision, recall and f1 score of predictions, without logging them
+def calc_basic_metrics(labels, predictions):
+    confusion_matrix = calc_confusion_matrix(labels, predictions)
 
     preds_all_positive = confusion_matrix["TP"] + confusion_matrix["FP"]
     preds_tp_fn = confusion_matrix["TP"] + confusion_matrix["FN"]
@@ -75,6 +60,15 @@ def get_basic_metrics(labels, predictions):
         recall    = (confusion_matrix["TP"] / preds_tp_fn)
         f1_score  = 2 * ( (precision * recall) / (precision + recall) )
 
+    return confusion_matrix, accuracy, precision, recall, f1_score
+
+def get_basic_metrics(labels, predictions):
+    confusion_matrix, accuracy, precision, recall, f1_score = calc_basic_metrics(labels, predictions)
+
+    preds_all_positive = confusion_matrix["TP"] + confusion_matrix["FP"]
+    preds_tp_fn = confusion_matrix["TP"] + confusion_matrix["FN"]
+    preds_tp_tn = confusion_matrix["TP"] + confusion_matrix["TN"]
+
     CommonLogger.logger.log(f"Accuracy: %{round(accuracy*100, 4)} ({preds_tp_tn}/{len(labels)})")
 
     CommonLogger.logger.log(f"True Positives: {confusion_matrix['TP']}/{len(labels)}")
@@ -90,65 +84,100 @@ def get_basic_metrics(labels, predictions):
     # maybe return confusion matrix too, if need be
     return (accuracy, precision, recall, f1_score)
 
-def get_label_values_and_probs(learning_output, dataset, dataset_property_accessor, data_label_accessor, probability_function, *fargs):
-    y_labels = []
-    y_probs = []
+# ROC curve points of label values and probabilities of true labels: a point per distinct probability,
+# from the highest to the lowest, each being the rates of instances with at least that probability.
+# returns the false positive rates, true positive rates and thresholds, starting from (0, 0) at an infinite threshold
+def calc_roc_curve(y_label_values, y_probs):
+    y_label_values = np.asarray(y_label_values, dtype=bool)
+    y_probs        = np.asarray(y_probs, dtype=float)
 
-    if not dataset:
-        CommonLogger.logger.log("[ERROR] get_label_values_and_probs(): dataset is None")
-        return None
+    order    = np.argsort(-y_probs, kind="stable")
+    y_probs  = y_probs[order]
 
-    if not learning_output:
-        CommonLogger.logger.log("[ERROR] get_label_values_and_probs(): learning_output is None")
-        return None
+    # last position of every run of equal probabilities
+    ends = np.flatnonzero(np.diff(y_probs)) if y_probs.size else np.empty(0, dtype=int)
+    ends = np.append(ends, y_probs.size - 1) if y_probs.size else ends
 
-    if not probability_function:
-        CommonLogger.logger.log("[ERROR] get_label_values_and_probs(): no probability function supplied")
-        return None
+    tps = np.cumsum(y_label_values[order])[ends]
+    fps = ends + 1 - tps
 
-    for data in (dataset_property_accessor(dataset) if dataset_property_accessor else dataset):
-        y_labels.append(1 if (data_label_accessor(data) if data_label_accessor else data) else 0)
-        y_probs.append(probability_function(learning_output, data, *fargs))
+    tps = np.concatenate(([0], tps))
+    fps = np.concatenate(([0], fps))
 
-    return y_labels, y_probs
- 
-def calc_roc_auc(y_label_values, y_probs):
-    pairs = sorted(zip(y_probs, y_label_values), key=lambda x: x[0])
+    count_true  = tps[-1]
+    count_false = fps[-1]
 
-    ranks = range(1, len(pairs) + 1)
-    rank_sum = 0
-    ctx_label_true = 0
+    fpr = fps / count_false if count_false else np.zeros(fps.size)
+    tpr = tps / count_true if count_true else np.zeros(tps.size)
 
-    for rank_val, (_, label_value) in zip(ranks, pairs):
-        if label_value == True:
-            rank_sum += rank_val
-            ctx_label_true += 1
-
-    ctx_label_false = len(pairs) - ctx_label_true
+    return fpr, tpr, np.concatenate(([np.inf], y_probs[ends]))
 
+# area under ROC curve points, trapezoids over runs of tied probabilities count them as half ordered
+# (same as the mean rank Mann-Whitney statistic)
+def calc_curve_auc(fpr, tpr):
     # all same class
-    if ctx_label_true == 0 or ctx_label_false == 0:
+    if not fpr[-1] or not tpr[-1]:
         return 0.0
 
-    auc = (rank_sum - ctx_label_true * (ctx_label_true + 1) / 2) / (ctx_label_true * ctx_label_false)
-    return auc
+    return float(np.sum(np.diff(fpr) * (tpr[1:] + tpr[:-1])) / 2)
 
-def get_metrics(predictions, labels, learning_output, dataset, dataset_property_accessor, data_label_accessor, probability_function, *fargs):
+def calc_roc_auc(y_label_values, y_probs):
+    fpr, tpr, _ = calc_roc_curve(y_label_values, y_probs)
+    return calc_curve_auc(fpr, tpr)
+
+# accuracy, precision, recall and f1 score of predicting true for probabilities at or above each of the thresholds,
+# computed for all thresholds at once, as arrays in threshold order
+def calc_threshold_metrics(y_label_values, y_probs, thresholds):
+    y_label_values = np.asarray(y_label_values, dtype=bool)
+    y_probs        = np.asarray(y_probs, dtype=float)
+    thresholds     = np.asarray(thresholds, dtype=float)
+
+    probs_true  = np.sort(y_probs[y_label_values])
+    probs_false = np.sort(y_probs[~y_label_values])
+
+    tp = probs_true.size - np.searchsorted(probs_true, thresholds, side="left")
+    fp = probs_false.size - np.searchsorted(probs_false, thresholds, side="left")
+    fn = probs_true.size - tp
+    tn = probs_false.size - fp
+
+    with np.errstate(divide="ignore", invalid="ignore"):
+        precision = np.where(tp > 0, tp / (tp + fp), 0.0)
+        recall    = np.where(tp > 0, tp / (tp + fn), 0.0)
+        f1_score  = np.where(tp > 0, 2 * precision * recall / (precision + recall), 0.0)
+
+    return {
+        "thresholds": thresholds,
+        "TP":         tp,
+        "FP":         fp,
+        "FN":         fn,
+        "TN":         tn,
+        "accuracy":   (tp + tn) / y_probs.size if y_probs.size else np.zeros(thresholds.size),
+        "precision":  precision,
+        "recall":     recall,
+        "f1_score":   f1_score
+    }
+
+# metrics of a model from the predicted labels and probabilities of true labels it produced in a single pass
+# over the dataset, returns accuracy, precision, recall, f1 score, ROC-AUC, probabilities, label values
+# and the ROC curve as (false positive rates, true positive rates)
+@CommonProfiler.timed("metrics")
+def get_metrics(predictions, labels, y_probs):
     accuracy, precision, recall, f1_score = yield from get_basic_metrics(labels, predictions)
 
-    values_and_probs =  get_label_values_and_probs(
-                            learning_output, dataset,
-                            dataset_property_accessor, data_label_accessor,
-                            probability_function, *fargs
-                        )
+    y_labels = [1 if label else 0 for label in labels]
 
-    if not values_and_probs:
-        return [None] * 5
+    fpr, tpr, thresholds = calc_roc_curve(y_labels, y_probs)
+    roc_auc              = calc_curve_auc(fpr, tpr)
 
-    roc_auc = calc_roc_auc(*values_and_probs)
     CommonLogger.logger.log(f"ROC-AUC: {round(roc_auc, 4)}")
-    yield
 
-    y_labels, y_probs = values_and_probs
+    # the distinct probabilities are every threshold the predictions could be cut at
+    if thresholds.size > 1:
+        sweep = calc_threshold_metrics(y_labels, y_probs, thresholds[1:])
+        best  = int(np.argmax(sweep["f1_score"]))
+
+        CommonLogger.logger.log(f"Best F1-Score over probability thresholds: {round(float(sweep['f1_score'][best]), 4)} (true at probability >= {round(float(sweep['thresholds'][best]), 4)})")
+
+    yield
 
-    return accuracy, precision, recall, f1_score, roc_auc, y_probs, y_labels
+    return accuracy, precision, recall, f1_score, roc_auc, y_probs, y_labels, (fpr, tpr)
@@ -1,25 +1,71 @@
-class Instance:
-    def __init__(self, features, label_idx):
-        self.field_names = list(features.keys())
-        self.label_idx = label_idx
+from operator import itemgetter
 
-        for key in features:
-            setattr(self, key, features[key])
+# attributes the row classes define, a field accessor of the same name would hide them. tuple methods like count and
+# index can be field names, nothing calls them on instances
+RESERVED_FIELD_NAMES = ("label", "features", "field_names", "label_idx", "feature_indices")
 
-    @property
-    def features(self):
-        cpy = list(self.field_names)
-        cpy.pop(self.label_idx)
-        return [getattr(self, name) for name in cpy]
+# an instance is a tuple of its field values in schema order. a row class is generated once per
+# (field names, label idx), holding the field list, the label idx and an accessor per field,
+# so instances carry no per object dict or field list
+class Instance(tuple):
+    __slots__ = ()
+
+    field_names = ()
+    label_idx   = None
+
+    # (field names, label idx) -> generated row class
+    row_classes = {}
+
+    def __new__(cls, features, label_idx):
+        row_class = Instance.row_class(list(features.keys()), label_idx)
+        return tuple.__new__(row_class, features.values())
+
+    @staticmethod
+    def row_class(field_names, label_idx):
+        key       = (tuple(field_names), label_idx)
+        row_class = Instance.row_classes.get(key)
+
+        if row_class is None:
+            reserved = [name for name in field_names if name in RESERVED_FIELD_NAMES]
+
+            if reserved:
+                raise ValueError(f"field names {reserved} are reserved for instance attributes, rename them in the dataset")
+
+            feature_indices = [i for i in range(len(field_names)) if i != label_idx]
+
+            namespace = {name: property(itemgetter(i)) for i, name in enumerate(field_names)}
+            namespace.update({
+                "__slots__":       (),
+                "field_names":     key[0],
+                "label_idx":       label_idx,
+                "label":           property(itemgetter(label_idx)),
+                "feature_indices": feature_indices
+            })
+
+            row_class = type("Instance", (Instance,), namespace)
+            Instance.row_classes[key] = row_class
+
+        return row_class
+
+    # builds instances of the row class from sequences of values in schema order
+    @staticmethod
+    def from_values(row_class, value_rows):
+        return [tuple.__new__(row_class, values) for values in value_rows]
+
+    def __reduce__(self):
+        return (make_instance, (self.field_names, self.label_idx, tuple(self)))
 
     @property
-    def label(self):
-        return getattr(self, self.field_names[self.label_idx])
+    def features(self):
+        return [self[i] for i in self.feature_indices]
 
     def __repr__(self):
         str = ""
 
-        for name in self.field_names:
-            str += f"{name}: {getattr(self, name)}\n"
+        for name, value in zip(self.field_names, self):
+            str += f"{name}: {value}\n"
 
         return str[:-1]
+
+def make_instance(field_names, label_idx, values):
+    return tuple.__new__(Instance.row_class(field_names, label_idx), values)
@@ -1,13 +1,29 @@
 import io
 import sys
+import time
+
+from collections import deque
+
+# lines kept by a logger, older lines are dropped as new ones are logged
+DEFAULT_MAX_LINES = 10000
 
 class Logger:
-    def __init__(self, is_gui = False):
-        self.lines = []
-        self.last_read_idx = 0
+    def __init__(self, is_gui = False, max_lines = DEFAULT_MAX_LINES):
+        self.lines = deque(maxlen=max_lines)
         self.clrcount = 0
         self.is_gui = is_gui
 
+        # index of the next line to be logged, counting the dropped ones too
+        self.line_count = 0
+
+        # lines before last_read_idx were returned by read_new(), lines from dirty_idx on changed since
+        self.last_read_idx = 0
+        self.dirty_idx = 0
+
+    @property
+    def first_idx(self):
+        return self.line_count - len(self.lines)
+
     def log(self, message, end = '\n'):
         msg_str = str(message) + end
 
@@ -16,11 +32,12 @@ class Logger:
             print(msg_str, end = '')
 
         self.lines.append(msg_str)
+        self.line_count += 1
 
     def maybe_clear(self):
         if not self.is_gui:
             if self.clrcount:
-                sys.stdout.write("\033[F\033[K" * self.clrcount) 
+                sys.stdout.write("\033[F\033[K" * self.clrcount)
                 self.clrcount = 0
                 sys.stdout.flush()
 
@@ -30,20 +47,22 @@ class Logger:
         if not self.is_gui:
             self.maybe_clear()
 
-            sys.stdout.write("\033[F\033[K" * self.lines[-1].count('\n') + msg_str) 
+            sys.stdout.write("\033[F\033[K" * (self.lines[-1].count('\n') if self.lines else 0) + msg_str)
             sys.stdout.flush()
 
         if self.lines:
             self.lines[-1] = msg_str
+            self.dirty_idx = min(self.dirty_idx, self.line_count - 1)
         else:
             self.lines.append(msg_str)
+            self.line_count += 1
 
     def backtrack(self, count):
         count = min(count, len(self.lines))
 
         #if count <= 0: return
 
-        lines_affected = self.lines[-count:]
+        lines_affected = [self.lines[-i] for i in range(1, count + 1)]
 
         if not self.is_gui:
             self.maybe_clear()
@@ -52,12 +71,78 @@ class Logger:
         for _ in range(count):
             if self.lines:
                 self.lines.pop()
+                self.line_count -= 1
+
+        self.dirty_idx = min(self.dirty_idx, self.line_count)
 
     def read_all(self):
         return "".join(self.lines)
 
+    # lines logged or changed since the last call, as (start, lines): the reader replaces
+    # what it has from line index start on with lines. start is never before the first kept line
+    def read_new(self):
+        start = max(min(self.last_read_idx, self.dirty_idx), self.first_idx)
+
+        new_lines = [self.lines[i] for i in range(start - self.first_idx, len(self.lines))]
+
+        self.last_read_idx = self.dirty_idx = self.line_count
+
+        return start, new_lines
+
     def clear(self):
-        self.lines = []
+        self.lines.clear()
+        self.line_count = self.last_read_idx = self.dirty_idx = 0
+
+# text of a logger as seen by a reader of read_new(), keeping as many lines as the logger
+class LogView:
+    def __init__(self, max_lines = DEFAULT_MAX_LINES):
+        self.lines = deque(maxlen=max_lines)
+        self.first_idx = 0
+
+    # applies a read_new() delta, returns whether the text changed
+    def apply(self, start, new_lines):
+        keep    = start - self.first_idx
+        changed = bool(new_lines) or keep != len(self.lines)
+
+        if keep < 0 or keep > len(self.lines):
+            self.lines.clear()
+            self.first_idx = start
+        else:
+            for _ in range(len(self.lines) - keep):
+                self.lines.pop()
+
+        self.lines.extend(new_lines)
+        self.first_idx = start + len(new_lines) - len(self.lines)
+
+        return changed
+
+    def text(self):
+        return "".join(self.lines)
+
+# sends the read_new() deltas of a logger with send(start, lines), at most once per interval seconds unless forced.
+# deltas without new lines are sent too when they drop lines the reader has (e.g. after a backtrack), so that a
+# LogView applying every delta always shows the logger's text
+class LogSender:
+    def __init__(self, logger, send, interval):
+        self.logger    = logger
+        self.send      = send
+        self.interval  = interval
+        self.last_send = 0
+
+        # index of the line after the last one sent, what the reader has
+        self.sent_idx  = 0
+
+    def send_new_lines(self, force = False):
+        if not force and time.monotonic() - self.last_send < self.interval:
+            return
+
+        start, lines = self.logger.read_new()
+
+        if lines or start < self.sent_idx:
+            self.send(start, lines)
+
+        self.sent_idx  = start + len(lines)
+        self.last_send = time.monotonic()
 
 # shared instance will be initiated from main
 logger = None
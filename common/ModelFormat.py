@@ -0,0 +1,326 @@
+import json
+import math
+import struct
+import builtins
+
+import numpy as np
+
+from common.ColumnarFormat import aligned
+from common.Features import FeatureType
+from common.Transaction import TransactionItem, TransactionItemset
+from decision_tree.TreeNode import TreeNode
+
+# compact model file layout, same container as the columnar dataset format:
+#   MAGIC (8 bytes), version (uint32), header length (uint32),
+#   header: utf-8 json with the model "kind", its "meta" (names, string tables, threshold maps)
+#           and for every array its "name", numpy "dtype", "shape" and "offset",
+#   array buffers, each starting at a multiple of ALIGNMENT bytes,
+#   offsets are relative to the first aligned position after the header.
+MAGIC     = b"BLMMODL\0"
+VERSION   = 1
+
+EXTENSION = ".model"
+
+def to_json(obj):
+    # numpy scalars that json doesn't know of, e.g thresholds computed with numpy
+    if isinstance(obj, np.generic):
+        return obj.item()
+
+    raise TypeError(f"Object of type {type(obj).__name__} is not JSON serializable")
+
+def save_model(file_path, kind, meta, arrays):
+    array_headers = []
+    offset        = 0
+
+    for name, array in arrays.items():
+        array_headers.append({"name": name, "dtype": array.dtype.str, "shape": list(array.shape), "offset": offset})
+        offset = aligned(offset + array.nbytes)
+
+    header = json.dumps({"kind": kind, "meta": meta, "arrays": array_headers}, default=to_json).encode("utf-8")
+
+    data_start = aligned(len(MAGIC) + 8 + len(header))
+
+    with open(file_path, "wb") as f:
+        f.write(MAGIC)
+        f.write(struct.pack("<II", VERSION, len(header)))
+        f.write(header)
+
+        for array_header, array in zip(array_headers, arrays.values()):
+            f.seek(data_start + array_header["offset"])
+            f.write(np.ascontiguousarray(array).tobytes())
+
+        # pad the last array so the file covers every aligned offset
+        f.truncate(max(data_start + offset, f.tell()))
+
+def is_model_file(file_path):
+    with open(file_path, "rb") as f:
+        return f.read(len(MAGIC)) == MAGIC
+
+def read_header(f):
+    if f.read(len(MAGIC)) != MAGIC:
+        raise ValueError("not a model file")
+
+    version, header_len = struct.unpack("<II", f.read(8))
+
+    if version != VERSION:
+        raise ValueError(f"unsupported model file version: {version}")
+
+    return json.loads(f.read(header_len).decode("utf-8")), aligned(len(MAGIC) + 8 + header_len)
+
+# returns the header and the arrays (name -> read-only numpy array viewing the memory-mapped file)
+def load_model(file_path):
+    with open(file_path, "rb") as f:
+        header, data_start = read_header(f)
+
+    mapped = np.memmap(file_path, dtype=np.uint8, mode="r") if any(math.prod(a["shape"]) for a in header["arrays"]) else None
+    arrays = {}
+
+    for array_header in header["arrays"]:
+        dtype = np.dtype(array_header["dtype"])
+        count = math.prod(array_header["shape"])
+
+        if count:
+            array = np.frombuffer(mapped, dtype=dtype, count=count, offset=data_start + array_header["offset"])
+        else:
+            array = np.empty(0, dtype=dtype)
+
+        arrays[array_header["name"]] = array.reshape(array_header["shape"])
+
+    return header, arrays
+
+# json object keys are strings, so label keyed dicts are stored as pairs
+def label_pairs(label_dict):
+    return [[label, value] for label, value in label_dict.items()]
+
+# decision tree: nodes in preorder as parallel arrays. the edges of every node are stored contiguously
+# in node order, node_edge_count of them per node, an edge being a child node and the child's key
+# ("left"/"right" for numeric splits, the feature value for categorical ones) as an index into "keys".
+# predictions and is_categorical are -1 for None, thresholds NaN for None
+def encode_decision_tree(root):
+    features = {}
+    keys     = {}
+
+    nodes = []
+    edges = []
+
+    node_ids = {}
+    stack    = [root]
+
+    while stack:
+        node = stack.pop()
+        node_ids[id(node)] = len(nodes)
+        nodes.append(node)
+
+        stack.extend(reversed(list(node.children.values())))
+
+    def optional_flag(value):
+        return -1 if value is None else int(value)
+
+    rows = []
+
+    for node in nodes:
+        feature_id = -1
+
+        if node.feature_type is not None:
+            feature_id = features.setdefault(node.feature_type.name, (len(features), node.feature_type.value.__name__))[0]
+
+        rows.append((feature_id, len(node.children)))
+
+        for key, child in node.children.items():
+            edges.append((keys.setdefault((type(key).__name__, key), len(keys)), node_ids[id(child)]))
+
+    meta = {
+        "features": [[name, typename] for name, (_, typename) in features.items()],
+        "keys":     [key for _, key in keys.keys()]
+    }
+
+    arrays = {
+        "node_feature":        np.array([r[0] for r in rows], dtype="<i4"),
+        "node_edge_count":     np.array([r[1] for r in rows], dtype="<i4"),
+        "node_is_leaf":        np.array([n.is_leaf for n in nodes], dtype="|b1"),
+        "node_is_categorical": np.array([optional_flag(n.is_categorical) for n in nodes], dtype="i1"),
+        "node_prediction":     np.array([optional_flag(n.prediction) for n in nodes], dtype="i1"),
+        "node_threshold":      np.array([math.nan if n.threshold is None else n.threshold for n in nodes], dtype="<f8"),
+        "node_n_samples":      np.array([n.n_samples for n in nodes], dtype="<i4"),
+        "node_n_pred":         np.array([n.n_pred for n in nodes], dtype="<i4"),
+        "edge_key":            np.array([e[0] for e in edges], dtype="<i4"),
+        "edge_child":          np.array([e[1] for e in edges], dtype="<i4")
+    }
+
+    return meta, arrays
+
+def decode_decision_tree(meta, arrays):
+    features = [FeatureType([name, getattr(builtins, typename)], []) for name, typename in meta["features"]]
+    keys     = meta["keys"]
+
+    columns = {name: array.tolist() for name, array in arrays.items()}
+
+    def optional_flag(value):
+        return None if value == -1 else bool(value)
+
+    nodes = []
+
+    for i, feature_id in enumerate(columns["node_feature"]):
+        threshold = columns["node_threshold"][i]
+
+        nodes.append(TreeNode(
+            is_leaf        = columns["node_is_leaf"][i],
+            prediction     = optional_flag(columns["node_prediction"][i]),
+            feature_type   = features[feature_id] if feature_id != -1 else None,
+            threshold      = None if math.isnan(threshold) else threshold,
+            is_categorical = optional_flag(columns["node_is_categorical"][i]),
+            n_samples      = columns["node_n_samples"][i],
+            n_pred         = columns["node_n_pred"][i]
+        ))
+
+    edges = zip(columns["edge_key"], columns["edge_child"])
+
+    for node, count in zip(nodes, columns["node_edge_count"]):
+        for _ in range(count):
+            key, child = next(edges)
+            node.children[keys[key]] = nodes[child]
+
+    return nodes[0] if nodes else None
+
+CBA_RULE_STATS = ["lift", "m_estimate", "confidence", "support"]
+
+# CBA: rules in classifier order, the items of rule i are rule_items[rule_offsets[i]:rule_offsets[i + 1]],
+# indices into the "items" string table of (feature name, rule format) pairs
+def encode_CBA(data):
+    items      = {}
+    rule_items = []
+    offsets    = [0]
+
+    for rule in data["rules"]:
+        for item in sorted(rule["itemset"], key=lambda item: (item.feature_name, item.rule_format)):
+            rule_items.append(items.setdefault((item.feature_name, item.rule_format), len(items)))
+
+        offsets.append(len(rule_items))
+
+    meta = {
+        "items":                 [list(item) for item in items.keys()],
+        "rule_stats":            CBA_RULE_STATS,
+        "threshold_map":         data["threshold_map"],
+        "trainset_label_ratios": label_pairs(data["trainset_label_ratios"])
+    }
+
+    arrays = {
+        "rule_offsets": np.array(offsets, dtype="<i8"),
+        "rule_items":   np.array(rule_items, dtype="<i4"),
+        "rule_labels":  np.array([rule["label"] for rule in data["rules"]], dtype="|b1"),
+        "rule_default": np.array([rule.get("default", False) for rule in data["rules"]], dtype="|b1"),
+        "rule_stats":   np.array([[rule.get(stat, math.nan) for stat in CBA_RULE_STATS] for rule in data["rules"]], dtype="<f8").reshape(-1, len(CBA_RULE_STATS))
+    }
+
+    return meta, arrays
+
+def decode_CBA(meta, arrays):
+    items   = [TransactionItem(fname, rule_format) for fname, rule_format in meta["items"]]
+    offsets = arrays["rule_offsets"].tolist()
+
+    rule_items = arrays["rule_items"].tolist()
+    stats      = arrays["rule_stats"].tolist()
+    rules      = []
+
+    for i, (label, is_default) in enumerate(zip(arrays["rule_labels"].tolist(), arrays["rule_default"].tolist())):
+        if is_default:
+            rules.append({"itemset": set(), "label": label, "default": True})
+            continue
+
+        rule = {"itemset": TransactionItemset([items[item_id] for item_id in rule_items[offsets[i]:offsets[i + 1]]]), "label": label}
+        rule.update(zip(meta["rule_stats"], stats[i]))
+
+        rules.append(rule)
+
+    return {
+        "rules":                 rules,
+        "threshold_map":         meta["threshold_map"],
+        "trainset_label_ratios": dict(meta["trainset_label_ratios"])
+    }
+
+# naive bayesian: the dense log probability table with its count matrix, rows follow the "items" table
+# of (feature name, rule format) pairs, where a null rule format is the row for unseen values
+def encode_naive_bayesian(data):
+    from naive_bayesian.NaiveBayesian import compile_log_probability_table
+
+    probability_table = data["probability_table"]
+    label_counts      = data["label_counts"]
+
+    log_table = data.get("log_probability_table") or compile_log_probability_table(probability_table, label_counts)
+    labels    = log_table["labels"]
+    items     = sorted(log_table["item_ids"].keys(), key=lambda item: log_table["item_ids"][item])
+
+    counts = [
+        [0] * len(labels) if fval is None else [probability_table[fname][fval][label] for label in labels]
+        for fname, fval in items
+    ]
+
+    meta = {
+        "labels":        labels,
+        "items":         [list(item) for item in items],
+        "threshold_map": data["threshold_map"]
+    }
+
+    arrays = {
+        "counts":          np.array(counts, dtype="<i8").reshape(-1, len(labels)),
+        "label_counts":    np.array([label_counts[label] for label in labels], dtype="<i8"),
+        "log_likelihoods": np.asarray(log_table["log_likelihoods"], dtype="<f8").reshape(-1, len(labels)),
+        "log_priors":      np.asarray(log_table["log_priors"], dtype="<f8")
+    }
+
+    return meta, arrays
+
+def decode_naive_bayesian(meta, arrays):
+    labels = meta["labels"]
+    items  = [tuple(item) for item in meta["items"]]
+
+    probability_table = {}
+
+    for (fname, fval), counts in zip(items, arrays["counts"].tolist()):
+        if fval is not None:
+            probability_table.setdefault(fname, {})[fval] = dict(zip(labels, counts))
+
+    return {
+        "probability_table": probability_table,
+        "threshold_map":     meta["threshold_map"],
+        "label_counts":      dict(zip(labels, arrays["label_counts"].tolist())),
+        "log_probability_table": {
+            "labels":          labels,
+            "item_ids":        {item: i for i, item in enumerate(items)},
+            "log_likelihoods": arrays["log_likelihoods"],
+            "log_priors":      arrays["log_priors"]
+        }
+    }
+
+CODECS = {
+    "decision_tree":  (encode_decision_tree, decode_decision_tree),
+    "CBA":            (encode_CBA, decode_CBA),
+    "naive_bayesian": (encode_naive_bayesian, decode_naive_bayesian)
+}
+
+def model_kind(data):
+    if isinstance(data, TreeNode):
+        return "decision_tree"
+    elif isinstance(data, dict) and "rules" in data:
+        return "CBA"
+    elif isinstance(data, dict) and "probability_table" in data:
+        return "naive_bayesian"
+
+    return None
+
+def save(data, file_path):
+    kind = model_kind(data)
+
+    if kind is None:
+        raise ValueError(f"no compact model format for {type(data).__name__} data")
+
+    meta, arrays = CODECS[kind][0](data)
+    save_model(file_path, kind, meta, arrays)
+
+def load(file_path):
+    header, arrays = load_model(file_path)
+
+    if header["kind"] not in CODECS:
+        raise ValueError(f"unknown model kind: {header['kind']}")
+
+    return CODECS[header["kind"]][1](header["meta"], arrays)
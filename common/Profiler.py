@@ -0,0 +1,134 @@
+import sys
+import json
+import time
+import inspect
+import functools
+import tracemalloc
+
+from contextlib import contextmanager, nullcontext
+
+import common.Logger as CommonLogger
+
+# named stage timers and counters of a run. stages nest, the time of a stage includes its nested stages.
+# with trace_memory, the peak traced memory of every stage is kept too
+class Profiler:
+    def __init__(self, trace_memory = False):
+        self.trace_memory = trace_memory
+        self.started      = time.perf_counter()
+        self.stages       = {}
+        self.counters     = {}
+
+        # peaks of the stages being run, outermost first, the peak of a stage covers its nested stages
+        self.peaks = []
+
+    @contextmanager
+    def stage(self, name):
+        if self.trace_memory:
+            if self.peaks:
+                self.peaks[-1] = max(self.peaks[-1], tracemalloc.get_traced_memory()[1])
+
+            tracemalloc.reset_peak()
+            self.peaks.append(0)
+
+        start = time.perf_counter()
+
+        try:
+            yield
+        finally:
+            elapsed = time.perf_counter() - start
+            stats   = self.stages.setdefault(name, {"calls": 0, "seconds": 0.0})
+
+            stats["calls"]   += 1
+            stats["seconds"] += elapsed
+
+            if self.trace_memory:
+                peak = max(self.peaks.pop(), tracemalloc.get_traced_memory()[1])
+                stats["peak_memory_bytes"] = max(stats.get("peak_memory_bytes", 0), peak)
+
+                if self.peaks:
+                    self.peaks[-1] = max(self.peaks[-1], peak)
+
+                tracemalloc.reset_peak()
+
+    def count(self, name, n = 1):
+        self.counters[name] = self.counters.get(name, 0) + n
+
+    def report(self):
+        return {
+            "total_seconds": time.perf_counter() - self.started,
+            "stages":        dict(sorted(self.stages.items(), key=lambda item: -item[1]["seconds"])),
+            "counters":      self.counters
+        }
+
+# shared instance, set while a run is profiled
+profiler = None
+
+# stage timer of the shared profiler, does nothing when the run isn't profiled
+def stage(name):
+    return profiler.stage(name) if profiler else nullcontext()
+
+def count(name, n = 1):
+    if profiler:
+        profiler.count(name, n)
+
+# decorator timing every call of a function as a stage, generator functions are timed until they return
+def timed(name):
+    def decorator(fnc):
+        if inspect.isgeneratorfunction(fnc):
+            @functools.wraps(fnc)
+            def wrapper(*args, **kwargs):
+                with stage(name):
+                    return (yield from fnc(*args, **kwargs))
+        else:
+            @functools.wraps(fnc)
+            def wrapper(*args, **kwargs):
+                with stage(name):
+                    return fnc(*args, **kwargs)
+
+        return wrapper
+
+    return decorator
+
+# runs task(*task_args) with the shared profiler set, under cProfile if cprofile_path is given (its stats
+# are written there) and tracemalloc if trace_memory, then writes the json report to report_path
+def run_profiled(report_path, trace_memory, cprofile_path, task, *task_args):
+    global profiler
+
+    profiler  = Profiler(trace_memory)
+    cprofiler = None
+
+    if cprofile_path:
+        import cProfile
+
+        cprofiler = cProfile.Profile()
+
+    if trace_memory:
+        tracemalloc.start()
+
+    if cprofiler:
+        cprofiler.enable()
+
+    try:
+        with profiler.stage("total"):
+            return task(*task_args)
+
+    finally:
+        if cprofiler:
+            cprofiler.disable()
+            cprofiler.dump_stats(cprofile_path)
+
+        report = profiler.report()
+        report["command"] = sys.argv[1:]
+
+        if cprofile_path:
+            report["cprofile_stats"] = cprofile_path
+
+        if trace_memory:
+            tracemalloc.stop()
+
+        with open(report_path, "w") as f:
+            json.dump(report, f, indent=2)
+
+        CommonLogger.logger.log(f"Wrote profile report into file: {report_path}")
+
+        profiler = None
@@ -0,0 +1,70 @@
+import time
+
+import common.Logger as CommonLogger
+
+# seconds between two renders of a progress line, 10 per second
+REPORT_INTERVAL = 0.1
+
+# the clock is only looked at every CHECK_EVERY advances
+CHECK_EVERY = 16
+
+# progress of a loop as a single log line. the loop advances a counter, the line is logged and updated
+# in place at most once per interval, whatever the iteration count. advance() returns True when it rendered,
+# which is when the loop's generator should yield:
+#
+#   progress = Progress("Iterating through candidates... ", len(candidates))
+#
+#   for candidate in candidates:
+#       if progress.advance():
+#           yield
+#       ...
+#
+#   progress.close()
+class Progress:
+    def __init__(self, message, total = None, interval = REPORT_INTERVAL):
+        self.message  = message
+        self.total    = total
+        self.count    = 0
+        self.interval = interval
+
+        self.next_check  = CHECK_EVERY
+        self.last_render = time.monotonic()
+        self.is_logged   = False
+
+    def advance(self, n = 1):
+        self.count += n
+
+        if self.count < self.next_check:
+            return False
+
+        self.next_check = self.count + CHECK_EVERY
+
+        if time.monotonic() - self.last_render < self.interval:
+            return False
+
+        self.render()
+        return True
+
+    # counts from count again under message, for the next pass of an outer loop
+    def restart(self, message, count = 0):
+        self.message    = message
+        self.count      = count
+        self.next_check = count + CHECK_EVERY
+
+    # logs the line or updates it with the current count
+    def render(self):
+        text = self.message + (f"{self.count}/{self.total}" if self.total is not None else f"{self.count}")
+
+        if self.is_logged:
+            CommonLogger.logger.update_last(text)
+        else:
+            CommonLogger.logger.log(text)
+            self.is_logged = True
+
+        self.last_render = time.monotonic()
+
+    # removes the line if it was logged
+    def close(self):
+        if self.is_logged:
+            CommonLogger.logger.backtrack(1)
+            self.is_logged = False
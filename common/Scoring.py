@@ -0,0 +1,310 @@
+import os
+import csv
+import multiprocessing
+
+import numpy as np
+
+from collections import deque
+
+import common.Utils as CommonUtils
+import common.Logger as CommonLogger
+import common.ColumnarFormat as ColumnarFormat
+
+from common.Dataset import DatasetSchema, column_converter
+from common.Transaction import TransactionItem, TransactionEncoder
+
+import decision_tree.DecisionTree as DecisionTree
+import CBA.CBA as CBA
+import naive_bayesian.NaiveBayesian as NaiveBayesian
+
+# scorers hold a loaded model and score columns (feature name -> numpy array) of size instances,
+# returning the predicted labels and the probabilities of true labels. the encoders of scorers only know
+# the categorical values of their model, so scoring doesn't change them
+
+class DecisionTreeScorer:
+    def __init__(self, root, feature_types, label_idx):
+        self.root = root
+
+    def score(self, columns, size):
+        return DecisionTree.predict_batch(columns, self.root)
+
+class CBAScorer:
+    def __init__(self, pickled_data, feature_types, label_idx):
+        self.rules        = pickled_data["rules"]
+        self.label_ratios = pickled_data["trainset_label_ratios"]
+        self.encoder      = TransactionEncoder(
+            feature_types, label_idx, pickled_data["threshold_map"],
+            [item for rule in self.rules if not rule.get("default", False) for item in rule["itemset"]]
+        )
+
+    def score(self, columns, size):
+        item_matrix, _ = self.encoder.encode_columns(columns, size)
+        transactions   = self.encoder.to_transactions(item_matrix, np.full(size, None, dtype=object))
+
+        return CBA.predict_batch(transactions, self.rules, self.label_ratios)
+
+class NaiveBayesianScorer:
+    def __init__(self, pickled_data, feature_types, label_idx):
+        self.log_table = pickled_data.get("log_probability_table") or NaiveBayesian.compile_log_probability_table(pickled_data["probability_table"], pickled_data["label_counts"])
+        self.encoder   = TransactionEncoder(
+            feature_types, label_idx, pickled_data["threshold_map"],
+            [TransactionItem(fname, fval) for fname, fval in self.log_table["item_ids"]]
+        )
+
+        self.log_table_rows = NaiveBayesian.log_table_rows(self.encoder.items, self.log_table)
+
+    def score(self, columns, size):
+        item_matrix, _ = self.encoder.encode_columns(columns, size)
+
+        return NaiveBayesian.predict_batch(self.log_table_rows[item_matrix], self.log_table)
+
+SCORERS = {
+    "decision_tree":  DecisionTreeScorer,
+    "CBA":            CBAScorer,
+    "naive_bayesian": NaiveBayesianScorer
+}
+
+# loads the model of algorithm at pickle_path for instances of the given schema, None on failure
+def load_scorer(algorithm, pickle_path, feature_types, label_idx):
+    model = CommonUtils.load_pickle(pickle_path)
+
+    if not model:
+        return None
+
+    try:
+        return SCORERS[algorithm](model, feature_types, label_idx)
+    except (KeyError, TypeError, ValueError) as e:
+        CommonLogger.logger.log(f"[ERROR] {pickle_path} isn't a usable {algorithm} model: {e}")
+        return None
+
+# converts instances into rows of typed feature values in schema order, without the label.
+# an instance is either a list of values in schema order, with or without its label, or a dict of feature name -> value
+class RowConverter:
+    def __init__(self, feature_types, label_idx):
+        ftypes = list(feature_types.values())
+
+        self.label_idx     = label_idx
+        self.feature_names = [ftype.name for i, ftype in enumerate(ftypes) if i != label_idx]
+        self.field_count   = len(ftypes)
+        self.converters    = [column_converter(ftype.value) for i, ftype in enumerate(ftypes) if i != label_idx]
+
+    def convert(self, instances):
+        rows = []
+
+        for instance in instances:
+            if isinstance(instance, dict):
+                try:
+                    rows.append([instance[name] for name in self.feature_names])
+                except KeyError as e:
+                    raise ValueError(f"instance is missing feature {e}")
+            elif isinstance(instance, (list, tuple)):
+                if len(instance) == self.field_count:
+                    rows.append([value for i, value in enumerate(instance) if i != self.label_idx])
+                elif len(instance) == len(self.feature_names):
+                    rows.append(list(instance))
+                else:
+                    raise ValueError(f"instance has {len(instance)} values, expected {len(self.feature_names)} features or {self.field_count} fields")
+            else:
+                raise ValueError(f"instance must be a list or an object, got {type(instance).__name__}")
+
+        if not rows:
+            return rows
+
+        columns = [convert(column) for convert, column in zip(self.converters, zip(*rows))]
+
+        return [list(row) for row in zip(*columns)]
+
+    # converted rows -> columns for the scorers
+    def to_columns(self, rows):
+        return {name: np.array(column) for name, column in zip(self.feature_names, zip(*rows))}
+
+# yields the instances of a csv, json or columnar dataset file to score in chunks of at most chunk_size,
+# as (ids, payload) pairs. ids are the values of id_field, or row numbers without one. the payload is
+# {"rows": raw feature values in feature_names order} or, for columnar files, {"columns": typed feature columns, "size": n}
+def iter_scoring_chunks(infile, chunk_size, feature_names, id_field = None):
+    file_ext = os.path.splitext(infile)[1]
+
+    def require_fields(available):
+        missing = [name for name in feature_names + ([id_field] if id_field else []) if name not in available]
+
+        if missing:
+            raise ValueError(f"{infile} doesn't have the fields: {missing}")
+
+    if file_ext == ColumnarFormat.EXTENSION:
+        header, columns = ColumnarFormat.load_columnar_dataset(infile)
+        require_fields(columns)
+
+        size = header["size"]
+
+        for start in range(0, size, chunk_size):
+            end = min(size, start + chunk_size)
+            ids = columns[id_field][start:end].tolist() if id_field else list(range(start, end))
+
+            yield ids, {"columns": {name: columns[name][start:end] for name in feature_names}, "size": end - start}
+
+    elif file_ext == '.csv':
+        with open(infile, newline='') as csvfile:
+            reader = csv.reader(csvfile, delimiter=',')
+            header = next(reader, None)
+
+            if header is None:
+                raise ValueError(f"{infile} is empty")
+
+            require_fields(header)
+
+            positions = [header.index(name) for name in feature_names]
+            id_pos    = header.index(id_field) if id_field else None
+
+            ids, rows = [], []
+            row_num   = 0
+
+            for row in reader:
+                if not row:
+                    continue
+
+                if len(row) < len(header):
+                    raise ValueError(f"{infile} line {reader.line_num} has {len(row)} fields, expected {len(header)}")
+
+                rows.append([row[pos] for pos in positions])
+                ids.append(row[id_pos] if id_pos is not None else row_num)
+                row_num += 1
+
+                if len(rows) == chunk_size:
+                    yield ids, {"rows": rows}
+                    ids, rows = [], []
+
+            if rows:
+                yield ids, {"rows": rows}
+
+    elif file_ext == '.json':
+        # the instances are streamed like the chunks of iter_dataset_chunks, the field layout is read from the header first
+        header = CommonUtils.read_json_header(infile)
+
+        if not CommonUtils.field_exists_in_dict(header, "field_descriptions"):
+            raise ValueError(f"{infile} is a malformed dataset")
+
+        field_names = list(header["field_descriptions"].keys())
+        require_fields(field_names)
+
+        positions = [field_names.index(name) for name in feature_names]
+        id_pos    = field_names.index(id_field) if id_field else None
+
+        ids, rows = [], []
+
+        for row_num, inst in enumerate(CommonUtils.iter_json_instances(infile, {})):
+            if len(inst) < len(field_names):
+                raise ValueError(f"{infile} instance {row_num} has {len(inst)} values, expected {len(field_names)}")
+
+            rows.append([inst[pos] for pos in positions])
+            ids.append(inst[id_pos] if id_pos is not None else row_num)
+
+            if len(rows) == chunk_size:
+                yield ids, {"rows": rows}
+                ids, rows = [], []
+
+        if rows:
+            yield ids, {"rows": rows}
+
+    else:
+        raise ValueError(f"unsupported file extension to score: {infile}, should be '.csv', '.json' or '{ColumnarFormat.EXTENSION}'")
+
+# scorer and row converter of this process, set up once per worker
+scoring_worker = None
+
+def init_scoring_worker(algorithm, pickle_path, feature_types, label_idx):
+    global scoring_worker
+
+    if CommonLogger.logger is None:
+        CommonLogger.logger = CommonLogger.Logger(False)
+
+    scorer = load_scorer(algorithm, pickle_path, feature_types, label_idx)
+
+    scoring_worker = (scorer, RowConverter(feature_types, label_idx)) if scorer else None
+
+def score_chunk(payload):
+    if scoring_worker is None:
+        raise ValueError("scoring worker has no model")
+
+    scorer, row_converter = scoring_worker
+
+    if "rows" in payload:
+        rows = row_converter.convert(payload["rows"])
+        return scorer.score(row_converter.to_columns(rows), len(rows))
+
+    return scorer.score(payload["columns"], payload["size"])
+
+# scores every instance of args.infile with the args.algorithm model at args.pickle_path, writing a csv of
+# id, prediction and probability of true label per instance to args.outfile. the input is read chunk by chunk
+# and with more than one worker, chunks are scored in worker processes with at most two chunks per worker in flight
+def predict_file(args):
+    if not CommonUtils.load_dataset_schema(args.schema_infile):
+        return None
+
+    feature_types = DatasetSchema.feature_types
+    label_idx     = DatasetSchema.label_idx
+    feature_names = RowConverter(feature_types, label_idx).feature_names
+
+    if args.chunk_size <= 0 or args.workers <= 0:
+        CommonLogger.logger.log(f"[ERROR] chunk size and workers must be positive, chunk size: {args.chunk_size}, workers: {args.workers}")
+        return None
+
+    init_scoring_worker(args.algorithm, args.pickle_path, feature_types, label_idx)
+
+    if scoring_worker is None:
+        return None
+
+    out_path = os.path.normpath(args.outfile)
+    directory, filename = os.path.split(out_path)
+
+    if directory != '' and not os.path.exists(directory):
+        os.makedirs(directory)
+
+    pool     = multiprocessing.Pool(args.workers, initializer=init_scoring_worker, initargs=(args.algorithm, args.pickle_path, feature_types, label_idx)) if args.workers > 1 else None
+    pending  = deque()
+    scored   = 0
+    replaced = False
+
+    CommonLogger.logger.log(f"Scoring {args.infile} with the {args.algorithm} model...")
+    yield
+
+    try:
+        with open(out_path + ".part", "w", newline='') as outfile:
+            writer = csv.writer(outfile)
+            writer.writerow([args.id_field or "row", "prediction", "probability_true"])
+
+            def write_next():
+                ids, result = pending.popleft()
+                predictions, probs = result.get() if pool else result
+
+                writer.writerows(zip(ids, predictions, probs))
+
+                return len(ids)
+
+            for ids, payload in iter_scoring_chunks(args.infile, args.chunk_size, feature_names, args.id_field):
+                pending.append((ids, pool.apply_async(score_chunk, (payload,)) if pool else score_chunk(payload)))
+
+                if len(pending) >= (2 * args.workers if pool else 1):
+                    scored += write_next()
+                    CommonLogger.logger.update_last(f"Scoring {args.infile} with the {args.algorithm} model... {scored} instances")
+                    yield
+
+            while pending:
+                scored += write_next()
+
+        os.replace(out_path + ".part", out_path)
+        replaced = True
+
+    except (FileNotFoundError, ValueError, TypeError) as e:
+        CommonLogger.logger.log(f"[ERROR] {e}")
+        return None
+
+    finally:
+        if pool:
+            pool.terminate()
+
+        # whatever stopped the scoring (including KeyboardInterrupt or an unexpected error), a partial output isn't left behind
+        if not replaced and os.path.exists(out_path + ".part"):
+            os.remove(out_path + ".part")
+
+    CommonLogger.logger.update_last(f"Scoring {args.infile} with the {args.algorithm} model... Completed Successfully, {scored} instances")
+    CommonLogger.logger.log(f"[INFO] Predictions written to {out_path}")
@@ -1,3 +1,7 @@
+import numpy as np
+
+import common.Profiler as CommonProfiler
+
 class TransactionItem:
     def __init__(self, feature_name, rule_format):
         self.feature_name = feature_name
@@ -110,38 +114,108 @@ class TransactionItemset:
     def __hash__(self):
         return hash(frozenset(self.items))
 
-def apply_thresholds(dataset, threshold_map):
-    transactions = []
+# encodes datasets into integer item matrices column by column.
+# items of numeric features are the bins between thresholds, created once per bin,
+# items of categorical features are their values, added to the vocabulary as they are seen.
+# given the known_items of a model, the vocabularies are fixed to those instead, and the values
+# the model hasn't seen are encoded as a single unknown item of their feature (rule format None)
+class TransactionEncoder:
+    def __init__(self, feature_types, label_idx, threshold_map, known_items = None):
+        feature_types = list(feature_types.values())
 
-    for instance in dataset.instances:
-        items = []
-        feature_types = list(dataset.feature_types.values())
-        label = feature_types[dataset.label_idx]
+        self.label_name = feature_types[label_idx].name
+        self.features   = [ftype for i, ftype in enumerate(feature_types) if i != label_idx]
 
-        feature_types.pop(dataset.label_idx)
+        # items[item_id] is the TransactionItem the id stands for
+        self.items = []
 
-        for i, feature_type in enumerate(feature_types):
+        self.thresholds   = {}
+        self.bin_item_ids = {}
+        self.vocabularies = {}
+
+        # feature name -> item id of its unknown values, only with fixed vocabularies
+        self.unknown_item_ids = {}
+
+        for feature_type in self.features:
             feature_name = feature_type.name
-            value = getattr(instance, feature_name)
 
             if feature_type.is_numeric:
-                tmap = threshold_map[feature_name]
-                is_placed = False
+                tmap = threshold_map.get(feature_name)
+
+                if not tmap:
+                    raise ValueError(f"no thresholds to encode numeric feature: {feature_name}")
+
+                rule_strs  = [f"{feature_name} <= {tmap[0]}"]
+                rule_strs += [f"{tmap[j - 1]} < {feature_name} <= {tmap[j]}" for j in range(1, len(tmap))]
+                rule_strs += [f"{feature_name} > {tmap[-1]}"]
+
+                self.thresholds[feature_name]   = np.array(tmap, dtype=float)
+                self.bin_item_ids[feature_name] = np.array([self.add_item(feature_name, rule_str) for rule_str in rule_strs], dtype=np.int64)
+            else:
+                self.vocabularies[feature_name] = {}
+
+                if known_items is not None:
+                    self.unknown_item_ids[feature_name] = self.add_item(feature_name, None)
+
+        if known_items is not None:
+            known_items = {item for item in known_items if item.feature_name in self.vocabularies and item.rule_format is not None}
+
+            for item in sorted(known_items, key=lambda item: (item.feature_name, item.rule_format)):
+                self.vocabularies[item.feature_name][item.rule_format] = self.add_item(item.feature_name, item.rule_format)
 
-                for j in range(len(tmap)):
-                    if value <= tmap[j]:
-                        rule_str = f"{feature_name} <= {tmap[j]}" if j == 0 else f"{tmap[j - 1]} < {feature_name} <= {tmap[j]}"
-                        items.append(TransactionItem(feature_name, rule_str))
-                        is_placed = True
-                        break
+    def add_item(self, feature_name, rule_format):
+        self.items.append(TransactionItem(feature_name, rule_format))
+        return len(self.items) - 1
 
-                if not is_placed:
-                    items.append(TransactionItem(feature_name, f"{feature_name} > {tmap[-1]}"))
+    # returns the item matrix, item_matrix[i][j] is the item id of the j'th feature of the i'th instance,
+    # and the label column
+    def encode(self, dataset):
+        return self.encode_columns(dataset.get_columns(), dataset.size)
 
+    # same as encode, for columns (feature name -> numpy array) of size instances,
+    # the label column is None if columns doesn't have one
+    def encode_columns(self, columns, size):
+        item_matrix = np.empty((size, len(self.features)), dtype=np.int64)
+
+        for j, feature_type in enumerate(self.features):
+            feature_name = feature_type.name
+            column = columns[feature_name]
+
+            if feature_type.is_numeric:
+                # first bin whose threshold is >= value, or the last bin
+                bins = np.searchsorted(self.thresholds[feature_name], column, side='left')
+                item_matrix[:, j] = self.bin_item_ids[feature_name][bins]
             else:
-                items.append(TransactionItem(feature_name, f"{feature_name} = {value}"))
+                vocabulary = self.vocabularies[feature_name]
+                unknown_id = self.unknown_item_ids.get(feature_name)
+                values, inverse = np.unique(column, return_inverse=True)
+
+                value_item_ids = []
+
+                for value in values.tolist():
+                    rule_format = f"{feature_name} = {value}"
 
-        itemset = TransactionItemset(items)
-        transactions.append( {"itemset": itemset, "label": getattr(instance, label.name)} )
+                    if rule_format not in vocabulary:
+                        if unknown_id is not None:
+                            value_item_ids.append(unknown_id)
+                            continue
 
-    return transactions
+                        vocabulary[rule_format] = self.add_item(feature_name, rule_format)
+
+                    value_item_ids.append(vocabulary[rule_format])
+
+                item_matrix[:, j] = np.array(value_item_ids, dtype=np.int64)[inverse.reshape(-1)]
+
+        return item_matrix, columns.get(self.label_name)
+
+    def to_transactions(self, item_matrix, labels):
+        items = self.items
+        return [
+            {"itemset": TransactionItemset([items[item_id] for item_id in row]), "label": label}
+            for row, label in zip(item_matrix.tolist(), labels.tolist())
+        ]
+
+@CommonProfiler.timed("apply_thresholds")
+def apply_thresholds(dataset, threshold_map):
+    encoder = TransactionEncoder(dataset.feature_types, dataset.label_idx, threshold_map)
+    return encoder.to_transactions(*encoder.encode(dataset))
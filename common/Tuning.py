@@ -0,0 +1,313 @@
+import os
+import csv
+import random
+import itertools
+import multiprocessing
+
+import numpy as np
+
+import common.Utils as CommonUtils
+import common.Helpers as CommonHelpers
+import common.Logger as CommonLogger
+import common.Discretizer as Discretizer
+
+from common.Dataset import Dataset
+from common.Transaction import apply_thresholds
+
+import CBA.CBA as CBA
+import CBA.CBAHelpers as CBAHelpers
+
+import decision_tree.DecisionTree as DecisionTree
+import decision_tree.DecisionTreeHelpers as DecisionTreeHelpers
+import decision_tree.TreeBuilder as TreeBuilder
+
+METRICS = ["accuracy", "precision", "recall", "f1_score", "roc_auc"]
+
+# tuners build a model per setting (grid parameter name -> value) of settings on a fold's trainset,
+# returning the predicted labels and probabilities of true labels of the fold's testset per setting.
+# settings of a tuner that shares work across them are evaluated together, one fold at a time
+
+class DecisionTreeTuner:
+    grid_params = ["max_depth", "min_samples_split", "min_info_gain", "min_samples_leaf", "min_samples_leaf_kary"]
+
+    # every setting grows a tree of its own, so each is evaluated on its own
+    shares_fold_work = False
+
+    def evaluate(self, args, trainset, testset, settings):
+        TreeBuilder.USE_GINI = args.use_gini
+
+        results = []
+
+        for setting in settings:
+            TreeBuilder.MAX_DEPTH         = setting["max_depth"]
+            TreeBuilder.MIN_SAMPLES_SPLIT = setting["min_samples_split"]
+            TreeBuilder.MIN_GAIN          = setting["min_info_gain"]
+
+            DecisionTreeHelpers.MIN_SAMPLES_LEAF      = setting["min_samples_leaf"]
+            DecisionTreeHelpers.MIN_SAMPLES_LEAF_KARY = setting["min_samples_leaf_kary"]
+
+            root = yield from TreeBuilder.build_tree(trainset)
+            yield from TreeBuilder.collapse_pure_subtrees(root)
+
+            results.append(DecisionTree.predict_batch(testset.get_columns(), root))
+
+        return results
+
+class CBATuner:
+    grid_params = ["max_k", "min_support", "min_confidence", "min_lift"]
+
+    # the fold is discretized and mined once at the lowest support and highest max k of the settings,
+    # the frequent itemsets of every setting are filtered from those
+    shares_fold_work = True
+
+    def evaluate(self, args, trainset, testset, settings):
+        threshold_map = yield from Discretizer.best_thresholds_for_features(trainset, args.max_split_count, args.min_bin_frac, args.delta_cost)
+
+        if not threshold_map:
+            return None
+
+        train_transactions = apply_thresholds(trainset, threshold_map)
+        test_transactions  = apply_thresholds(testset, threshold_map)
+
+        mined_frequent_itemsets, vertical_index = yield from CBAHelpers.apriori(
+            train_transactions, min(s["min_support"] for s in settings), max(s["max_k"] for s in settings)
+        )
+
+        results = []
+
+        for setting in settings:
+            all_frequent_itemsets = CBAHelpers.filter_frequent_itemsets(mined_frequent_itemsets, len(train_transactions), setting["min_support"], setting["max_k"])
+
+            rules, label_distribution = yield from CBA.rules_from_frequent_itemsets(
+                all_frequent_itemsets, train_transactions, vertical_index,
+                setting["min_support"], setting["min_confidence"], setting["min_lift"],
+                args.error_weights, args.m_estimate_weights
+            )
+
+            results.append(CBA.predict_batch(test_transactions, rules, label_distribution))
+
+        return results
+
+TUNERS = {
+    "decision_tree": DecisionTreeTuner,
+    "CBA":           CBATuner
+}
+
+# fold index of every instance: the instances of each label are shuffled with seed and dealt to the folds
+# in turn, continuing from where the previous label left off, so every fold gets the label ratios of the
+# whole dataset and fold sizes differ by one at most
+def assign_folds(labels, fold_count, seed):
+    labels = np.asarray(labels, dtype=bool)
+    rng    = random.Random(seed)
+    folds  = np.empty(labels.size, dtype=np.int64)
+    dealt  = 0
+
+    for label in (True, False):
+        indices = np.flatnonzero(labels == label).tolist()
+        rng.shuffle(indices)
+
+        folds[indices] = (dealt + np.arange(len(indices))) % fold_count
+        dealt += len(indices)
+
+    return folds
+
+# trainset and testset of a fold, sliced from the columns of dataset
+def split_fold(dataset, folds, fold):
+    is_test = (folds == fold)
+
+    columns  = dataset.get_columns()
+    trainset = Dataset.from_columns({name: column[~is_test] for name, column in columns.items()})
+    testset  = Dataset.from_columns({name: column[is_test] for name, column in columns.items()})
+
+    return trainset, testset
+
+# same metrics as CommonHelpers.get_metrics, without logging them
+def fold_metrics(labels, predictions, y_probs):
+    _, accuracy, precision, recall, f1_score = CommonHelpers.calc_basic_metrics(labels, predictions)
+
+    return {
+        "accuracy":  accuracy,
+        "precision": precision,
+        "recall":    recall,
+        "f1_score":  f1_score,
+        "roc_auc":   CommonHelpers.calc_roc_auc(labels, y_probs)
+    }
+
+# dataset, fold assignment and tuner of this process, set up once per worker.
+# the trainset and testset of the last evaluated fold are kept for the next task of the same fold
+tuning_worker = None
+
+def init_tuning_worker(args):
+    global tuning_worker
+
+    if CommonLogger.logger is None:
+        CommonLogger.logger = CommonLogger.Logger(False)
+
+    tuning_worker = None
+
+    dataset = CommonUtils.load_dataset(args.trainset_infile, args.entropy_weights)
+
+    if not dataset:
+        return
+
+    if dataset.size < args.folds:
+        CommonLogger.logger.log(f"[ERROR] {args.trainset_infile} has fewer instances than folds: {dataset.size}")
+        return
+
+    labels = dataset.get_columns()[list(dataset.feature_types.keys())[dataset.label_idx]]
+
+    tuning_worker = {
+        "args":    args,
+        "dataset": dataset,
+        "folds":   assign_folds(labels, args.folds, args.seed),
+        "tuner":   TUNERS[args.model](),
+        "split":   None
+    }
+
+# evaluates the (index, setting) pairs of a task on its fold, returns the fold and the metrics of every setting
+# as (index, metrics) pairs, or None if the tuner couldn't build the models
+def evaluate_fold(task):
+    if tuning_worker is None:
+        raise ValueError("tuning worker has no dataset")
+
+    fold, indexed_settings = task
+
+    if tuning_worker["split"] is None or tuning_worker["split"][0] != fold:
+        tuning_worker["split"] = (fold, *split_fold(tuning_worker["dataset"], tuning_worker["folds"], fold))
+
+    _, trainset, testset = tuning_worker["split"]
+
+    labels = testset.get_columns()[list(testset.feature_types.keys())[testset.label_idx]].tolist()
+
+    # the models log their progress as they would in a build, keep it out of the tuning's output
+    logger = CommonLogger.logger
+    CommonLogger.logger = CommonLogger.Logger(True)
+
+    try:
+        gen = tuning_worker["tuner"].evaluate(tuning_worker["args"], trainset, testset, [setting for _, setting in indexed_settings])
+
+        try:
+            while True:
+                next(gen)
+        except StopIteration as e:
+            results = e.value
+    finally:
+        CommonLogger.logger = logger
+
+    if results is None:
+        return fold, None
+
+    return fold, [(i, fold_metrics(labels, predictions, y_probs)) for (i, _), (predictions, y_probs) in zip(indexed_settings, results)]
+
+def format_setting(setting, names):
+    return ", ".join(f"{name}: {setting[name]}" for name in names)
+
+def save_results(out_path, grid_params, ranked):
+    out_path = os.path.normpath(out_path)
+    directory, filename = os.path.split(out_path)
+
+    if directory != '' and not os.path.exists(directory):
+        os.makedirs(directory)
+
+    with open(out_path, "w", newline='') as outfile:
+        writer = csv.writer(outfile)
+        writer.writerow(["rank"] + grid_params + [f"{metric}_{stat}" for metric in METRICS for stat in ("mean", "std")])
+
+        for rank, (setting, means, stds) in enumerate(ranked, start=1):
+            writer.writerow([rank] + [setting[name] for name in grid_params] + [value for metric in METRICS for value in (means[metric], stds[metric])])
+
+# k-fold cross-validation of every setting in the grid of args.model parameters (every combination of the values
+# given for each of them) on args.trainset_infile, in args.workers processes. work that doesn't depend on a setting
+# is done once per fold, settings are ranked by the mean of args.rank_by over the folds.
+# returns the ranked (setting, metric means, metric standard deviations)
+def tune(args):
+    tuner = TUNERS[args.model]
+
+    if args.folds < 2 or args.workers <= 0:
+        CommonLogger.logger.log(f"[ERROR] tuning needs at least 2 folds and a positive worker count, folds: {args.folds}, workers: {args.workers}")
+        return None
+
+    settings = [dict(zip(tuner.grid_params, values)) for values in itertools.product(*(getattr(args, name) for name in tuner.grid_params))]
+
+    # with worker processes, each of them loads the dataset, the parent only checks that its schema can be read
+    if args.workers == 1:
+        init_tuning_worker(args)
+
+        if tuning_worker is None:
+            return None
+
+    elif not CommonUtils.load_dataset_schema(args.trainset_infile):
+        return None
+
+    indexed_settings = list(enumerate(settings))
+
+    if tuner.shares_fold_work:
+        tasks = [(fold, indexed_settings) for fold in range(args.folds)]
+    else:
+        tasks = [(fold, [indexed_setting]) for fold in range(args.folds) for indexed_setting in indexed_settings]
+
+    pool   = multiprocessing.Pool(args.workers, initializer=init_tuning_worker, initargs=(args,)) if args.workers > 1 else None
+    scores = [{metric: [] for metric in METRICS} for _ in settings]
+
+    infostr = f"Cross-validating {len(settings)} {args.model} settings over {args.folds} folds..."
+
+    CommonLogger.logger.log(infostr)
+    yield
+
+    try:
+        results = pool.imap_unordered(evaluate_fold, tasks) if pool else map(evaluate_fold, tasks)
+
+        for done, (fold, fold_results) in enumerate(results, start=1):
+            if fold_results is None:
+                CommonLogger.logger.log(f"[ERROR] Couldn't build the {args.model} models of fold {fold + 1}")
+                return None
+
+            for i, metrics in fold_results:
+                for metric, value in metrics.items():
+                    scores[i][metric].append(value)
+
+            CommonLogger.logger.update_last(infostr + f" {done}/{len(tasks)} tasks")
+            yield
+
+    except ValueError as e:
+        # a worker couldn't load the dataset, it logged why
+        CommonLogger.logger.log(f"[ERROR] {e}")
+        return None
+
+    except KeyboardInterrupt:
+        CommonLogger.logger.log("Received KeyboardInterrupt, exiting.")
+        return None
+
+    finally:
+        if pool:
+            pool.terminate()
+
+    CommonLogger.logger.update_last(infostr + " Completed Successfully")
+
+    ranked = []
+
+    for setting, setting_scores in zip(settings, scores):
+        means = {metric: float(np.mean(values)) for metric, values in setting_scores.items()}
+        stds  = {metric: float(np.std(values)) for metric, values in setting_scores.items()}
+
+        ranked.append((setting, means, stds))
+
+    # ties keep the grid order
+    ranked.sort(key=lambda result: -result[1][args.rank_by])
+
+    # the table only tells settings apart by the parameters given more than one value
+    varied     = [name for name in tuner.grid_params if len(set(getattr(args, name))) > 1] or tuner.grid_params
+    name_width = max(len(format_setting(setting, varied)) for setting in settings)
+
+    CommonLogger.logger.log(f"\n{'rank':>4} | {'setting':<{name_width}} | " + " | ".join(f"{metric:<15}" for metric in METRICS))
+
+    for rank, (setting, means, stds) in enumerate(ranked, start=1):
+        CommonLogger.logger.log(f"{rank:>4} | {format_setting(setting, varied):<{name_width}} | " + " | ".join(f"{means[metric]:.4f} ± {stds[metric]:.4f}" for metric in METRICS))
+
+    yield
+
+    if args.outfile:
+        save_results(args.outfile, tuner.grid_params, ranked)
+        CommonLogger.logger.log(f"[INFO] Ranked results written to {os.path.normpath(args.outfile)}")
+
+    return ranked
@@ -3,33 +3,20 @@ import re
 import csv
 import json
 import pickle
+import random
 import builtins
+import operator
 
-from common.Dataset import DatasetSchema, Dataset
-from sklearn.model_selection import train_test_split
+from common.Dataset import DatasetSchema, Dataset, column_converter
+import common.ColumnarFormat as ColumnarFormat
+import common.ModelFormat as ModelFormat
 
 import common.Logger as CommonLogger
-
-def pop_ignored_indices(_data, _ignore_indices, label_idx_ref = None):
-    ignore_indices = sorted(_ignore_indices)
-    data = list(_data)
-
-    for i in range(len(ignore_indices)):
-        if label_idx_ref and label_idx_ref[0] > ignore_indices[i]:
-            label_idx_ref[0] -= 1
-
-        for j in range(i + 1, len(ignore_indices)):
-            if ignore_indices[j] > ignore_indices[i]:
-                ignore_indices[j] -= 1
-
-        data.pop(ignore_indices[i])
-
-    return data
+import common.Profiler as CommonProfiler
 
 def process_dataset(args):
     field_types = []
     ignore_indices = []
-    label_idx_ref = [args.label_idx]
 
     supported_types = frozenset([str, bool, int, float])
 
@@ -69,24 +56,178 @@ def process_dataset(args):
         CommonLogger.logger.log(f"[ERROR] ignore indices length should be 1 if it contains -1.")
         return None
 
-    if ignore_indices != [-1]:
-        field_types = pop_ignored_indices(field_types, ignore_indices, label_idx_ref)
-
-    dataset = load_dataset(args.dataset, preprocess=True, field_types=field_types, label_idx=label_idx_ref[0], ignore_indices=ignore_indices)
-
-    if not dataset:
+    if any(i < -1 or i >= len(field_types) for i in ignore_indices + [args.label_idx]) or args.label_idx == -1:
+        CommonLogger.logger.log(f"[ERROR] label idx and ignored indices must be valid field indices, field count: {len(field_types)}")
         return None
 
     if args.ratio <= 0 or args.ratio >= 1:
         CommonLogger.logger.log(f"[ERROR] Invalid testset to dataset ratio supplied: {args.ratio}, must be in range (0,1)")
         return None
 
-    testset, trainset = create_test_and_train_set(dataset, args.ratio, field_types)
+    if int(args.chunk_size) <= 0:
+        CommonLogger.logger.log(f"[ERROR] Invalid chunk size supplied: {args.chunk_size}, must be positive")
+        return None
+
+    # without a seed every run splits the dataset differently
+    seed = getattr(args, "seed", None)
+
+    yield from split_csv_dataset(args.dataset, field_types, ignore_indices, int(args.label_idx), args.ratio,
+                                 args.trainset_outfile, args.testset_outfile, int(args.chunk_size), seed)
+
+# reads the csv at csv_filepath in one pass, yielding the header and then lists of at most chunk_size rows
+# with the ignored columns dropped and every cell converted to its field type, a chunk at a time column by column
+def iter_csv_chunks(csv_filepath, field_types, keep_indices, chunk_size):
+    converters = [column_converter(field_types[i]) for i in keep_indices]
+    pick       = operator.itemgetter(*keep_indices) if len(keep_indices) > 1 else (lambda row: (row[keep_indices[0]],))
+
+    def convert_chunk(chunk, last_line):
+        try:
+            columns = [convert(column) for convert, column in zip(converters, zip(*chunk))]
+        except ValueError:
+            raise ValueError(f"Dataset isn't compatible with the supplied field types, lines: {last_line - len(chunk) + 1}-{last_line}")
+
+        return [list(row) for row in zip(*columns)]
+
+    with open(csv_filepath, newline='') as csvfile:
+        reader = csv.reader(csvfile, delimiter=',')
+        header = next(reader, None)
+
+        if header is None:
+            raise ValueError("Empty dataset file")
+
+        if len(header) < len(field_types):
+            raise ValueError("Dataset header length doesn't match field types")
+
+        yield list(pick(header))
+
+        chunk = []
+
+        for row in reader:
+            if not row:
+                continue
+
+            if len(row) < len(field_types):
+                raise ValueError(f"Dataset instance length doesn't match field types, line: {reader.line_num}")
+
+            chunk.append(pick(row))
+
+            if len(chunk) == chunk_size:
+                yield convert_chunk(chunk, reader.line_num)
+                chunk = []
+
+        if chunk:
+            yield convert_chunk(chunk, reader.line_num)
+
+# assigns streamed instances to the testset so that every label gets ratio of its instances,
+# without knowing the label counts in advance. each label keeps the deficit of its testset count to
+# the expected count, which raises or lowers the chance of its next instance being drawn,
+# so the split stays random while the per label ratios don't drift
+class StratifiedSplitter:
+    def __init__(self, ratio, seed = None):
+        self.ratio   = ratio
+        self.rng     = random.Random(seed)
+        self.deficit = {}
+
+    def is_test(self, label):
+        deficit = self.deficit.get(label, 0.0) + self.ratio
+        chance  = min(1.0, max(0.0, deficit))
+
+        is_test = self.rng.random() < chance
+
+        self.deficit[label] = deficit - 1 if is_test else deficit
+
+        return is_test
+
+class JsonDatasetWriter:
+    def __init__(self, file_path, field_descriptions, label_idx):
+        self.size = 0
+        self.file = open(file_path, "w+")
+
+        # same document as json.dump of a dataset, with the instances array streamed last
+        header = json.dumps({"field_descriptions": field_descriptions, "label_idx": label_idx})
+        self.file.write(header[:-1] + ', "instances": [')
+
+    def write_rows(self, rows):
+        for row in rows:
+            self.file.write((", " if self.size else "") + json.dumps(row))
+            self.size += 1
+
+    def close(self):
+        self.file.write("]}")
+        self.file.close()
+
+    def discard(self):
+        self.file.close()
+
+# writers take rows in chunks, and are written to a temporary path that replaces file_path on success
+def open_dataset_writer(file_path, field_descriptions, label_idx):
+    out_path = os.path.normpath(file_path)
+    directory, filename = os.path.split(out_path)
+
+    if directory != '' and not os.path.exists(directory):
+        os.makedirs(directory)
+
+    writer_class = ColumnarFormat.ColumnarDatasetWriter if os.path.splitext(out_path)[1] == ColumnarFormat.EXTENSION else JsonDatasetWriter
+
+    writer = writer_class(out_path + ".part", field_descriptions, label_idx)
+    writer.out_path = out_path
+
+    return writer
+
+def split_csv_dataset(csv_filepath, field_types, ignore_indices, label_idx, ratio, trainset_outfile, testset_outfile, chunk_size, seed = None):
+    if os.path.splitext(csv_filepath)[1] != '.csv':
+        CommonLogger.logger.log("[ERROR] Dataset supplied to preprocess_dataset should be a csv file")
+        return None
+
+    ignored      = set() if ignore_indices == [-1] else set(ignore_indices)
+    keep_indices = [i for i in range(len(field_types)) if i not in ignored]
+    label_pos    = keep_indices.index(label_idx)
+
+    writers  = []
+    splitter = StratifiedSplitter(ratio, seed)
+
+    try:
+        chunks      = iter_csv_chunks(csv_filepath, field_types, keep_indices, chunk_size)
+        field_names = next(chunks)
+
+        field_descriptions = dict(zip(field_names, [field_types[i].__name__ for i in keep_indices]))
+
+        trainset = open_dataset_writer(trainset_outfile, field_descriptions, label_pos)
+        writers.append(trainset)
+        testset  = open_dataset_writer(testset_outfile, field_descriptions, label_pos)
+        writers.append(testset)
+
+        for chunk in chunks:
+            train_rows = []
+            test_rows  = []
+
+            for row in chunk:
+                (test_rows if splitter.is_test(row[label_pos]) else train_rows).append(row)
+
+            trainset.write_rows(train_rows)
+            testset.write_rows(test_rows)
 
-    save_dataset(args.testset_outfile, testset)
-    save_dataset(args.trainset_outfile, trainset)
+            CommonLogger.logger.log(f"[INFO] Processed {trainset.size + testset.size} instances")
+            yield
 
-    CommonLogger.logger.log("[INFO] Test and Train datasets successfully created")
+        if trainset.size + testset.size == 0:
+            raise ValueError("Dataset doesn't have more than a single line")
+
+        for writer in writers:
+            writer.close()
+            os.replace(writer.out_path + ".part", writer.out_path)
+
+    except (FileNotFoundError, ValueError) as e:
+        for writer in writers:
+            writer.discard()
+
+            if os.path.exists(writer.out_path + ".part"):
+                os.remove(writer.out_path + ".part")
+
+        CommonLogger.logger.log(f"[ERROR] {re.sub(r'\[Errno [0-9]+\] ', '', str(e))}")
+        return None
+
+    CommonLogger.logger.log(f"[INFO] Test and Train datasets successfully created, {trainset.size} train and {testset.size} test instances")
 
 def save_dataset(file_path, dataset):
     out_path = os.path.normpath(file_path)
@@ -95,6 +236,10 @@ def save_dataset(file_path, dataset):
     if directory != '' and not os.path.exists(directory):
         os.makedirs(directory)
 
+    if os.path.splitext(out_path)[1] == ColumnarFormat.EXTENSION:
+        ColumnarFormat.save_columnar_dataset(out_path, dataset)
+        return
+
     with open(out_path, "w+") as outfile:
         json.dump(dataset, outfile)
 
@@ -112,120 +257,285 @@ def verify_dataset_format(dataset_contents):
     return (field_exists_in_dict(dataset_contents, "instances") and
             field_exists_in_dict(dataset_contents, "field_descriptions"))
 
-def load_dataset(dataset_filepath, entropy_weights = [1.0, 1.0], preprocess=False, field_types=None, label_idx=None, ignore_indices=None):
+# extension of a dataset file supplied to an algorithm, or None after logging why it can't be loaded
+def dataset_file_ext(dataset_filepath, caller):
     if not dataset_filepath:
-        CommonLogger.logger.log("[ERROR] load_dataset: dataset_filepath cannot be None")
+        CommonLogger.logger.log(f"[ERROR] {caller}: dataset_filepath cannot be None")
+        return None
+
+    file_ext = os.path.splitext(os.path.normpath(dataset_filepath))[1]
+
+    if file_ext not in ('.json', ColumnarFormat.EXTENSION):
+        CommonLogger.logger.log(f"[ERROR] Dataset supplied to an algorithm should be a json or {ColumnarFormat.EXTENSION} file")
         return None
 
-    norm_path = os.path.normpath(dataset_filepath)
-    directory, filename = os.path.split(norm_path)
+    return file_ext
 
-    filename_noext, file_ext = os.path.splitext(filename)
+# returns read(dataset_filepath, *args), or None after logging that the file is missing or malformed
+def read_dataset_file(read, dataset_filepath, *args):
+    try:
+        return read(dataset_filepath, *args)
 
-    if preprocess and file_ext != '.csv':
-        CommonLogger.logger.log("[ERROR] Dataset supplied to preprocess_dataset should be a csv file")
+    except FileNotFoundError as e:
+        CommonLogger.logger.log(f"[ERROR]{re.sub(r'\[Errno [0-9]+\]', '', str(e))}")
+
+    except ValueError as e:
+        CommonLogger.logger.log(f"[ERROR] Malformed dataset: {e}")
+
+    return None
+
+def load_json_dataset(dataset_filepath, entropy_weights = [1.0, 1.0]):
+    with open(dataset_filepath) as infile:
+        dataset_contents = json.load(infile)
+
+    if not verify_dataset_format(dataset_contents):
+        raise ValueError("no instances or field descriptions")
+
+    if DatasetSchema.configure_schema(dataset_contents, entropy_weights) is None:
         return None
-    elif not preprocess and file_ext != '.json':
-        CommonLogger.logger.log("[ERROR] Dataset supplied to an algorithm should be a json file")
+
+    return Dataset(dataset_contents['instances'])
+
+@CommonProfiler.timed("load_dataset")
+def load_dataset(dataset_filepath, entropy_weights = [1.0, 1.0]):
+    file_ext = dataset_file_ext(dataset_filepath, "load_dataset")
+
+    if not file_ext:
         return None
 
-    dataset_contents = None
+    if file_ext == ColumnarFormat.EXTENSION:
+        return read_dataset_file(load_columnar_dataset, dataset_filepath, entropy_weights)
+
+    return read_dataset_file(load_json_dataset, dataset_filepath, entropy_weights)
+
+# process-local cache of loaded columnar datasets,
+# normalized path -> ((mtime, file size, entropy weights), dataset schema, dataset)
+columnar_dataset_cache = {}
+
+# loads a binary columnar dataset, the values are used as stored without any conversion.
+# the columns are memory-mapped, so every load of the same file (in this process or in forked workers)
+# shares the same physical pages, and loads of an unchanged file return the already loaded dataset
+def load_columnar_dataset(dataset_filepath, entropy_weights = [1.0, 1.0], as_columns = False):
+    cache_path = os.path.abspath(dataset_filepath)
+    stat       = os.stat(cache_path)
+    cache_key  = (stat.st_mtime_ns, stat.st_size, tuple(entropy_weights))
+
+    cached = columnar_dataset_cache.get(cache_path)
+
+    if cached and cached[0] == cache_key:
+        _, schema, dataset = cached
+        DatasetSchema.set_schema(schema)
+
+        return dataset.columns if as_columns else dataset
 
     try:
-        if file_ext == '.csv':
-            if label_idx == None or field_types == None or ignore_indices == None:
-                CommonLogger.logger.log("[ERROR] Label idx, field_types and ignore_indices cannot be None during dataset preprocessing")
+        header, columns = ColumnarFormat.load_columnar_dataset(dataset_filepath)
+    except ValueError as e:
+        CommonLogger.logger.log(f"[ERROR] Malformed dataset: {e}")
+        return None
+
+    if DatasetSchema.configure_schema_from_columns(header["field_descriptions"], columns, entropy_weights, header["label_idx"]) is None:
+        return None
+
+    dataset = Dataset.from_columns(columns)
+
+    columnar_dataset_cache[cache_path] = (cache_key, DatasetSchema.get_schema(), dataset)
+
+    return dataset.columns if as_columns else dataset
+
+# reads the values of a json document one at a time from a file, keeping only the unread part of the
+# current block and the value being decoded in memory
+class JsonStream:
+    READ_SIZE = 1 << 16
+
+    def __init__(self, file):
+        self.file    = file
+        self.buffer  = ""
+        self.pos     = 0
+        self.decoder = json.JSONDecoder()
+
+    # appends the next block of the file to the unread part of the buffer, False at the end of the file
+    def fill(self):
+        block = self.file.read(JsonStream.READ_SIZE)
+
+        self.buffer = self.buffer[self.pos:] + block
+        self.pos    = 0
+
+        return bool(block)
+
+    # next non whitespace character, without consuming it, None at the end of the file
+    def peek(self):
+        while True:
+            while self.pos < len(self.buffer) and self.buffer[self.pos].isspace():
+                self.pos += 1
+
+            if self.pos < len(self.buffer):
+                return self.buffer[self.pos]
+
+            if not self.fill():
                 return None
 
-            with open(dataset_filepath) as csvfile:
-                reader = csv.reader(csvfile, delimiter=',')
-                dataset_contents = list(reader)
+    # consumes the next non whitespace character, which should be one of chars
+    def expect(self, chars):
+        char = self.peek()
+
+        if char is None or char not in chars:
+            raise ValueError(f"expected one of {list(chars)}, found {'the end of the file' if char is None else repr(char)}")
+
+        self.pos += 1
+
+        return char
+
+    def next_value(self):
+        self.peek()
 
-                if not dataset_contents:
-                    CommonLogger.logger.log("[ERROR] Empty dataset file")
-                    return None
-                elif len(dataset_contents) <= 1:
-                    CommonLogger.logger.log("[ERROR] Dataset doesn't have more than a single line")
-                    return None
-                elif len(dataset_contents[1]) < len(field_types):
-                    CommonLogger.logger.log("[ERROR] Dataset instance length doesn't match field types")
-                    return None
+        while True:
+            try:
+                value, end = self.decoder.raw_decode(self.buffer, self.pos)
+            except json.JSONDecodeError:
+                # the value continues in the next block
+                if not self.fill():
+                    raise
 
-                dataset_instances = None
+                continue
 
-                if ignore_indices != [-1]:
-                    dataset_instances = [pop_ignored_indices(inst, ignore_indices) for inst in dataset_contents]
+            # a number ending the block may have more digits in the next one
+            if end == len(self.buffer) and self.fill():
+                continue
+
+            self.pos = end
+
+            return value
+
+# yields the instances of a json dataset one at a time, storing its other fields into header as they are read
+def iter_json_instances(dataset_filepath, header):
+    with open(dataset_filepath) as infile:
+        stream = JsonStream(infile)
+        stream.expect('{')
+
+        if stream.peek() == '}':
+            return
+
+        while True:
+            key = stream.next_value()
+            stream.expect(':')
+
+            if key != "instances":
+                header[key] = stream.next_value()
+
+            else:
+                stream.expect('[')
+
+                if stream.peek() == ']':
+                    stream.expect(']')
                 else:
-                    dataset_instances = dataset_contents
+                    while True:
+                        yield stream.next_value()
 
-                DatasetSchema.configure_schema(dataset_instances, field_types, entropy_weights, label_idx)
+                        if stream.expect(',]') == ']':
+                            break
 
-                first_instance = dataset_instances[1]
+            if stream.expect(',}') == '}':
+                return
 
-                for i, field in enumerate(first_instance):
-                    try:
-                        field_types[i](field)
-                    except:
-                        CommonLogger.logger.log("[ERROR] Dataset isn't compatible with the supplied field types")
-                        return None
+# configures the schema of a json dataset from a pass over its instances that keeps only the distinct values of every field
+def configure_json_dataset_schema(dataset_filepath, entropy_weights = [1.0, 1.0]):
+    header        = {}
+    value_domains = None
 
-                dataset = Dataset(dataset_instances[1:])
+    for instance in iter_json_instances(dataset_filepath, header):
+        if value_domains is None:
+            value_domains = [set() for _ in instance]
 
-        elif file_ext == '.json':
-            dataset_contents = json.load(open(dataset_filepath))
+        for domain, value in zip(value_domains, instance):
+            domain.add(value)
 
-            if not verify_dataset_format(dataset_contents):
-                CommonLogger.logger.log("[ERROR] Malformed dataset")
-                return None
+    if not value_domains or not field_exists_in_dict(header, "field_descriptions"):
+        raise ValueError("no instances or field descriptions")
 
-            DatasetSchema.configure_schema(dataset_contents, field_types, entropy_weights, label_idx)
+    field_descriptions = header["field_descriptions"]
 
-            dataset = Dataset(dataset_contents['instances'])
+    return DatasetSchema.configure_schema_from_columns(
+        field_descriptions, {name: list(domain) for name, domain in zip(field_descriptions, value_domains)}, entropy_weights, header["label_idx"]
+    )
 
-        elif file_ext == '':
-            CommonLogger.logger.log(f"[ERROR] Dataset file extension should be '.json' or '.csv'")
-            return None
+# the keys of a json dataset other than its instances, e.g. field_descriptions and label_idx, without keeping any instance
+def read_json_header(dataset_filepath):
+    header = {}
 
-        else:
-            CommonLogger.logger.log(f"[ERROR] Supplied dataset file has unsupported extension: {filename}")
-            return None
+    # the fields are written before the instances, only files that have them after are read further
+    for _ in iter_json_instances(dataset_filepath, header):
+        if "field_descriptions" in header and "label_idx" in header:
+            break
 
-    except FileNotFoundError as e:
-        CommonLogger.logger.log(f"[ERROR]{re.sub(r'\[Errno [0-9]+\]', '', str(e))}")
+    return header
+
+def read_dataset_schema(dataset_filepath):
+    if os.path.splitext(dataset_filepath)[1] == ColumnarFormat.EXTENSION:
+        with open(dataset_filepath, "rb") as f:
+            header, _ = ColumnarFormat.read_header(f)
+    else:
+        header = read_json_header(dataset_filepath)
+
+    if not field_exists_in_dict(header, "field_descriptions") or "label_idx" not in header:
+        raise ValueError("no field descriptions or label index")
+
+    field_descriptions = header["field_descriptions"]
+
+    return DatasetSchema.configure_schema_from_columns(field_descriptions, {name: [] for name in field_descriptions}, [1.0, 1.0], header["label_idx"])
+
+# configures the schema of the dataset at dataset_filepath from its field descriptions and label index, without
+# reading its instances, so the value domains of the features are empty. enough to convert and score instances of it,
+# returns the feature types or None after logging why the schema couldn't be read
+def load_dataset_schema(dataset_filepath):
+    if not dataset_file_ext(dataset_filepath, "load_dataset_schema"):
         return None
 
-    return dataset
+    return read_dataset_file(read_dataset_schema, dataset_filepath)
+
+# yields the dataset at dataset_filepath as consecutive Datasets of at most chunk_size instances,
+# so that only a chunk of instances is alive at a time. json datasets are read twice, once for the schema
+# and once for the instances, neither pass holding more than a chunk of them
+def iter_dataset_chunks(dataset_filepath, chunk_size, entropy_weights = [1.0, 1.0]):
+    if chunk_size <= 0:
+        CommonLogger.logger.log(f"[ERROR] iter_dataset_chunks: invalid chunk size: {chunk_size}")
+        return
 
-def create_test_and_train_set(dataset, ratio, field_types):
-    x = []
+    file_ext = dataset_file_ext(dataset_filepath, "iter_dataset_chunks")
 
-    label_idx   = dataset.label_idx
-    field_names = list(dataset.feature_types.keys())
+    if not file_ext:
+        return
 
-    field_descriptions = dict(zip(field_names, [t.__name__ for t in field_types]))
+    if file_ext == ColumnarFormat.EXTENSION:
+        columns = read_dataset_file(load_columnar_dataset, dataset_filepath, entropy_weights, True)
 
-    for i in dataset.instances:
-        x.append([getattr(i, name) for j, name in enumerate(field_names) if j != label_idx])
+        if columns is None:
+            return
 
+        size = len(next(iter(columns.values()))) if columns else 0
 
-    y = [getattr(i, field_names[label_idx]) for i in dataset.instances]
+        for start in range(0, size, chunk_size):
+            yield Dataset.from_columns({name: column[start:start + chunk_size] for name, column in columns.items()})
 
-    # returns -> x train, x test, y train, y test
-    # 1186 active, 414 churned in test instances (25.9%) churned
-    # 4743 active, 1657 churned in training instances (25.6%) churned
-    split = train_test_split(x, y, train_size = 1 - ratio, test_size = ratio, stratify=y)
+        return
 
-    trainset = { "instances": [], "field_descriptions": field_descriptions, "label_idx": label_idx }
-    testset = { "instances": [], "field_descriptions": field_descriptions, "label_idx": label_idx }
+    if read_dataset_file(configure_json_dataset_schema, dataset_filepath, entropy_weights) is None:
+        return
 
-    for i in range(len(split[0])):
-        trainset["instances"].append( split[0][i] + [split[2][i]] )
+    chunk = []
 
-    for i in range(len(split[1])):
-        testset["instances"].append( split[0][i] + [split[2][i]] )
+    for instance in iter_json_instances(dataset_filepath, {}):
+        chunk.append(instance)
 
-    return (testset, trainset)
+        if len(chunk) == chunk_size:
+            yield Dataset(chunk)
+            chunk = []
 
+    if chunk:
+        yield Dataset(chunk)
+
+# a path with the compact model extension is written in the versioned model format, anything else is pickled
+@CommonProfiler.timed("save_model")
 def save_pickle(data, pickle_outfile, datatype):
     out_path = os.path.normpath(pickle_outfile)
     directory, filename = os.path.split(out_path)
@@ -233,20 +543,54 @@ def save_pickle(data, pickle_outfile, datatype):
     if directory != '' and not os.path.exists(directory):
         os.makedirs(directory)
 
+    if os.path.splitext(out_path)[1] == ModelFormat.EXTENSION:
+        try:
+            ModelFormat.save(data, out_path)
+        except ValueError as e:
+            CommonLogger.logger.log(f"[ERROR] {e}")
+            return None
+
+        CommonLogger.logger.log(f"Saved {datatype} into model file: {out_path}")
+        yield
+        return
+
     with open(out_path, "wb+") as f:
         pickle.dump(data, f)
 
     CommonLogger.logger.log(f"Pickled {datatype} into file: {out_path}")
     yield
 
+# loads pickles and compact model files alike, the format is told apart by the file contents
+@CommonProfiler.timed("load_model")
 def load_pickle(pickle_infile):
     data = None
 
     try:
+        if ModelFormat.is_model_file(pickle_infile):
+            return ModelFormat.load(pickle_infile)
+
         with open(pickle_infile, "rb") as f:
             data = pickle.load(f)
     except FileNotFoundError as e:
         CommonLogger.logger.log(f"[ERROR]{re.sub(r'\[Errno [0-9]+\]', '', str(e))}")
         return None
+    except ValueError as e:
+        CommonLogger.logger.log(f"[ERROR] Malformed model file: {e}")
+        return None
 
     return data
+
+# converts a pickled model into the compact model format or back, depending on the outfile extension
+def convert_model(args):
+    data = load_pickle(args.infile)
+
+    if data is None:
+        return None
+
+    kind = ModelFormat.model_kind(data)
+
+    if kind is None:
+        CommonLogger.logger.log(f"[ERROR] {args.infile} doesn't hold a decision tree, CBA or naive bayesian model")
+        return None
+
+    yield from save_pickle(data, args.outfile, f"{kind} model")
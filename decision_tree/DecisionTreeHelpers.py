@@ -5,6 +5,7 @@ import pickle
 from common.Dataset import Dataset
 from common.Helpers import calc_candidate_thresholds
 import common.Logger as CommonLogger
+import common.Profiler as CommonProfiler
 
 MIN_SAMPLES_LEAF = None
 MIN_SAMPLES_LEAF_KARY = None
@@ -133,6 +134,7 @@ def evaluate_info_gains(dataset, use_gini=False):
 
     return (best_gain, best_split)
 
+@CommonProfiler.timed("export_dot")
 def export_tree_to_dot(root, dot_outfile):
     lines = []
     lines.append("digraph DecisionTree {")
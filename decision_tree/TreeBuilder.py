@@ -1,6 +1,7 @@
 from common.Dataset import Dataset
 
 import common.Logger as CommonLogger
+import common.Profiler as CommonProfiler
 
 from decision_tree.TreeNode import TreeNode
 
@@ -21,6 +22,8 @@ def build_tree(dataset, depth = 0):
     yield
     CommonLogger.logger.backtrack(1)
 
+    CommonProfiler.count(f"build_tree.depth_{depth}.nodes")
+
     if dataset.is_empty:
         return TreeNode(is_leaf=True, prediction=False, n_samples=0, n_pred=0)
 
@@ -31,7 +34,8 @@ def build_tree(dataset, depth = 0):
         pred, count = dataset.majority_label
         return TreeNode(is_leaf=True, prediction=pred, n_samples=dataset.size, n_pred=count)
 
-    best_gain, best_split = helpers.evaluate_info_gains(dataset, USE_GINI)
+    with CommonProfiler.stage(f"build_tree.depth_{depth}.split_search"):
+        best_gain, best_split = helpers.evaluate_info_gains(dataset, USE_GINI)
 
     if best_split is None or best_gain < MIN_GAIN:
         pred, count = dataset.majority_label
@@ -3,6 +3,7 @@ default_testset_path = "dataset/spotify_churn_dataset/default_testset.json"
 
 # process dataset
 default_testset_trainset_ratio = 0.2
+default_csv_chunk_size         = 10000
 
 # decision_tree
 default_max_depth             = 24
@@ -29,6 +30,27 @@ default_CBA_pickle_path = "pickles/spotify_churn_dataset/default_rules.pickle"
 
 # naive bayesian
 default_naive_bayesian_pickle_path = "pickles/spotify_churn_dataset/default_probability_table.pickle"
+default_naive_bayesian_chunk_size  = 0
+default_naive_bayesian_sample_size = 100000
+
+# predict
+default_predict_chunk_size = 10000
+default_predict_workers    = 1
+
+# tune
+default_tune_folds   = 5
+default_tune_workers = 1
+default_tune_rank_by = "f1_score"
+
+# GUI jobs
+default_gui_job_workers    = 2
+default_gui_job_cache_size = 32
+
+# scoring server
+default_server_host     = "127.0.0.1"
+default_server_port     = 8750
+default_max_batch_size  = 1024
+default_max_batch_delay = 2.0 # milliseconds
 
 # CBA/naive bayesian (discretizer)
 default_max_split_count = 3
@@ -4,21 +4,8 @@ import sys
 import inspect
 import argparse
 
-from common.Instance import Instance
-from common.Features import FeatureType, FeatureFilter
-
-from common.Dataset import DatasetSchema, Dataset
-
-from common.Utils import save_dataset, load_dataset, process_dataset, create_test_and_train_set
-
-from decision_tree.DecisionTree import build_decision_tree, evaluate_decision_tree, visualize_decision_tree
-
-from CBA.CBA import generate_CARs, evaluate_CARs, visualize_CARs
-
-from naive_bayesian.NaiveBayesian import build_naive_bayesian_classifier, evaluate_naive_bayesian_classifier, visualize_naive_bayesian_classifier
-
-from GUI.Plotter import Plotter
-
+# handlers are imported by the branch of the command that runs them, so parsing arguments
+# and lightweight commands don't pay for numpy, matplotlib or gradio they don't use
 import common.Logger as CommonLogger
 
 from defaults import *
@@ -29,8 +16,8 @@ def create_process_dataset_argparser(parsers, subparsers):
     parsers["process_dataset"] = subparsers.add_parser("process_dataset", description=main_desc, help=main_desc)
     parsers["process_dataset"].add_argument("--dataset", "-d", metavar='PATH_TO_DATASET', help=f"default: {default_dataset_path}", default=default_dataset_path, type=str)
     parsers["process_dataset"].add_argument("--ratio", "-r", metavar='RATIO', help=f"ratio of the size of the testset to the size of whole dataset (default: {default_testset_trainset_ratio})", default=default_testset_trainset_ratio, type=float)
-    parsers["process_dataset"].add_argument("--trainset-outfile", metavar='TRAINSET_OUTPATH', help=f"default: {default_trainset_path}", default=default_trainset_path, type=str)
-    parsers["process_dataset"].add_argument("--testset-outfile", metavar='TESTSET_OUTPATH', help=f"default: {default_testset_path}", default=default_testset_path, type=str)
+    parsers["process_dataset"].add_argument("--trainset-outfile", metavar='TRAINSET_OUTPATH', help=f"a .cols extension writes the binary columnar format instead of json. default: {default_trainset_path}", default=default_trainset_path, type=str)
+    parsers["process_dataset"].add_argument("--testset-outfile", metavar='TESTSET_OUTPATH', help=f"a .cols extension writes the binary columnar format instead of json. default: {default_testset_path}", default=default_testset_path, type=str)
 
     parsers["process_dataset"].add_argument("--field-types", nargs="+", metavar='FIELD_TYPES', help=f"the data types instances of the dataset consist of, given sequentially and space seperated. default: {default_field_types}", default=default_field_types, type=str)
 
@@ -38,10 +25,35 @@ def create_process_dataset_argparser(parsers, subparsers):
 
     parsers["process_dataset"].add_argument("--label-idx", metavar='LABEL_IDX', help=f"default: {default_label_idx}", default=default_label_idx, type=int)
 
+    parsers["process_dataset"].add_argument("--chunk-size", metavar='CHUNK_SIZE', help=f"number of csv rows read, converted and written at a time (default: {default_csv_chunk_size})", default=default_csv_chunk_size, type=int)
+    parsers["process_dataset"].add_argument("--seed", metavar='SEED', help="seed of the split, the same seed splits the same dataset the same way (default: a different split every run)", default=None, type=int)
+
+def create_convert_model_argparser(parsers, subparsers):
+    main_desc = "Convert a pickled model into the compact model format, or back"
+
+    parsers["convert_model"] = subparsers.add_parser("convert_model", description=main_desc, help=main_desc)
+    parsers["convert_model"].add_argument("--infile", "-i", metavar='MODEL_INPATH', help="pickle or compact model file of a decision tree, CBA or naive bayesian classifier", required=True, type=str)
+    parsers["convert_model"].add_argument("--outfile", "-o", metavar='MODEL_OUTPATH', help="a .model extension writes the compact model format, anything else a pickle", required=True, type=str)
+
+def create_serve_argparser(parsers, subparsers):
+    main_desc = "Serve the decision tree, CBA and naive bayesian models for scoring over HTTP"
+
+    parsers["serve"] = subparsers.add_parser("serve", description=main_desc, help=main_desc)
+    parsers["serve"].add_argument("--schema-infile", metavar='DATASET_FILEPATH', help=f"dataset whose fields the scored instances have (default: {default_trainset_path})", default=default_trainset_path, type=str)
+    parsers["serve"].add_argument("--pickle-path-decision-tree", metavar='PICKLE_PATH', help=f"empty to not serve a decision tree (default: {default_decision_tree_pickle_path})", default=default_decision_tree_pickle_path, type=str)
+    parsers["serve"].add_argument("--pickle-path-CBA", metavar='PICKLE_PATH', help=f"empty to not serve CBA rules (default: {default_CBA_pickle_path})", default=default_CBA_pickle_path, type=str)
+    parsers["serve"].add_argument("--pickle-path-naive-bayesian", metavar='PICKLE_PATH', help=f"empty to not serve a naive bayesian classifier (default: {default_naive_bayesian_pickle_path})", default=default_naive_bayesian_pickle_path, type=str)
+    parsers["serve"].add_argument("--host", metavar='HOST', help=f"default: {default_server_host}", default=default_server_host, type=str)
+    parsers["serve"].add_argument("--port", metavar='PORT', help=f"default: {default_server_port}", default=default_server_port, type=int)
+    parsers["serve"].add_argument("--unix-socket", metavar='SOCKET_PATH', help="listen on a unix socket instead of HOST:PORT", default=None, type=str)
+    parsers["serve"].add_argument("--max-batch-size", metavar='MAX_BATCH_SIZE', help=f"max number of instances of concurrent requests scored together (default: {default_max_batch_size})", default=default_max_batch_size, type=int)
+    parsers["serve"].add_argument("--max-batch-delay", metavar='MAX_BATCH_DELAY', help=f"max milliseconds a request waits for other requests to be batched with (default: {default_max_batch_delay})", default=default_max_batch_delay, type=float)
+
 def create_decision_tree_argparser(parsers, subparsers, parent_parsers):
     main_desc  = "Build or evaluate a decision tree"
     build_desc = "Build the decision tree and save into a pickle file, also create a DOT file"
     eval_desc  = "Evaluate the supplied decision tree using the test set"
+    predict_desc = "Score the instances of a dataset with the supplied decision tree and write the predictions to a csv file"
 
     parsers["decision_tree"]                = {}
     parsers["decision_tree"]["main_parser"] = subparsers.add_parser("decision_tree", description=main_desc, help=main_desc)
@@ -64,10 +76,15 @@ def create_decision_tree_argparser(parsers, subparsers, parent_parsers):
 
     parsers["decision_tree"]["evaluate"] = decision_tree_subparsers.add_parser("evaluate", description=eval_desc, help=eval_desc, parents=[parent_parsers["evaluator"], pickle_parser])
 
+    parsers["decision_tree"]["predict"] = decision_tree_subparsers.add_parser("predict", description=predict_desc, help=predict_desc, parents=[parent_parsers["predictor"], pickle_parser])
+    parsers["decision_tree"]["predict"].set_defaults(algorithm="decision_tree")
+
 def create_CBA_argparser(parsers, subparsers, parent_parsers):
     main_desc     = "Generate a CAR (Class Association Rule) classifier or evaluate a CAR classifier"
     generate_desc = "Generate a classifier and save into a pickle file"
     eval_desc     = "Evaluate the supplied classifier using the test set"
+    refresh_desc  = "Refresh a classifier generated with --keep-mining-state using new labeled instances, without mining from scratch"
+    predict_desc  = "Score the instances of a dataset with the supplied classifier and write the predictions to a csv file"
 
     pickle_parser = argparse.ArgumentParser(add_help=False)
     pickle_parser.add_argument("--pickle-path", metavar='PICKLE_PATH', help=f"default: {default_CBA_pickle_path}", default=default_CBA_pickle_path, type=str)
@@ -79,18 +96,28 @@ def create_CBA_argparser(parsers, subparsers, parent_parsers):
 
     parsers["CBA"]["gen"] = CBA_subparsers.add_parser("generate", description=generate_desc, help=generate_desc, parents=[parent_parsers["builder"], parent_parsers["discretizer"], pickle_parser])
     parsers["CBA"]["gen"].add_argument("--max-k", metavar='MAX_K', help=f"Max k value for the apriori algorithm (default: {default_max_k})", default=default_max_k, type=int)
-    parsers["CBA"]["gen"].add_argument("--min-support", metavar='MIN_SUP', help=f"Minimum support for the CARs (default: {default_min_support})", default=default_min_support, type=float)
-    parsers["CBA"]["gen"].add_argument("--min-confidence", metavar='MIN_CONF', help=f"Minimum confidence for the CARs (default: {default_min_confidence})", default=default_min_confidence, type=float)
-    parsers["CBA"]["gen"].add_argument("--min-lift", metavar='MIN_LIFT', help=f"Minimum lift for the CARs (default: {default_min_lift})", default=default_min_lift, type=float)
+    parsers["CBA"]["gen"].add_argument("--min-support", nargs="+", metavar='MIN_SUP', help=f"Minimum support for the CARs. with several supports, confidences or lifts a classifier is generated for every combination from a single mining pass at the lowest support, each written to PICKLE_PATH with its setting in the name (default: {default_min_support})", default=[default_min_support], type=float)
+    parsers["CBA"]["gen"].add_argument("--min-confidence", nargs="+", metavar='MIN_CONF', help=f"Minimum confidence for the CARs (default: {default_min_confidence})", default=[default_min_confidence], type=float)
+    parsers["CBA"]["gen"].add_argument("--min-lift", nargs="+", metavar='MIN_LIFT', help=f"Minimum lift for the CARs (default: {default_min_lift})", default=[default_min_lift], type=float)
     parsers["CBA"]["gen"].add_argument("--error-weights", nargs=2, metavar=('WEIGHT_FALSE_POSITIVES', 'WEIGHT_FALSE_NEGATIVES'), help=f"The weights to use for penalizing rules that incorrectly cover instances while building CAR classifier (default: {default_error_weights})", default=default_error_weights, type=float)
     parsers["CBA"]["gen"].add_argument("--m-estimate-weights", nargs=2, metavar=('WEIGHT_M_ESTIMATE_TRUE', 'WEIGHT_M_ESTIMATE_FALSE'), help=f"The weights to decide how more likely it should be that a rule's prediction is correct than its label's random guess baseline (default: {default_m_estimate_weights})", default=default_m_estimate_weights, type=float)
 
+    parsers["CBA"]["gen"].add_argument("--keep-mining-state", action='store_true', help="Also store the vertical index and the frequent itemset counts alongside the pickle, so that the classifier can be refreshed later")
+
     parsers["CBA"]["eval"] = CBA_subparsers.add_parser("evaluate", description=eval_desc, help=eval_desc, parents=[parent_parsers["evaluator"], pickle_parser])
 
+    parsers["CBA"]["predict"] = CBA_subparsers.add_parser("predict", description=predict_desc, help=predict_desc, parents=[parent_parsers["predictor"], pickle_parser])
+    parsers["CBA"]["predict"].set_defaults(algorithm="CBA")
+
+    parsers["CBA"]["refresh"] = CBA_subparsers.add_parser("refresh", description=refresh_desc, help=refresh_desc, parents=[pickle_parser])
+    parsers["CBA"]["refresh"].add_argument("--delta-infile", metavar='DELTA_FILEPATH', help="Dataset with the new labeled instances", required=True, type=str)
+
 def create_naive_bayesian_argparser(parsers, subparsers, parent_parsers):
     main_desc  = "Build a naive bayesian classifier or evaluate a naive bayesian classifier"
     build_desc = "Build a naive bayesian classifier probability table using the trainset and save into a pickle file"
     eval_desc  = "Evaluate a naive bayesian classifier probability table using the supplied testset"
+    merge_desc = "Merge naive bayesian classifier probability tables built from shards of a trainset with the same thresholds"
+    predict_desc = "Score the instances of a dataset with the supplied probability table and write the predictions to a csv file"
 
     pickle_parser = argparse.ArgumentParser(add_help=False)
     pickle_parser.add_argument("--pickle-path", metavar='PICKLE_PATH', help=f"default: {default_naive_bayesian_pickle_path}", default=default_naive_bayesian_pickle_path, type=str)
@@ -101,9 +128,53 @@ def create_naive_bayesian_argparser(parsers, subparsers, parent_parsers):
     NB_subparsers = parsers["naive_bayesian"]["main_parser"].add_subparsers(title="commands", dest="subcommand_NB")
 
     parsers["naive_bayesian"]["build"] = NB_subparsers.add_parser("build", description=build_desc, help=build_desc, parents=[parent_parsers["builder"], pickle_parser, parent_parsers["discretizer"]])
+    parsers["naive_bayesian"]["build"].add_argument("--chunk-size", metavar='CHUNK_SIZE', help=f"Count the trainset in chunks of this many instances, thresholds of a new table are discretized from a sample of the whole trainset. 0 reads the whole trainset at once (default: {default_naive_bayesian_chunk_size})", default=default_naive_bayesian_chunk_size, type=int)
+    parsers["naive_bayesian"]["build"].add_argument("--sample-size", metavar='SAMPLE_SIZE', help=f"With --chunk-size, discretize the thresholds of a new table from a uniform sample of this many instances drawn across all chunks. 0 discretizes from the whole trainset, which is loaded at once for it (default: {default_naive_bayesian_sample_size})", default=default_naive_bayesian_sample_size, type=int)
+    parsers["naive_bayesian"]["build"].add_argument("--update", action='store_true', help="Add the counts of the trainset to the probability table at PICKLE_PATH, keeping its thresholds, instead of building a new one")
+    parsers["naive_bayesian"]["build"].add_argument("--thresholds-from", metavar='THRESHOLDS_PICKLE', help="Build a new probability table with the thresholds of the pickled table at THRESHOLDS_PICKLE instead of discretizing them, so that the two tables can be merged", default=None, type=str)
+
+    parsers["naive_bayesian"]["merge"] = NB_subparsers.add_parser("merge", description=merge_desc, help=merge_desc, parents=[pickle_parser])
+    parsers["naive_bayesian"]["merge"].add_argument("--pickle-paths", nargs="+", metavar='PICKLE_PATHS', help="Paths of the pickled probability tables to merge, the result is written to PICKLE_PATH", required=True, type=str)
 
     parsers["naive_bayesian"]["evaluate"] = NB_subparsers.add_parser("evaluate", description=eval_desc, help=eval_desc, parents=[parent_parsers["evaluator"], pickle_parser])
 
+    parsers["naive_bayesian"]["predict"] = NB_subparsers.add_parser("predict", description=predict_desc, help=predict_desc, parents=[parent_parsers["predictor"], pickle_parser])
+    parsers["naive_bayesian"]["predict"].set_defaults(algorithm="naive_bayesian")
+
+
+def create_tune_argparser(parsers, subparsers, parent_parsers):
+    main_desc = "Cross-validate a decision tree or CBA classifier over a grid of hyperparameters and rank the settings"
+    decision_tree_desc = "Cross-validate a decision tree for every combination of the values given for its parameters"
+    CBA_desc = "Cross-validate a CAR classifier for every combination of the values given for its parameters, mining each fold once"
+
+    tuner_parser = argparse.ArgumentParser(add_help=False)
+    tuner_parser.add_argument("--folds", "-k", metavar='FOLDS', help=f"number of cross-validation folds the trainset is split into (default: {default_tune_folds})", default=default_tune_folds, type=int)
+    tuner_parser.add_argument("--workers", "-w", metavar='WORKERS', help=f"number of processes evaluating folds in parallel (default: {default_tune_workers})", default=default_tune_workers, type=int)
+    tuner_parser.add_argument("--seed", metavar='SEED', help="seed of the fold assignment (default: 0)", default=0, type=int)
+    tuner_parser.add_argument("--rank-by", metavar='METRIC', help=f"metric whose mean over the folds ranks the settings (default: {default_tune_rank_by})", choices=["accuracy", "precision", "recall", "f1_score", "roc_auc"], default=default_tune_rank_by, type=str)
+    tuner_parser.add_argument("--outfile", "-o", metavar='RESULTS_OUTPATH', help="csv file to write the ranked settings and the mean and standard deviation of their metrics to", default=None, type=str)
+
+    parsers["tune"]                = {}
+    parsers["tune"]["main_parser"] = subparsers.add_parser("tune", description=main_desc, help=main_desc)
+
+    tune_subparsers = parsers["tune"]["main_parser"].add_subparsers(title="models", dest="model")
+
+    parsers["tune"]["decision_tree"] = tune_subparsers.add_parser("decision_tree", description=decision_tree_desc, help=decision_tree_desc, parents=[parent_parsers["builder"], tuner_parser])
+    parsers["tune"]["decision_tree"].add_argument("--use-gini", action='store_true', help=f"Use Gini impurity instead of entropy (default: {default_use_gini})", default=default_use_gini)
+    parsers["tune"]["decision_tree"].add_argument("--entropy-weights", "-e", nargs=2, metavar=('WEIGHT_TRUE', 'WEIGHT_FALSE'), help=f"Entropy weights for true and false labels respectively (default: {default_entropy_weights})", default=default_entropy_weights, type=float)
+    parsers["tune"]["decision_tree"].add_argument("--max-depth", nargs="+", metavar='MAX_DEPTH', help=f"Max decision tree depths to try (default: {default_max_depth})", default=[default_max_depth], type=int)
+    parsers["tune"]["decision_tree"].add_argument("--min-info-gain", "-g", nargs="+", metavar='MIN_INFO_GAIN', help=f"Minimum info gains for a split to qualify as one to try (default: {default_min_info_gain})", default=[default_min_info_gain], type=float)
+    parsers["tune"]["decision_tree"].add_argument("--min-samples-split", nargs="+", metavar='MIN_SAMPLES_SPLIT', help=f"Minimum samples a meaningful split should have to try (default: {default_min_samples_split})", default=[default_min_samples_split], type=int)
+    parsers["tune"]["decision_tree"].add_argument("--min-samples-leaf", nargs="+", metavar='MIN_SAMPLES_LEAF', help=f"Minimum samples a leaf node should have to try (default: {default_min_samples_leaf})", default=[default_min_samples_leaf], type=int)
+    parsers["tune"]["decision_tree"].add_argument("--min-samples-leaf-kary", nargs="+", metavar='MIN_SAMPLES_LEAF_KARY', help=f"Minimum samples a leaf node of a k-ary node should have to try (default: {default_min_samples_leaf_kary})", default=[default_min_samples_leaf_kary], type=int)
+
+    parsers["tune"]["CBA"] = tune_subparsers.add_parser("CBA", description=CBA_desc, help=CBA_desc, parents=[parent_parsers["builder"], parent_parsers["discretizer"], tuner_parser])
+    parsers["tune"]["CBA"].add_argument("--max-k", nargs="+", metavar='MAX_K', help=f"Max k values for the apriori algorithm to try (default: {default_max_k})", default=[default_max_k], type=int)
+    parsers["tune"]["CBA"].add_argument("--min-support", nargs="+", metavar='MIN_SUP', help=f"Minimum supports for the CARs to try, each fold is mined once at the lowest (default: {default_min_support})", default=[default_min_support], type=float)
+    parsers["tune"]["CBA"].add_argument("--min-confidence", nargs="+", metavar='MIN_CONF', help=f"Minimum confidences for the CARs to try (default: {default_min_confidence})", default=[default_min_confidence], type=float)
+    parsers["tune"]["CBA"].add_argument("--min-lift", nargs="+", metavar='MIN_LIFT', help=f"Minimum lifts for the CARs to try (default: {default_min_lift})", default=[default_min_lift], type=float)
+    parsers["tune"]["CBA"].add_argument("--error-weights", nargs=2, metavar=('WEIGHT_FALSE_POSITIVES', 'WEIGHT_FALSE_NEGATIVES'), help=f"The weights to use for penalizing rules that incorrectly cover instances while building CAR classifier (default: {default_error_weights})", default=default_error_weights, type=float)
+    parsers["tune"]["CBA"].add_argument("--m-estimate-weights", nargs=2, metavar=('WEIGHT_M_ESTIMATE_TRUE', 'WEIGHT_M_ESTIMATE_FALSE'), help=f"The weights to decide how more likely it should be that a rule's prediction is correct than its label's random guess baseline (default: {default_m_estimate_weights})", default=default_m_estimate_weights, type=float)
 
 def main():
     parser = argparse.ArgumentParser(
@@ -114,6 +185,10 @@ def main():
                         """,
                         epilog='StudentID: [REDACTED]')
 
+    parser.add_argument("--profile", metavar='REPORT_PATH', help="write the time spent in each stage of the command and its counters as a json report to REPORT_PATH", default=None, type=str)
+    parser.add_argument("--profile-memory", help="also trace the peak memory of each stage in the profile report, slows the command down", action="store_true")
+    parser.add_argument("--profile-cprofile", metavar='PSTATS_PATH', help="also run the profiled command under cProfile and write its stats to PSTATS_PATH", default=None, type=str)
+
     subparsers = parser.add_subparsers(title="commands", dest="command")
 
     parent_parsers = {}
@@ -123,6 +198,14 @@ def main():
     parent_parsers["evaluator"] = argparse.ArgumentParser(add_help=False)
     parent_parsers["evaluator"].add_argument("--testset-infile", metavar='TESTSET_FILEPATH', help=f"default: {default_testset_path}", default=default_testset_path, type=str)
 
+    parent_parsers["predictor"] = argparse.ArgumentParser(add_help=False)
+    parent_parsers["predictor"].add_argument("--infile", "-i", metavar='DATASET_FILEPATH', help="csv, json or .cols dataset to score, the label field is not needed", required=True, type=str)
+    parent_parsers["predictor"].add_argument("--outfile", "-o", metavar='PREDICTIONS_OUTPATH', help="csv file to write the id, prediction and probability of true label of every instance to", required=True, type=str)
+    parent_parsers["predictor"].add_argument("--schema-infile", metavar='DATASET_FILEPATH', help=f"dataset whose fields the scored instances have (default: {default_trainset_path})", default=default_trainset_path, type=str)
+    parent_parsers["predictor"].add_argument("--id-field", metavar='ID_FIELD', help="field of the input to write as the id of each prediction, row numbers are written without one", default=None, type=str)
+    parent_parsers["predictor"].add_argument("--chunk-size", metavar='CHUNK_SIZE', help=f"number of instances read and scored at a time (default: {default_predict_chunk_size})", default=default_predict_chunk_size, type=int)
+    parent_parsers["predictor"].add_argument("--workers", "-w", metavar='WORKERS', help=f"number of processes scoring chunks in parallel (default: {default_predict_workers})", default=default_predict_workers, type=int)
+
     parent_parsers["discretizer"] = argparse.ArgumentParser(add_help=False)
     parent_parsers["discretizer"].add_argument("--entropy-weights", nargs=2, metavar=('WEIGHT_TRUE', 'WEIGHT_FALSE'), help=f"Entropy weights to use for true and false labels respectively while discretizing numeric features (default: {default_entropy_weights})", default=default_entropy_weights, type=float)
     parent_parsers["discretizer"].add_argument("--max-split-count", "-m", metavar='MAX_SPLIT_COUNT', help=f"Max split count to consider while discretizing numeric features (default: {default_max_split_count})", default=default_max_split_count, type=int)
@@ -132,15 +215,20 @@ def main():
     parsers = {}
 
     gui_parser = subparsers.add_parser("GUI", description=f"Starts the gradio GUI", help="Starts the gradio GUI")
+    gui_parser.add_argument("--job-workers", metavar='JOB_WORKERS', help=f"number of build, evaluate and visualize jobs run at the same time (default: {default_gui_job_workers})", default=default_gui_job_workers, type=int)
+    gui_parser.add_argument("--job-cache-size", metavar='JOB_CACHE_SIZE', help=f"number of evaluate and visualize results kept to answer repeated requests instantly (default: {default_gui_job_cache_size})", default=default_gui_job_cache_size, type=int)
     create_process_dataset_argparser(parsers, subparsers)
+    create_convert_model_argparser(parsers, subparsers)
+    create_serve_argparser(parsers, subparsers)
     create_decision_tree_argparser(parsers, subparsers, parent_parsers)
     create_CBA_argparser(parsers, subparsers, parent_parsers)
     create_naive_bayesian_argparser(parsers, subparsers, parent_parsers)
+    create_tune_argparser(parsers, subparsers, parent_parsers)
 
     args = parser.parse_args()
 
     # generator drainer
-    def run_task(fnc, _args):
+    def drain(fnc, _args):
         ret = fnc(_args)
         if inspect.isgenerator(ret):
             for _ in ret:
@@ -148,11 +236,25 @@ def main():
         else:
             return ret
 
+    def run_task(fnc, _args):
+        if args.profile and args.command != "GUI":
+            import common.Profiler as CommonProfiler
+
+            return CommonProfiler.run_profiled(args.profile, args.profile_memory, args.profile_cprofile, drain, fnc, _args)
+
+        return drain(fnc, _args)
+
     # instantiate shared logger, argument determines gui vs cli mode
     CommonLogger.logger = CommonLogger.Logger(True if args.command == "GUI" else False)
 
     if args.command == "GUI":
         from GUI.GUI import GUI
+        from GUI.Plotter import Plotter
+
+        from common.Utils import process_dataset
+        from decision_tree.DecisionTree import build_decision_tree, evaluate_decision_tree, visualize_decision_tree
+        from CBA.CBA import generate_CARs, evaluate_CARs, visualize_CARs
+        from naive_bayesian.NaiveBayesian import build_naive_bayesian_classifier, evaluate_naive_bayesian_classifier, visualize_naive_bayesian_classifier
 
         # to plot performance comparisons
         plotter = run_task(Plotter,
@@ -181,35 +283,77 @@ def main():
 
         handlers["plot_performances"] = plotter.plot_performances
 
-        project_gui = GUI(handlers)
+        project_gui = GUI(handlers, args.job_workers, args.job_cache_size)
         project_gui.launch()
 
     elif args.command == "process_dataset":
+        from common.Utils import process_dataset
+
         run_task(process_dataset, args)
 
+    elif args.command == "convert_model":
+        from common.Utils import convert_model
+
+        run_task(convert_model, args)
+
+    elif args.command == "serve":
+        from server.ScoringServer import serve
+
+        run_task(serve, args)
+
     elif args.command == "decision_tree":
+        from decision_tree.DecisionTree import build_decision_tree, evaluate_decision_tree
+
         if args.subcommand_decision_tree == "build":
             run_task(build_decision_tree, args)
         elif args.subcommand_decision_tree == "evaluate":
             run_task(evaluate_decision_tree, args)
+        elif args.subcommand_decision_tree == "predict":
+            from common.Scoring import predict_file
+
+            run_task(predict_file, args)
         else:
             parsers["decision_tree"]["main_parser"].print_help()
 
     elif args.command == "CBA":
+        from CBA.CBA import generate_CARs, evaluate_CARs, refresh_CARs
+
         if args.subcommand_CBA == "generate":
             run_task(generate_CARs, args)
         elif args.subcommand_CBA == "evaluate":
             run_task(evaluate_CARs, args)
+        elif args.subcommand_CBA == "refresh":
+            run_task(refresh_CARs, args)
+        elif args.subcommand_CBA == "predict":
+            from common.Scoring import predict_file
+
+            run_task(predict_file, args)
         else:
             parsers["CBA"]["main_parser"].print_help()
 
     elif args.command == "naive_bayesian":
+        from naive_bayesian.NaiveBayesian import build_naive_bayesian_classifier, evaluate_naive_bayesian_classifier, merge_naive_bayesian_classifiers
+
         if args.subcommand_NB == "build":
             run_task(build_naive_bayesian_classifier, args)
         elif args.subcommand_NB == "evaluate":
             run_task(evaluate_naive_bayesian_classifier, args)
+        elif args.subcommand_NB == "merge":
+            run_task(merge_naive_bayesian_classifiers, args)
+        elif args.subcommand_NB == "predict":
+            from common.Scoring import predict_file
+
+            run_task(predict_file, args)
         else:
             parsers["naive_bayesian"]["main_parser"].print_help()
+
+    elif args.command == "tune":
+        if args.model in ("decision_tree", "CBA"):
+            from common.Tuning import tune
+
+            run_task(tune, args)
+        else:
+            parsers["tune"]["main_parser"].print_help()
     else:
         parser.print_help()
 
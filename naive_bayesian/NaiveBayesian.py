@@ -1,11 +1,14 @@
 import math
+import numpy as np
 
 import common.Utils as CommonUtils
 import common.Helpers as CommonHelpers
 import common.Discretizer as Discretizer
-from common.Transaction import apply_thresholds
+from common.Dataset import Dataset
+from common.Transaction import TransactionEncoder
 
 import common.Logger as CommonLogger
+import common.Profiler as CommonProfiler
 
 def get_prediction_scores(transaction, probability_table, label_counts, initial_scores):
     scores = initial_scores
@@ -44,45 +47,275 @@ def prediction_probability_true(probability_table, transaction, label_counts):
 
     return exp_true / (exp_true + exp_false)
 
+# dense form of the probability table, compiled once per model:
+# item_ids maps (feature name, rule format) to a row of log_likelihoods,
+# log_likelihoods[item_id][j] is the laplace smoothed log P(item | labels[j]),
+# log_priors[j] is log P(labels[j]).
+# every feature also gets a row for values unseen during training, keyed (feature name, None)
+def compile_log_probability_table(probability_table, label_counts):
+    labels   = [True, False]
+    item_ids = {}
+    rows     = []
+
+    total = sum(label_counts[label] for label in labels)
+
+    for fname in probability_table:
+        num_bins = len(probability_table[fname])
+
+        for fval, counts in probability_table[fname].items():
+            item_ids[(fname, fval)] = len(rows)
+            rows.append([math.log((counts[label] + 1) / (label_counts[label] + num_bins)) for label in labels])
+
+        item_ids[(fname, None)] = len(rows)
+        rows.append([math.log(1 / (label_counts[label] + num_bins)) for label in labels])
+
+    return {
+        "labels":          labels,
+        "item_ids":        item_ids,
+        "log_likelihoods": np.array(rows, dtype=float),
+        "log_priors":      np.array([math.log(label_counts[label] / total) for label in labels], dtype=float)
+    }
+
+# maps the item ids of a TransactionEncoder to rows of the log probability table
+def log_table_rows(items, log_table):
+    item_ids = log_table["item_ids"]
+
+    return np.array([
+        item_ids.get((item.feature_name, item.rule_format), item_ids.get((item.feature_name, None)))
+        for item in items
+    ], dtype=np.int64)
+
+# predicted labels and probabilities of true labels for an integer item matrix,
+# a gather and sum over the log likelihoods instead of per item table lookups.
+# labels follow predict(), which doesn't use the priors (ties go to True)
+@CommonProfiler.timed("predict")
+def predict_batch(item_matrix, log_table):
+    scores = log_table["log_likelihoods"][item_matrix].sum(axis=1)
+
+    predictions = (scores[:, 0] >= scores[:, 1]).tolist()
+
+    # subtract the max score to prevent overflow, same as prediction_probability_true()
+    posteriors = scores + log_table["log_priors"]
+    posteriors = np.exp(posteriors - posteriors.max(axis=1, keepdims=True))
+
+    return predictions, (posteriors[:, 0] / posteriors.sum(axis=1)).tolist()
+
+# adds the item and label counts of an encoded chunk into the count table, in place
+def update_count_table(probability_table, label_counts, items, item_matrix, labels):
+    labels = np.asarray(labels, dtype=bool)
+
+    item_counts = {
+        True:  np.bincount(item_matrix[labels].reshape(-1), minlength=len(items)),
+        False: np.bincount(item_matrix[~labels].reshape(-1), minlength=len(items))
+    }
+
+    label_counts[True]  += int(labels.sum())
+    label_counts[False] += int((~labels).sum())
+
+    for item_id in np.flatnonzero(item_counts[True] + item_counts[False]).tolist():
+        fname = items[item_id].feature_name
+        fval  = items[item_id].rule_format
+
+        if fname not in probability_table:
+            probability_table[fname] = {}
+        if fval not in probability_table[fname]:
+            probability_table[fname][fval] = {True: 0, False: 0}
+
+        for label in (True, False):
+            probability_table[fname][fval][label] += int(item_counts[label][item_id])
+
+# adds the counts of the src count table into the dst count table, in place
+def merge_count_tables(dst_table, dst_label_counts, src_table, src_label_counts):
+    for label in src_label_counts:
+        dst_label_counts[label] = dst_label_counts.get(label, 0) + src_label_counts[label]
+
+    for fname in src_table:
+        if fname not in dst_table:
+            dst_table[fname] = {}
+
+        for fval, counts in src_table[fname].items():
+            if fval not in dst_table[fname]:
+                dst_table[fname][fval] = {True: 0, False: 0}
+
+            for label in counts:
+                dst_table[fname][fval][label] += counts[label]
+
+# a uniform sample of at most sample_size instances of the trainset, drawn across all chunks by reservoir sampling.
+# the sample is seeded so that the same trainset always gets the same thresholds
+def sample_trainset(chunks, sample_size, seed = 0):
+    rng    = np.random.default_rng(seed)
+    sample = []
+    seen   = 0
+
+    for i, chunk in enumerate(chunks):
+        if not chunk:
+            return None
+
+        instances = chunk.instances
+        fill      = min(max(sample_size - len(sample), 0), len(instances))
+
+        sample.extend(instances[:fill])
+
+        # once the sample is full, the j-th instance of the trainset replaces a random one with probability sample_size / (j + 1)
+        positions = np.arange(seen + fill, seen + len(instances))
+        slots     = rng.integers(0, positions + 1) if positions.size else positions
+
+        for k in np.flatnonzero(slots < sample_size):
+            sample[slots[k]] = instances[fill + k]
+
+        seen += len(instances)
+
+        CommonLogger.logger.update_last(f"Sampled trainset chunk {i + 1} ({len(sample)} of {seen} instances in the sample)")
+        yield
+
+    if not sample:
+        CommonLogger.logger.log("[ERROR] Trainset has no instances")
+        return None
+
+    return Dataset(sample)
+
+# counts the trainset chunk by chunk into the count table of pickled_data,
+# or into a new count table with the thresholds discretized from the first chunk
+@CommonProfiler.timed("count_trainset")
+def count_trainset(args, chunks, pickled_data):
+    if pickled_data:
+        threshold_map     = pickled_data["threshold_map"]
+        probability_table = pickled_data["probability_table"]
+        label_counts      = pickled_data["label_counts"]
+    else:
+        threshold_map     = None
+        probability_table = {}
+        label_counts      = {True: 0, False: 0}
+
+    encoder = None
+
+    for i, chunk in enumerate(chunks):
+        if not chunk:
+            return None
+
+        if threshold_map is None:
+            threshold_map = yield from Discretizer.best_thresholds_for_features(chunk, args.max_split_count, args.min_bin_frac, args.delta_cost)
+
+            if not threshold_map:
+                return None
+
+        if encoder is None:
+            encoder = TransactionEncoder(chunk.feature_types, chunk.label_idx, threshold_map)
+
+        update_count_table(probability_table, label_counts, encoder.items, *encoder.encode(chunk))
+
+        CommonLogger.logger.update_last(f"Counted trainset chunk {i + 1} ({label_counts[True] + label_counts[False]} instances in the table)")
+        yield
+
+    if threshold_map is None:
+        CommonLogger.logger.log("[ERROR] Trainset has no instances")
+        return None
+
+    return {"probability_table" : probability_table, "threshold_map": threshold_map, "label_counts": label_counts}
+
 def build_naive_bayesian_classifier(args):
     try:
-        trainset = CommonUtils.load_dataset(args.trainset_infile, args.entropy_weights)
+        # 0 reads the whole trainset at once
+        chunk_size = int(getattr(args, "chunk_size", 0) or 0)
+        update     = getattr(args, "update", False)
+        thresholds = getattr(args, "thresholds_from", None)
 
-        if not trainset:
+        pickled_data = None
+
+        if update and thresholds:
+            CommonLogger.logger.log("[ERROR] --update and --thresholds-from can't be used together")
             return
 
-        threshold_map = yield from Discretizer.best_thresholds_for_features(trainset, args.max_split_count, args.min_bin_frac, args.delta_cost)
+        if update:
+            pickled_data = CommonUtils.load_pickle(args.pickle_path)
 
-        if not threshold_map:
+            if not pickled_data:
+                return
+
+            CommonLogger.logger.log(f"Updating the probability table in {args.pickle_path}, thresholds are kept as they are")
+
+        elif thresholds:
+            threshold_data = CommonUtils.load_pickle(thresholds)
+
+            if not threshold_data:
+                return
+
+            # an empty table with the thresholds of another one, so that the two can be merged
+            pickled_data = {"probability_table": {}, "threshold_map": threshold_data["threshold_map"], "label_counts": {True: 0, False: 0}}
+
+            CommonLogger.logger.log(f"Building a new probability table with the thresholds of {thresholds}")
+
+        CommonLogger.logger.log("")
+
+        if chunk_size > 0:
+            if pickled_data is None:
+                # thresholds of a new table are discretized from a sample of the whole trainset, or from all of it with a
+                # sample size of 0, then the trainset is read again to be counted
+                sample_size = int(getattr(args, "sample_size", 0) or 0)
+
+                if sample_size > 0:
+                    sample = yield from sample_trainset(CommonUtils.iter_dataset_chunks(args.trainset_infile, chunk_size, args.entropy_weights), sample_size)
+                else:
+                    sample = CommonUtils.load_dataset(args.trainset_infile, args.entropy_weights)
+
+                if not sample:
+                    return
+
+                threshold_map = yield from Discretizer.best_thresholds_for_features(sample, args.max_split_count, args.min_bin_frac, args.delta_cost)
+
+                if not threshold_map:
+                    return
+
+                pickled_data = {"probability_table": {}, "threshold_map": threshold_map, "label_counts": {True: 0, False: 0}}
+
+                CommonLogger.logger.log("")
+
+            chunks = CommonUtils.iter_dataset_chunks(args.trainset_infile, chunk_size, args.entropy_weights)
+        else:
+            chunks = [CommonUtils.load_dataset(args.trainset_infile, args.entropy_weights)]
+
+        out = yield from count_trainset(args, chunks, pickled_data)
+
+        if not out:
             return
 
-        transactions = apply_thresholds(trainset, threshold_map)
+        out["log_probability_table"] = compile_log_probability_table(out["probability_table"], out["label_counts"])
 
-        probability_table = {}
-        label_counts = {True: 0, False: 0}
-
-        for t in transactions:
-            label = t["label"]
-            label_counts[label] += 1
-            
-            for item in t["itemset"]:
-                fname = item.feature_name
-                fval  = item.rule_format
-                
-                if fname not in probability_table:
-                    probability_table[fname] = {}
-                if fval not in probability_table[fname]:
-                    probability_table[fname][fval] = {True: 0, False: 0}
-                    
-                probability_table[fname][fval][label] += 1
-
-        out = {"probability_table" : probability_table, "threshold_map": threshold_map, "label_counts": label_counts}
         yield from CommonUtils.save_pickle(out, args.pickle_path, "naive bayesian classifier probability table and threshold map")
 
     except KeyboardInterrupt:
         CommonLogger.logger.log("Received KeyboardInterrupt, exiting.")
         return
 
+# merges probability tables built from shards of a trainset with the same thresholds
+def merge_naive_bayesian_classifiers(args):
+    out = None
+
+    for pickle_path in args.pickle_paths:
+        pickled_data = CommonUtils.load_pickle(pickle_path)
+
+        if not pickled_data:
+            return
+
+        if out is None:
+            out = {"probability_table": {}, "threshold_map": pickled_data["threshold_map"], "label_counts": {True: 0, False: 0}}
+
+        elif pickled_data["threshold_map"] != out["threshold_map"]:
+            CommonLogger.logger.log(f"[ERROR] Threshold map of {pickle_path} differs, only tables with the same thresholds can be merged")
+            return
+
+        merge_count_tables(out["probability_table"], out["label_counts"], pickled_data["probability_table"], pickled_data["label_counts"])
+
+        CommonLogger.logger.log(f"Merged {pickle_path}")
+        yield
+
+    if out is None:
+        return
+
+    out["log_probability_table"] = compile_log_probability_table(out["probability_table"], out["label_counts"])
+
+    yield from CommonUtils.save_pickle(out, args.pickle_path, "merged naive bayesian classifier probability table and threshold map")
+
 def evaluate_naive_bayesian_classifier(args):
     try:
         testset           = CommonUtils.load_dataset(args.testset_infile)
@@ -102,21 +335,19 @@ def evaluate_naive_bayesian_classifier(args):
         if not threshold_map:
             return
 
-        transactions =  apply_thresholds(testset, threshold_map)
+        # pickles from before the compiled table was stored don't have it
+        log_table    = pickled_data.get("log_probability_table") or compile_log_probability_table(probability_table, label_counts)
 
-        predictions  =  CommonHelpers.predict_dataset (
-                            transactions, None,
-                            probability_table, predict,
-                            label_counts
-                        )
+        encoder = TransactionEncoder(testset.feature_types, testset.label_idx, threshold_map)
+        item_matrix, labels = encoder.encode(testset)
+
+        predictions, y_probs = predict_batch(log_table_rows(encoder.items, log_table)[item_matrix], log_table)
 
         if not predictions:
             return None
 
         metrics_data = yield from CommonHelpers.get_metrics(
-                predictions, [t["label"] for t in transactions], probability_table, transactions,
-                None, lambda transaction: transaction["label"], prediction_probability_true, label_counts)
-
+                predictions, labels.tolist(), y_probs)
 
         CommonLogger.logger.log("")
 
@@ -0,0 +1,55 @@
+import json
+import socket
+import http.client
+
+class UnixHTTPConnection(http.client.HTTPConnection):
+    def __init__(self, unix_socket, timeout = None):
+        super().__init__("localhost", timeout=timeout)
+        self.unix_socket = unix_socket
+
+    def connect(self):
+        self.sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        self.sock.settimeout(self.timeout)
+        self.sock.connect(self.unix_socket)
+
+# blocking client of the scoring server, keeps its connection open between requests.
+# instances are lists of values in schema order (with or without the label) or dicts of feature name -> value
+class ScoringClient:
+    def __init__(self, host = "127.0.0.1", port = 8750, unix_socket = None, timeout = 30):
+        if unix_socket:
+            self.connection = UnixHTTPConnection(unix_socket, timeout)
+        else:
+            self.connection = http.client.HTTPConnection(host, port, timeout=timeout)
+
+    def request(self, method, path, payload = None):
+        body    = json.dumps(payload).encode("utf-8") if payload is not None else None
+        headers = {"Content-Type": "application/json"} if body is not None else {}
+
+        self.connection.request(method, path, body=body, headers=headers)
+
+        response = self.connection.getresponse()
+        data     = json.loads(response.read() or b"{}")
+
+        if response.status != 200:
+            raise RuntimeError(f"scoring server returned {response.status}: {data.get('error')}")
+
+        return data
+
+    # returns the predictions and the probabilities of true labels of the instances
+    def score(self, algorithm, instances):
+        data = self.request("POST", f"/score/{algorithm}", {"instances": instances})
+        return data["predictions"], data["probabilities"]
+
+    # returns the prediction and the probability of true label of a single instance
+    def score_one(self, algorithm, instance):
+        data = self.request("POST", f"/score/{algorithm}", {"instance": instance})
+        return data["prediction"], data["probability"]
+
+    def models(self):
+        return self.request("GET", "/models")
+
+    def stats(self):
+        return self.request("GET", "/stats")
+
+    def close(self):
+        self.connection.close()
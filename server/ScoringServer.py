@@ -0,0 +1,284 @@
+import json
+import time
+import asyncio
+import statistics
+
+from collections import deque
+
+import common.Utils as CommonUtils
+import common.Scoring as Scoring
+import common.Logger as CommonLogger
+
+from common.Dataset import DatasetSchema
+
+REASONS = {200: "OK", 400: "Bad Request", 404: "Not Found", 405: "Method Not Allowed", 500: "Internal Server Error"}
+
+# counters of a model (or of the whole server), latencies are kept for the most recent requests only
+class ScoringStats:
+    def __init__(self, latency_window = 10000):
+        self.started   = time.monotonic()
+        self.requests  = 0
+        self.rows      = 0
+        self.batches   = 0
+        self.errors    = 0
+        self.latencies = deque(maxlen=latency_window)
+
+    def record_request(self, row_count, latency):
+        self.requests += 1
+        self.rows     += row_count
+        self.latencies.append(latency)
+
+    def snapshot(self):
+        uptime    = time.monotonic() - self.started
+        latencies = sorted(self.latencies)
+
+        def percentile(p):
+            return latencies[min(len(latencies) - 1, int(p * len(latencies)))] * 1000 if latencies else None
+
+        return {
+            "uptime_s":           round(uptime, 3),
+            "requests":           self.requests,
+            "rows":               self.rows,
+            "batches":            self.batches,
+            "errors":             self.errors,
+            "rows_per_batch":     (self.rows / self.batches) if self.batches else None,
+            "requests_per_s":     self.requests / uptime if uptime > 0 else None,
+            "rows_per_s":         self.rows / uptime if uptime > 0 else None,
+            "latency_ms": {
+                "mean": statistics.fmean(latencies) * 1000 if latencies else None,
+                "p50":  percentile(0.5),
+                "p90":  percentile(0.9),
+                "p99":  percentile(0.99),
+                "max":  latencies[-1] * 1000 if latencies else None
+            }
+        }
+
+# collects the rows of concurrent requests for a model into a single scoring call:
+# a batch is scored once it has max_batch_size rows or max_delay seconds passed since its first request
+class MicroBatcher:
+    def __init__(self, scorer, row_converter, max_batch_size, max_delay, stats):
+        self.scorer         = scorer
+        self.row_converter  = row_converter
+        self.max_batch_size = max_batch_size
+        self.max_delay      = max_delay
+        self.stats          = stats
+        self.queue          = asyncio.Queue()
+
+    async def submit(self, rows):
+        future = asyncio.get_running_loop().create_future()
+        await self.queue.put((rows, future))
+        return await future
+
+    async def run(self):
+        loop = asyncio.get_running_loop()
+
+        while True:
+            batch     = [await self.queue.get()]
+            row_count = len(batch[0][0])
+            deadline  = loop.time() + self.max_delay
+
+            while row_count < self.max_batch_size:
+                timeout = deadline - loop.time()
+
+                if timeout <= 0:
+                    break
+
+                try:
+                    request = await asyncio.wait_for(self.queue.get(), timeout)
+                except asyncio.TimeoutError:
+                    break
+
+                batch.append(request)
+                row_count += len(request[0])
+
+            await self.score_batch(batch, row_count)
+
+    def score_rows(self, rows, row_count):
+        return self.scorer.score(self.row_converter.to_columns(rows), row_count)
+
+    # the batch is scored in a thread of the default executor, the event loop keeps accepting
+    # requests meanwhile, which are batched together once this batch is done
+    async def score_batch(self, batch, row_count):
+        rows = [row for request_rows, _ in batch for row in request_rows]
+
+        try:
+            predictions, probs = await asyncio.get_running_loop().run_in_executor(None, self.score_rows, rows, row_count)
+        except Exception as e:
+            for _, future in batch:
+                if not future.done():
+                    future.set_exception(e)
+            return
+
+        self.stats.batches += 1
+
+        start = 0
+
+        for request_rows, future in batch:
+            end = start + len(request_rows)
+
+            if not future.done():
+                future.set_result((predictions[start:end], probs[start:end]))
+
+            start = end
+
+class ScoringServer:
+    def __init__(self, scorers, row_converter, max_batch_size, max_delay):
+        self.row_converter = row_converter
+        self.stats         = {"all": ScoringStats()}
+        self.batchers      = {}
+
+        for algorithm, scorer in scorers.items():
+            self.stats[algorithm]    = ScoringStats()
+            self.batchers[algorithm] = MicroBatcher(scorer, row_converter, max_batch_size, max_delay, self.stats[algorithm])
+
+    async def score(self, algorithm, body):
+        start = time.perf_counter()
+
+        request = json.loads(body or b"{}")
+
+        if not isinstance(request, dict) or not ("instance" in request or isinstance(request.get("instances"), list)):
+            raise ValueError('request body must be an object with an "instance" or an "instances" list')
+
+        is_single = "instance" in request
+
+        rows = self.row_converter.convert([request["instance"]] if is_single else request["instances"])
+
+        if rows:
+            predictions, probs = await self.batchers[algorithm].submit(rows)
+        else:
+            predictions, probs = [], []
+
+        latency = time.perf_counter() - start
+
+        for stats in (self.stats[algorithm], self.stats["all"]):
+            stats.record_request(len(rows), latency)
+
+        if is_single:
+            return {"prediction": predictions[0], "probability": probs[0]}
+
+        return {"predictions": predictions, "probabilities": probs}
+
+    async def route(self, method, path, body):
+        parts = path.strip("/").split("/")
+
+        if parts == ["stats"] and method == "GET":
+            self.stats["all"].batches = sum(batcher.stats.batches for batcher in self.batchers.values())
+            return 200, {name: stats.snapshot() for name, stats in self.stats.items()}
+
+        if parts == ["models"] and method == "GET":
+            return 200, {"models": list(self.batchers.keys()), "features": self.row_converter.feature_names}
+
+        if len(parts) == 2 and parts[0] == "score":
+            if parts[1] not in self.batchers:
+                return 404, {"error": f"no {parts[1]} model is loaded, loaded models: {list(self.batchers.keys())}"}
+
+            if method != "POST":
+                return 405, {"error": "scoring requests must be POST"}
+
+            try:
+                return 200, await self.score(parts[1], body)
+            except (ValueError, TypeError) as e:
+                for name in (parts[1], "all"):
+                    self.stats[name].errors += 1
+
+                return 400, {"error": str(e)}
+
+        return 404, {"error": f"unknown endpoint: {method} {path}"}
+
+    # minimal HTTP/1.1 with keep-alive, json request and response bodies
+    async def handle_connection(self, reader, writer):
+        try:
+            while True:
+                request_line = await reader.readline()
+
+                if not request_line:
+                    break
+
+                method, path, _ = request_line.decode("latin-1").split(" ", 2)
+                headers = {}
+
+                while True:
+                    line = await reader.readline()
+
+                    if line in (b"\r\n", b"\n", b""):
+                        break
+
+                    name, value = line.decode("latin-1").split(":", 1)
+                    headers[name.strip().lower()] = value.strip()
+
+                body = await reader.readexactly(int(headers.get("content-length", 0)))
+
+                try:
+                    status, payload = await self.route(method, path, body)
+                except Exception as e:
+                    status, payload = 500, {"error": f"{type(e).__name__}: {e}"}
+
+                data = json.dumps(payload).encode("utf-8")
+
+                writer.write(
+                    f"HTTP/1.1 {status} {REASONS[status]}\r\nContent-Type: application/json\r\nContent-Length: {len(data)}\r\n\r\n".encode("latin-1") + data
+                )
+                await writer.drain()
+
+                if headers.get("connection", "").lower() == "close":
+                    break
+
+        except (ConnectionError, asyncio.IncompleteReadError, ValueError):
+            pass
+
+        finally:
+            writer.close()
+
+    async def serve_forever(self, host, port, unix_socket = None):
+        batcher_tasks = [asyncio.create_task(batcher.run()) for batcher in self.batchers.values()]
+
+        if unix_socket:
+            server  = await asyncio.start_unix_server(self.handle_connection, path=unix_socket)
+            address = unix_socket
+        else:
+            server  = await asyncio.start_server(self.handle_connection, host, port)
+            address = f"http://{host}:{server.sockets[0].getsockname()[1]}"
+
+        CommonLogger.logger.log(f"[INFO] Scoring server listening on {address}, models: {', '.join(self.batchers.keys())}")
+
+        try:
+            async with server:
+                await server.serve_forever()
+        finally:
+            for task in batcher_tasks:
+                task.cancel()
+
+def serve(args):
+    if not CommonUtils.load_dataset_schema(args.schema_infile):
+        return None
+
+    feature_types = DatasetSchema.feature_types
+    label_idx     = DatasetSchema.label_idx
+
+    pickle_paths = {
+        "decision_tree":  args.pickle_path_decision_tree,
+        "CBA":            args.pickle_path_CBA,
+        "naive_bayesian": args.pickle_path_naive_bayesian
+    }
+
+    scorers = {}
+
+    for algorithm, pickle_path in pickle_paths.items():
+        if not pickle_path:
+            continue
+
+        scorer = Scoring.load_scorer(algorithm, pickle_path, feature_types, label_idx)
+
+        if scorer:
+            scorers[algorithm] = scorer
+
+    if not scorers:
+        CommonLogger.logger.log("[ERROR] No model could be loaded, not starting the scoring server")
+        return None
+
+    server = ScoringServer(scorers, Scoring.RowConverter(feature_types, label_idx), args.max_batch_size, args.max_batch_delay / 1000)
+
+    try:
+        asyncio.run(server.serve_forever(args.host, args.port, args.unix_socket))
+    except KeyboardInterrupt:
+        CommonLogger.logger.log("Received KeyboardInterrupt, exiting.")